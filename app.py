@@ -1,127 +1,45 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 import os
+import re
 import json
 import time
 import base64
 from datetime import datetime
-import requests
-import certifi
 
-app = Flask(__name__)
-
-# Voice ID constant
-JASON_VOICE_ID = 'Xar9jZKMXSKxBNlDsFCr'
-
-# Load Jason Silva knowledge base for RAG-enhanced generation
-JASON_KB = ""
-_kb_path = os.path.join(os.path.dirname(__file__), 'jason_knowledge_base.txt')
-if os.path.exists(_kb_path):
-    with open(_kb_path) as _f:
-        JASON_KB = _f.read()
-
-# Demo scripts - authentic Jason Silva style content
-DEMO_SCRIPTS = {
-    "creativity": """Have you ever considered what happens when human creativity meets artificial intelligence?
-
-What if I told you that we're standing at the precipice of something absolutely extraordinary?
-
-Picture this: A world where the boundaries between human imagination and machine capability begin to blur. Where the tools we create don't just amplify our voices—they expand the very nature of what's possible.
-
-As Terence McKenna once said, "The imagination is the golden pathway to everywhere."
-
-But here's the thing... We're not just talking about automation. We're talking about augmentation. The expansion of human potential through the marriage of biological and digital intelligence.
-
-Carl Sagan observed that "we are a way for the cosmos to know itself." And now, through AI, that knowing is becoming deeper, richer, more nuanced than ever before.
-
-The adjacent possible awaits.
-
-Think about it... Every brushstroke, every melody, every word you speak can now be part of a collaborative dance with intelligence that never sleeps, never stops learning, never stops evolving.
-
-The question isn't whether AI will replace human creativity. The question is: How much more magnificent can we become when we embrace these tools as extensions of our own creative spirit?
-
-We are the universe experiencing itself—and that experience is about to get a whole lot more interesting.
-
-Stay curious.""",
-
-    "consciousness": """What if I told you that consciousness itself is the greatest mystery in the universe?
-
-Have you ever stopped to consider that you are a self-aware collection of stardust, contemplating its own existence?
-
-Picture this: 13.8 billion years of cosmic evolution culminating in a biological organism capable of asking "Who am I?"
-
-Alan Watts reminds us that "you are the universe experiencing itself in temporary human form."
-
-But here's the thing... Consciousness isn't just a byproduct of brain activity. It's the fundamental ground of reality itself.
-
-As Terence McKenna famously said, "The world is not just stranger than we suppose—it's stranger than we CAN suppose."
-
-The adjacent possible awaits.
-
-Consider this: Every moment of awareness is a miracle. Every thought, every sensation, every glimpse of beauty is the cosmos waking up to itself.
-
-We are not separate from the universe observing it from outside. We are the universe observing itself from within.
-
-And that, my friends, is absolutely awe-inspiring.""",
-
-    "technology": """Imagine for a moment that you're living through the most transformative period in human history.
-
-What if I told you that the technological singularity isn't just coming—it's already here, unfolding in slow motion all around us?
-
-Picture this: A child born today will never know a world without AI. To them, intelligence that learns and grows will be as natural as breathing.
-
-In the words of Buckminster Fuller, "We are called to be architects of the future, not its victims."
-
-But here's the thing... Technology isn't neutral. It's an amplifier of human intention. It magnifies our capacity for both creation and destruction.
-
-The question is... Will we use these godlike powers to build paradise or dystopia?
-
-Carl Sagan once observed that "we have a choice: We can enhance life and come to know the cosmos, or we can squander our 15 billion-year heritage in meaningless self-destruction."
-
-The adjacent possible awaits.
-
-Think about it... Every line of code, every algorithm, every neural network is a choice about what kind of future we want to inhabit.
-
-We are not passive observers of technological change. We are its authors, its architects, its dreamers.
-
-And that responsibility is absolutely awe-inspiring.
+import breaker
+import deadline
+import metrics
+import model_router
+import upstream
+from audio_store import AUDIO_STORE, is_audio_id, store_audio
+from demo_library import get_demo_script
+from desmell import DesmellStream, desmell
+from knowledge_base import retrieve_context
+from script_cache import SCRIPT_CACHE, request_key
 
-Don't miss it.""",
-
-    "default": """Have you ever considered that we are living in a moment of unprecedented possibility?
-
-What if I told you that the future is not something that happens to us—it's something we create, moment by moment, choice by choice?
-
-Picture this: A world where the boundaries of what's possible are constantly expanding. Where yesterday's science fiction becomes today's reality.
-
-As Terence McKenna wisely observed, "The syntactical nature of reality, the real secret of magic, is that the world is made of words. And if you know the words that the world is made of, you can make of it whatever you wish."
-
-But here's the thing... We are not merely observers in this cosmic dance. We are active participants, co-creators of reality itself.
-
-Carl Sagan reminded us that "we are star stuff contemplating the stars." We are the universe become conscious of itself, the cosmos reflecting on its own existence.
+app = Flask(__name__)
 
-The adjacent possible awaits.
 
-Think about it... Every moment presents an infinite branching of possibilities. Every decision is a doorway to a different future.
+@app.before_request
+def _start_trace():
+    # Routes are labelled by their rule ("/api/jobs/<job_id>") so label values stay bounded
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    request.environ['jsai.trace'] = metrics.start_trace(request.method, rule)
+    # Every upstream call this request makes shares one budget that ends before the platform timeout
+    deadline.start(deadline.REQUEST_DEADLINE_SECONDS)
 
-The question isn't what the world will become. The question is: Who will you become in response to it?
 
-We are the universe experiencing itself—and that experience is what we call life.
+@app.after_request
+def _finish_trace(response):
+    trace = request.environ.get('jsai.trace')
+    if trace is not None:
+        # Runs once the body is fully sent, so streamed responses are timed to their last byte
+        response.call_on_close(lambda: metrics.finish_trace(trace, response.status_code))
+    return response
 
-Stay curious."""
-}
 
-def get_demo_script(topic):
-    """Return a demo script based on topic keywords."""
-    topic_lower = topic.lower()
-    
-    if any(word in topic_lower for word in ['creativity', 'creative', 'art', 'imagination', 'design']):
-        return DEMO_SCRIPTS["creativity"]
-    elif any(word in topic_lower for word in ['consciousness', 'mind', 'awareness', 'self', 'meditation']):
-        return DEMO_SCRIPTS["consciousness"]
-    elif any(word in topic_lower for word in ['technology', 'ai', 'future', 'digital', 'tech', 'innovation']):
-        return DEMO_SCRIPTS["technology"]
-    else:
-        return DEMO_SCRIPTS["default"]
+# Voice ID constant
+JASON_VOICE_ID = 'Xar9jZKMXSKxBNlDsFCr'
 
 # API Keys (lazy load with strip to fix newline issues)
 def get_anthropic_key():
@@ -130,24 +48,25 @@ def get_anthropic_key():
 def get_elevenlabs_key():
     return os.getenv('ELEVENLABS_API_KEY', '').strip()
 
-def generate_keynote_script(topic, duration="10 min", style="inspirational"):
-    """Generate a keynote script using AI or fallback to demo."""
-    
-    ANTHROPIC_API_KEY = get_anthropic_key()
-    
-    # If no API key, use demo mode
-    if not ANTHROPIC_API_KEY:
-        return get_demo_script(topic), True
-    
-    word_count = {
-        "1 min": 130,
-        "2 min": 260,
-        "5 min": 400
-    }.get(duration, 260)
+# Spoken words per short-form duration; also what the model router sizes the call from
+SCRIPT_WORDS = {
+    "1 min": 130,
+    "2 min": 260,
+    "5 min": 400
+}
+
+def _script_words(duration):
+    return SCRIPT_WORDS.get(duration, 260)
+
+def _build_keynote_prompts(topic, duration, style):
+    """Build the (system blocks, user_prompt) pair for a short-form keynote."""
+    word_count = _script_words(duration)
     
-    # Build RAG-enhanced system prompt with Jason's actual knowledge
+    # Build RAG-enhanced system prompt from the passages most relevant to the topic
+    with metrics.span('kb_retrieve'):
+        kb_excerpt = retrieve_context(f"{topic} {style}")
     kb_section = ""
-    if JASON_KB:
+    if kb_excerpt:
         kb_section = f"""
 
 JASON SILVA'S ACTUAL WRITINGS AND KNOWLEDGE BASE:
@@ -156,7 +75,7 @@ Use this to ground your generation in his ACTUAL ideas, vocabulary, and philosop
 Draw specific connections, quotes, and concepts from this material — don't just mimic his style, 
 channel his actual intellectual universe.
 
-{JASON_KB[:15000]}"""
+{kb_excerpt}"""
 
     system_prompt = f"""You are generating keynote content as Jason Silva — not imitating him, but channeling his actual intellectual framework.
 
@@ -186,41 +105,198 @@ Requirements:
 - Write as pure spoken word — no formatting, no stage directions
 - If the knowledge base above contains relevant material on this topic, reference and build upon Jason's actual ideas"""
 
+    # Persona + knowledge base form the cacheable prefix; only the user prompt varies with duration
+    return upstream.cached_system(system_prompt), user_prompt
+
+def _request_keynote_script(topic, duration, style, api_key):
+    """One Anthropic call for a short-form script. Returns text or raises."""
+    # Skip prompt building entirely while Anthropic's breaker is open; the caller serves a demo script
+    breaker.check("anthropic")
+    system_prompt, user_prompt = _build_keynote_prompts(topic, duration, style)
+    route = model_router.route('script', _script_words(duration))
+
+    # Use Anthropic API directly (OpenRouter DNS fails on Vercel)
+    max_tokens = route.max_tokens
+    while True:
+        start = time.perf_counter()
+        with metrics.span('script_llm', tier=route.tier):
+            response = upstream.post(
+                "anthropic", "/v1/messages",
+                headers=upstream.anthropic_headers(api_key),
+                json={
+                    "model": route.model,
+                    "max_tokens": max_tokens,
+                    "temperature": 0.8,
+                    "system": upstream.fit_cache(system_prompt, model_router.min_cache_tokens(route.model)),
+                    "messages": [
+                        {"role": "user", "content": user_prompt}
+                    ]
+                },
+                timeout=30
+            )
+
+        if response.status_code != 200:
+            raise upstream.UpstreamError(
+                f"Anthropic API error {response.status_code}: {response.text[:300]}",
+                status_code=response.status_code
+            )
+
+        data = response.json()
+        usage = data.get('usage') or {}
+        upstream.record_usage(usage)
+        model_router.record(route.model, time.perf_counter() - start, usage.get('output_tokens') or 0)
+        if data.get('stop_reason') != 'max_tokens':
+            return data['content'][0]['text']
+        # Cut off mid-sentence: retry with a larger cap rather than cache a truncated script
+        max_tokens = model_router.after_truncation(route.model, max_tokens)
+
+def generate_keynote_script(topic, duration="10 min", style="inspirational", fresh=False):
+    """Generate a keynote script using AI or fallback to demo.
+
+    Identical (topic, duration, style) requests share one cached generation; fresh=True regenerates.
+    """
+    
+    ANTHROPIC_API_KEY = get_anthropic_key()
+    
+    # If no API key, use demo mode
+    if not ANTHROPIC_API_KEY:
+        return get_demo_script(topic), True
+    
     try:
-        # Use Anthropic API directly (OpenRouter DNS fails on Vercel)
-        response = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "x-api-key": ANTHROPIC_API_KEY,
-                "anthropic-version": "2023-06-01",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "claude-sonnet-4-20250514",
-                "max_tokens": 4000,
-                "temperature": 0.8,
-                "system": system_prompt,
-                "messages": [
-                    {"role": "user", "content": user_prompt}
-                ]
-            },
-            timeout=30,
-            verify=certifi.where()
+        script = SCRIPT_CACHE.get_or_compute(
+            request_key("keynote", topic=topic, duration=duration, style=style),
+            lambda: _request_keynote_script(topic, duration, style, ANTHROPIC_API_KEY),
+            fresh=fresh
         )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data['content'][0]['text'], False
-        else:
-            # API error - fallback to demo
-            return get_demo_script(topic), True
+        return script, False
             
     except Exception:
-        # Network error - fallback to demo
+        # API or network error - fallback to demo
         return get_demo_script(topic), True
 
+def _iter_demo_words(script):
+    """Yield a demo script word by word so demo mode streams like the real thing."""
+    for word in re.findall(r'\S+\s*', script):
+        yield word
+
+def stream_keynote_script(topic, duration="10 min", style="inspirational", fresh=False):
+    """Stream a keynote script as (text_delta, is_demo) pairs.
+
+    Falls back to the demo script if the key is missing or the API fails before
+    any text arrives. Errors after the first delta propagate to the caller.
+    Cached scripts replay word by word; completed streams are written to the cache. Identical
+    requests already in flight are waited for and replayed the same way.
+    """
+    ANTHROPIC_API_KEY = get_anthropic_key()
+
+    if not ANTHROPIC_API_KEY:
+        for word in _iter_demo_words(get_demo_script(topic)):
+            yield word, True
+        return
+
+    cache_key = request_key("keynote", topic=topic, duration=duration, style=style)
+    cached = None if fresh else SCRIPT_CACHE.get(cache_key)
+    if cached is not None:
+        for word in _iter_demo_words(cached):
+            yield word, False
+        return
+
+    if breaker.is_open("anthropic"):
+        for word in _iter_demo_words(get_demo_script(topic)):
+            yield word, True
+        return
+
+    # Join any identical generation already in flight (streamed or not) rather than start another
+    lead = None
+    if not fresh:
+        try:
+            cached, lead = SCRIPT_CACHE.join(cache_key)
+        except deadline.DeadlineExceeded:
+            for word in _iter_demo_words(get_demo_script(topic)):
+                yield word, True
+            return
+        if cached is not None:
+            for word in _iter_demo_words(cached):
+                yield word, False
+            return
+
+    script = None
+    try:
+        system_prompt, user_prompt = _build_keynote_prompts(topic, duration, style)
+        route = model_router.route('script', _script_words(duration))
+        start = time.perf_counter()
+
+        try:
+            response = upstream.post(
+                "anthropic", "/v1/messages",
+                headers=upstream.anthropic_headers(ANTHROPIC_API_KEY),
+                json={
+                    "model": route.model,
+                    "max_tokens": model_router.stream_tokens(route),
+                    "temperature": 0.8,
+                    "stream": True,
+                    "system": upstream.fit_cache(system_prompt, model_router.min_cache_tokens(route.model)),
+                    "messages": [
+                        {"role": "user", "content": user_prompt}
+                    ]
+                },
+                timeout=30,
+                stream=True
+            )
+        except Exception:
+            response = None
+
+        if response is None or response.status_code != 200:
+            if response is not None:
+                response.close()
+            for word in _iter_demo_words(get_demo_script(topic)):
+                yield word, True
+            return
+
+        parts = []
+        usage = {}
+        stop_reason = None
+        with response:
+            for event, data in upstream.iter_sse(response):
+                if event == 'content_block_delta':
+                    delta = json.loads(data).get('delta', {})
+                    if delta.get('type') == 'text_delta':
+                        parts.append(delta['text'])
+                        yield delta['text'], False
+                elif event == 'message_start':
+                    usage.update(json.loads(data).get('message', {}).get('usage', {}))
+                elif event == 'message_delta':
+                    message_delta = json.loads(data)
+                    usage.update(message_delta.get('usage', {}))
+                    stop_reason = message_delta.get('delta', {}).get('stop_reason')
+                elif event == 'error':
+                    raise Exception(f"Anthropic stream error: {data[:300]}")
+                elif event == 'message_stop':
+                    upstream.record_usage(usage)
+                    model_router.record(route.model, time.perf_counter() - start, usage.get('output_tokens') or 0)
+                    # Already streamed, so it can't be retried — but a script cut off at max_tokens is never cached
+                    if stop_reason == 'max_tokens':
+                        metrics.inc('truncated_responses_total', tier=route.tier)
+                    else:
+                        script = ''.join(parts)
+                    break
+    finally:
+        # Wakes requests that joined this one; they generate for themselves if script is None
+        if lead is not None:
+            SCRIPT_CACHE.land(lead, script)
+        elif script is not None:
+            SCRIPT_CACHE.put(cache_key, script)
+
+def _sse(event, payload):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
 def generate_voice(script_text):
-    """Generate voice using ElevenLabs."""
+    """Generate voice using ElevenLabs (through the shared audio cache).
+
+    Returns ({audio_base64, audio_id, audio_url}, None) or (None, error); audio_id/url only if stored.
+    """
+    from longform_engine import _synthesize_chunk
     
     ELEVENLABS_API_KEY = get_elevenlabs_key()
     
@@ -228,31 +304,13 @@ def generate_voice(script_text):
         return None, "Voice generation requires ElevenLabs API key"
     
     try:
-        response = requests.post(
-            f"https://api.elevenlabs.io/v1/text-to-speech/{JASON_VOICE_ID}",
-            headers={
-                "xi-api-key": ELEVENLABS_API_KEY,
-                "Content-Type": "application/json"
-            },
-            json={
-                "text": script_text[:5000],  # ElevenLabs limit
-                "model_id": "eleven_multilingual_v2",
-                "voice_settings": {
-                    "stability": 0.50,
-                    "similarity_boost": 0.80,
-                    "style": 0.45
-                }
-            },
-            timeout=120,
-            verify=certifi.where()
-        )
-        
-        if response.status_code == 200:
-            # Return base64 encoded audio (Vercel is read-only filesystem)
-            audio_base64 = base64.b64encode(response.content).decode('utf-8')
-            return audio_base64, None
-        else:
-            return None, f"Voice generation error: {response.status_code} - {response.text[:200]}"
+        audio_bytes = _synthesize_chunk(script_text[:5000], JASON_VOICE_ID, ELEVENLABS_API_KEY)  # ElevenLabs limit
+        # Return base64 encoded audio (Vercel is read-only filesystem)
+        with metrics.span('base64'):
+            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+        with metrics.span('store'):
+            stored = store_audio(audio_bytes)
+        return {'audio_base64': audio_base64, **stored}, None
             
     except Exception as e:
         return None, f"Voice generation error: {str(e)}"
@@ -275,7 +333,9 @@ def api_generate():
     time.sleep(0.5)
     
     # Generate script
-    script, is_demo = generate_keynote_script(topic, duration, style)
+    script, is_demo = generate_keynote_script(topic, duration, style, fresh=bool(data.get('fresh')))
+    with metrics.span('desmell'):
+        script = desmell(script)
     
     return jsonify({
         'script': script,
@@ -286,6 +346,52 @@ def api_generate():
         'demo_mode': is_demo
     })
 
+@app.route('/api/generate/stream', methods=['POST'])
+def api_generate_stream():
+    """Stream script text to the browser as SSE `delta` events, then one `done` event."""
+    data = request.json
+    topic = data.get('topic', '')
+    duration = data.get('duration', '2 min')
+    style = data.get('style', 'inspirational')
+
+    if not topic:
+        return jsonify({'error': 'Topic required'}), 400
+
+    def events():
+        parts = []
+        is_demo = False
+        cleaner = DesmellStream()
+        try:
+            for delta, is_demo in stream_keynote_script(topic, duration, style, fresh=bool(data.get('fresh'))):
+                # Cleaned text lags the raw stream only by the tail a pattern could still span
+                text = cleaner.feed(delta)
+                if text:
+                    parts.append(text)
+                    yield _sse('delta', {'text': text})
+        except Exception as e:
+            yield _sse('error', {'error': f'Generation failed: {str(e)[:300]}'})
+            return
+
+        text = cleaner.flush()
+        if text:
+            parts.append(text)
+            yield _sse('delta', {'text': text})
+
+        script = ''.join(parts)
+        yield _sse('done', {
+            'topic': topic,
+            'duration': duration,
+            'word_count': len(script.split()),
+            'generated_at': datetime.now().isoformat(),
+            'demo_mode': is_demo
+        })
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/voice', methods=['POST'])
 def api_voice():
     data = request.json
@@ -294,17 +400,52 @@ def api_voice():
     if not script:
         return jsonify({'error': 'Script required'}), 400
     
-    audio_base64, error = generate_voice(script)
+    voice, error = generate_voice(script)
     
     if error:
         return jsonify({'error': error}), 500
     
     return jsonify({
-        'audio_base64': audio_base64,
+        **voice,
         'audio_mime': 'audio/mpeg',
         'duration_estimate': len(script.split()) / 130
     })
 
+@app.route('/api/voice/stream', methods=['POST'])
+def api_voice_stream():
+    """Stream MP3 audio straight through from ElevenLabs (chunked audio/mpeg, no base64).
+
+    Accepts either {script} for a short-form script or {text, previous_text, next_text} for one long-form chunk.
+    """
+    from longform_engine import stream_chunk
+
+    data = request.json
+    text = data.get('text') or data.get('script', '')[:5000]  # ElevenLabs limit
+
+    if not text:
+        return jsonify({'error': 'Text required'}), 400
+
+    api_key = get_elevenlabs_key()
+    if not api_key:
+        return jsonify({'error': 'Voice generation requires ElevenLabs API key'}), 500
+
+    try:
+        blocks = stream_chunk(
+            text, JASON_VOICE_ID, api_key,
+            data.get('previous_text'), data.get('next_text')
+        )
+    except Exception as e:
+        return jsonify({'error': f'Voice synthesis failed: {str(e)[:200]}'}), 500
+
+    response = Response(
+        stream_with_context(blocks),
+        mimetype='audio/mpeg',
+        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+    )
+    # Frees the ElevenLabs slot even if the client leaves before the body is read
+    response.call_on_close(blocks.close)
+    return response
+
 @app.route('/api/longform/outline', methods=['POST'])
 def api_longform_outline():
     """Step 1: Generate outline only. Single API call, fast."""
@@ -320,7 +461,7 @@ def api_longform_outline():
     duration = max(10, min(45, int(duration)))
 
     try:
-        outline = generate_outline(topic, duration)
+        outline = generate_outline(topic, duration, fresh=bool(data.get('fresh')))
         return jsonify(outline)
     except Exception as e:
         return jsonify({'error': f'Outline generation failed: {str(e)[:300]}'}), 500
@@ -329,36 +470,117 @@ def api_longform_outline():
 @app.route('/api/longform/section', methods=['POST'])
 def api_longform_section():
     """Step 2: Generate one section. Single API call per section."""
-    from longform_engine import generate_section, _desmell_text
+    from longform_engine import generate_section, _desmell_text, _section_summary
+    from quote_ledger import load_ledger, new_ledger_id, save_ledger
 
     data = request.json
     section_outline = data.get('section_outline', {})
     previous_summaries = data.get('previous_summaries', [])
-    used_quotes = data.get('used_quotes', [])
     topic = data.get('topic', '')
 
     if not topic or not section_outline:
         return jsonify({'error': 'Topic and section_outline required'}), 400
 
+    # Used quotes are kept server-side per keynote; the client only echoes ledger_id.
+    # A used_quotes list is still accepted from older clients.
+    ledger_id = data.get('ledger_id') or new_ledger_id()
+    ledger = load_ledger(ledger_id)
+    ledger.extend(data.get('used_quotes') or [])
+
     try:
         text, new_quotes = generate_section(
-            section_outline, previous_summaries, used_quotes, topic
+            section_outline, previous_summaries, ledger, topic
         )
         text = _desmell_text(text)
+        ledger.extend(new_quotes)
+        save_ledger(ledger_id, ledger)
 
-        words = text.split()
-        summary = f"Section {section_outline.get('section_number', '?')} ({section_outline.get('name', '')}): {' '.join(words[:50])}..."
+        summary = _section_summary(section_outline.get('section_number', '?'), section_outline, text)
 
         return jsonify({
             'text': text,
             'new_quotes': new_quotes,
+            'ledger_id': ledger_id,
             'summary': summary,
-            'word_count': len(words)
+            'word_count': len(text.split())
         })
     except Exception as e:
         return jsonify({'error': f'Section generation failed: {str(e)[:300]}'}), 500
 
 
+@app.route('/api/jobs', methods=['POST'])
+def api_jobs_submit():
+    """Submit a whole long-form run (outline → sections → optional voice) as one background job."""
+    from jobs import JOBS
+
+    data = request.json
+    topic = data.get('topic', '')
+    duration = data.get('duration_minutes', 45)
+
+    if not topic:
+        return jsonify({'error': 'Topic required'}), 400
+
+    duration = max(10, min(45, int(duration)))
+
+    job = JOBS.submit(
+        topic, duration,
+        voice=bool(data.get('voice')),
+        parallel=bool(data.get('parallel'))
+    )
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}',
+        'events_url': f'/api/jobs/{job.id}/events'
+    }), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_jobs_status(job_id):
+    """Poll a job: status, events after ?since=N, and with ?result=1 the result once done."""
+    from jobs import JOBS
+
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    since = request.args.get('since', 0, type=int)
+    include_result = request.args.get('result', '').lower() in ('1', 'true', 'yes')
+    return jsonify(job.to_dict(since=since, include_result=include_result))
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def api_jobs_events(job_id):
+    """Stream a job's progress stages as SSE `progress` events, then one `done`/`failed` event with the result."""
+    from jobs import JOBS
+
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    since = request.args.get('since', 0, type=int)
+
+    def events():
+        cursor = since
+        while True:
+            new_events = job.wait_for_events(cursor)
+            cursor += len(new_events)
+            for event in new_events:
+                if event['stage'] not in ('done', 'failed'):
+                    yield _sse('progress', event)
+            if job.finished and cursor >= len(job.events):
+                yield _sse(job.status, job.to_dict(since=cursor, include_result=True))
+                return
+            if not new_events:
+                yield ': keep-alive\n\n'
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/voice/chunk', methods=['POST'])
 def api_voice_chunk():
     """Generate voice for a single text chunk. One ElevenLabs call."""
@@ -378,7 +600,8 @@ def api_voice_chunk():
 
     try:
         audio_bytes = _synthesize_chunk(text, JASON_VOICE_ID, api_key, previous_text, next_text)
-        audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
+        with metrics.span('base64'):
+            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
         return jsonify({
             'audio_base64': audio_b64,
             'audio_mime': 'audio/mpeg'
@@ -387,10 +610,41 @@ def api_voice_chunk():
         return jsonify({'error': f'Voice synthesis failed: {str(e)[:200]}'}), 500
 
 
+@app.route('/api/audio/<audio_id>', methods=['GET'])
+def api_audio(audio_id):
+    """Serve stored keynote audio with Range, ETag and conditional GET, so players can seek and replay."""
+    path = AUDIO_STORE.path(audio_id) if is_audio_id(audio_id) else None
+    if path is None:
+        return jsonify({'error': 'Audio not found'}), 404
+
+    # The id is the content hash, so the bytes behind a URL never change
+    response = send_file(
+        path, mimetype='audio/mpeg', conditional=True, etag=audio_id,
+        download_name=f'{audio_id}.mp3', max_age=31536000
+    )
+    response.cache_control.immutable = True
+    return response
+
+
+def _chunk_targets(data):
+    """(target_chunks, max_latency) from a voice/split body as int / float or None. Raises ValueError."""
+    target_chunks, max_latency = data.get('target_chunks'), data.get('max_latency')
+    try:
+        target_chunks = int(target_chunks) if target_chunks not in (None, '') else None
+        max_latency = float(max_latency) if max_latency not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError('target_chunks must be an integer and max_latency a number of seconds')
+    if (target_chunks is not None and target_chunks < 1) or (max_latency is not None and not 0 < max_latency < float('inf')):
+        raise ValueError('target_chunks and max_latency must be positive')
+    return target_chunks, max_latency
+
 @app.route('/api/voice/split', methods=['POST'])
 def api_voice_split():
-    """Split script text into chunks for sequential voice synthesis."""
-    from longform_engine import _split_into_chunks
+    """Split script text into size-balanced chunks for voice synthesis.
+
+    Optional target_chunks / max_latency (seconds) raise the chunk count; offsets index into text.
+    """
+    from chunker import plan_chunks
 
     data = request.json
     text = data.get('text', '')
@@ -398,19 +652,71 @@ def api_voice_split():
     if not text:
         return jsonify({'error': 'Text required'}), 400
 
-    chunks = _split_into_chunks(text, max_chars=4500)
+    try:
+        target_chunks, max_latency = _chunk_targets(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with metrics.span('chunking'):
+        spans = plan_chunks(text, max_chars=4500, target_chunks=target_chunks, max_latency=max_latency)
     return jsonify({
-        'chunks': chunks,
-        'count': len(chunks)
+        'chunks': [text[start:end] for start, end in spans],
+        'offsets': spans,
+        'count': len(spans)
     })
 
 
-@app.route('/api/guardrails', methods=['POST'])
-def api_guardrails():
+def service_status():
+    """Which upstreams are configured and usable right now, with their circuit breaker state."""
+    anthropic_ready = bool(get_anthropic_key()) and not breaker.is_open('anthropic')
+    return {
+        'demo_mode': not anthropic_ready,
+        'voice_available': bool(get_elevenlabs_key()) and not breaker.is_open('elevenlabs'),
+        'configured': {
+            'anthropic': bool(get_anthropic_key()),
+            'elevenlabs': bool(get_elevenlabs_key())
+        },
+        'upstreams': breaker.status()
+    }
+
+
+@app.route('/api/status', methods=['GET'])
+def api_status():
+    """Upstream health: circuit breaker state, rolling failure rate and latency per upstream."""
+    return jsonify(service_status())
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """Hit/miss counters for the server-side caches, plus Anthropic prompt-cache token usage."""
+    from audio_cache import AUDIO_CACHE
+
+    return jsonify({
+        'audio': AUDIO_CACHE.stats(),
+        'scripts': SCRIPT_CACHE.stats(),
+        'audio_store': AUDIO_STORE.stats(),
+        'prompt_cache': upstream.usage_stats()
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    """Prometheus metrics: stage latencies, request latencies, upstream counters and cache gauges."""
+    from audio_cache import AUDIO_CACHE
+
+    body = metrics.render({
+        'audio_cache': AUDIO_CACHE.stats(),
+        'script_cache': SCRIPT_CACHE.stats(),
+        'audio_store': AUDIO_STORE.stats(),
+        'prompt_cache': upstream.usage_stats(),
+        'model_tokens_per_second': model_router.stats(),
+        **breaker.gauges()
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+def check_guardrails(script):
     """Check content against guardrails."""
-    data = request.json
-    script = data.get('script', '')
-    
     forbidden_topics = ['politics', 'religion', 'medical advice', 'financial advice']
     checks = {
         'topic_check': True,
@@ -426,7 +732,13 @@ def api_guardrails():
     
     checks['approved'] = len(checks['content_flags']) == 0
     
-    return jsonify(checks)
+    return checks
+
+@app.route('/api/guardrails', methods=['POST'])
+def api_guardrails():
+    """Check content against guardrails."""
+    data = request.json
+    return jsonify(check_guardrails(data.get('script', '')))
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,585 @@
+"""
+Async serving mode for Jason Silva AI
+ASGI twin of app.py: same routes and payloads, but upstream calls to Anthropic/ElevenLabs
+never hold a worker thread, so one process can keep hundreds of generations in flight.
+
+Run with:  uvicorn asgi:app --port 5000
+"""
+
+import os
+import json
+import time
+import base64
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.middleware import Middleware
+from starlette.routing import Route
+
+import breaker
+import deadline
+import metrics
+import model_router
+import upstream
+import upstream_async
+import longform_async
+from app import (
+    JASON_VOICE_ID, get_anthropic_key, get_elevenlabs_key, get_demo_script, check_guardrails, service_status,
+    _build_keynote_prompts, _chunk_targets, _iter_demo_words, _script_words, _sse
+)
+from audio_cache import AUDIO_CACHE
+from audio_store import AUDIO_STORE, is_audio_id, store_audio
+from chunker import plan_chunks
+from desmell import DesmellStream, desmell
+from quote_ledger import load_ledger, new_ledger_id, save_ledger
+from script_cache import SCRIPT_CACHE, request_key
+from longform_engine import _desmell_text, _section_summary
+
+_index_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+
+# --- Short-form generation ---
+
+async def generate_keynote_script(topic, duration="10 min", style="inspirational", fresh=False):
+    """Async generate_keynote_script: AI script or demo fallback, via the shared script cache."""
+    if not get_anthropic_key():
+        return get_demo_script(topic), True
+
+    async def request_script():
+        breaker.check("anthropic")
+        system_prompt, user_prompt = await asyncio.to_thread(_build_keynote_prompts, topic, duration, style)
+        route = model_router.route("script", _script_words(duration))
+        with metrics.span("script_llm", tier=route.tier):
+            return await longform_async.call_anthropic(
+                system_prompt, user_prompt, max_tokens=route.max_tokens, temperature=0.8, model=route.model, timeout=30
+            )
+
+    try:
+        script = await SCRIPT_CACHE.aget_or_compute(
+            request_key("keynote", topic=topic, duration=duration, style=style),
+            request_script,
+            fresh=fresh
+        )
+        return script, False
+    except Exception:
+        # API or network error - fallback to demo
+        return get_demo_script(topic), True
+
+
+async def stream_keynote_script(topic, duration="10 min", style="inspirational", fresh=False):
+    """Async stream_keynote_script: yields (text_delta, is_demo) pairs."""
+    api_key = get_anthropic_key()
+
+    if not api_key:
+        for word in _iter_demo_words(get_demo_script(topic)):
+            yield word, True
+        return
+
+    cache_key = request_key("keynote", topic=topic, duration=duration, style=style)
+    cached = None if fresh else await asyncio.to_thread(SCRIPT_CACHE.get, cache_key)
+    if cached is not None:
+        for word in _iter_demo_words(cached):
+            yield word, False
+        return
+
+    if breaker.is_open("anthropic"):
+        for word in _iter_demo_words(get_demo_script(topic)):
+            yield word, True
+        return
+
+    # Join any identical generation already in flight (streamed or not) rather than start another
+    lead = None
+    if not fresh:
+        try:
+            cached, lead = await SCRIPT_CACHE.ajoin(cache_key)
+        except deadline.DeadlineExceeded:
+            for word in _iter_demo_words(get_demo_script(topic)):
+                yield word, True
+            return
+        if cached is not None:
+            for word in _iter_demo_words(cached):
+                yield word, False
+            return
+
+    script = None
+    try:
+        # KB retrieval (loaded on first use, BM25-scored) is CPU / disk bound: keep it off the loop
+        system_prompt, user_prompt = await asyncio.to_thread(_build_keynote_prompts, topic, duration, style)
+        route = model_router.route("script", _script_words(duration))
+        payload = {
+            "model": route.model,
+            "max_tokens": model_router.stream_tokens(route),
+            "temperature": 0.8,
+            "stream": True,
+            "system": upstream.fit_cache(system_prompt, model_router.min_cache_tokens(route.model)),
+            "messages": [{"role": "user", "content": user_prompt}]
+        }
+
+        started = False
+        parts = []
+        usage = {}
+        stop_reason = None
+        start = time.perf_counter()
+        try:
+            async with upstream_async.stream(
+                "anthropic", "/v1/messages",
+                headers=upstream.anthropic_headers(api_key), json=payload, timeout=30
+            ) as response:
+                if response.status_code != 200:
+                    raise upstream.UpstreamError(f"Anthropic API error {response.status_code}", status_code=response.status_code)
+                async for event, data in upstream_async.aiter_sse(response):
+                    if event == 'content_block_delta':
+                        delta = json.loads(data).get('delta', {})
+                        if delta.get('type') == 'text_delta':
+                            started = True
+                            parts.append(delta['text'])
+                            yield delta['text'], False
+                    elif event == 'message_start':
+                        usage.update(json.loads(data).get('message', {}).get('usage', {}))
+                    elif event == 'message_delta':
+                        message_delta = json.loads(data)
+                        usage.update(message_delta.get('usage', {}))
+                        stop_reason = message_delta.get('delta', {}).get('stop_reason')
+                    elif event == 'error':
+                        raise Exception(f"Anthropic stream error: {data[:300]}")
+                    elif event == 'message_stop':
+                        upstream.record_usage(usage)
+                        model_router.record(route.model, time.perf_counter() - start, usage.get('output_tokens') or 0)
+                        # Already streamed, so it can't be retried — but a script cut off at max_tokens is never cached
+                        if stop_reason == 'max_tokens':
+                            metrics.inc('truncated_responses_total', tier=route.tier)
+                        else:
+                            script = ''.join(parts)
+                        break
+        except Exception:
+            if started:
+                raise
+            for word in _iter_demo_words(get_demo_script(topic)):
+                yield word, True
+    finally:
+        # Wakes requests that joined this one; they generate for themselves if script is None
+        if lead is not None:
+            await SCRIPT_CACHE.aland(lead, script)
+        elif script is not None:
+            await asyncio.to_thread(SCRIPT_CACHE.put, cache_key, script)
+
+
+# --- Routes ---
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that always acloses its body, even when the client left before it was
+    iterated (Starlette skips `background` then), so upstream slots can't leak."""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return {}
+
+
+def _since(request):
+    """?since=N like Flask's request.args.get('since', 0, type=int): 0 when missing or not a number."""
+    try:
+        return int(request.query_params.get('since', 0))
+    except ValueError:
+        return 0
+
+
+async def index(request):
+    with open(_index_path) as f:
+        return HTMLResponse(f.read())
+
+
+async def api_generate(request):
+    data = await _json_body(request)
+    topic = data.get('topic', '')
+    duration = data.get('duration', '2 min')
+    style = data.get('style', 'inspirational')
+
+    if not topic:
+        return JSONResponse({'error': 'Topic required'}, status_code=400)
+
+    script, is_demo = await generate_keynote_script(topic, duration, style, fresh=bool(data.get('fresh')))
+    with metrics.span('desmell'):
+        script = await asyncio.to_thread(desmell, script)
+
+    return JSONResponse({
+        'script': script,
+        'topic': topic,
+        'duration': duration,
+        'word_count': len(script.split()),
+        'generated_at': datetime.now().isoformat(),
+        'demo_mode': is_demo
+    })
+
+
+async def api_generate_stream(request):
+    data = await _json_body(request)
+    topic = data.get('topic', '')
+    duration = data.get('duration', '2 min')
+    style = data.get('style', 'inspirational')
+
+    if not topic:
+        return JSONResponse({'error': 'Topic required'}, status_code=400)
+
+    async def events():
+        parts = []
+        is_demo = False
+        cleaner = DesmellStream()
+        try:
+            async for delta, is_demo in stream_keynote_script(topic, duration, style, fresh=bool(data.get('fresh'))):
+                # Cleaned text lags the raw stream only by the tail a pattern could still span
+                text = cleaner.feed(delta)
+                if text:
+                    parts.append(text)
+                    yield _sse('delta', {'text': text})
+        except Exception as e:
+            yield _sse('error', {'error': f'Generation failed: {str(e)[:300]}'})
+            return
+
+        text = cleaner.flush()
+        if text:
+            parts.append(text)
+            yield _sse('delta', {'text': text})
+
+        script = ''.join(parts)
+        yield _sse('done', {
+            'topic': topic,
+            'duration': duration,
+            'word_count': len(script.split()),
+            'generated_at': datetime.now().isoformat(),
+            'demo_mode': is_demo
+        })
+
+    return StreamingResponse(
+        events(), media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def api_voice(request):
+    data = await _json_body(request)
+    script = data.get('script', '')
+
+    if not script:
+        return JSONResponse({'error': 'Script required'}, status_code=400)
+
+    api_key = get_elevenlabs_key()
+    if not api_key:
+        return JSONResponse({'error': 'Voice generation requires ElevenLabs API key'}, status_code=500)
+
+    try:
+        audio_bytes = await longform_async.synthesize_chunk(script[:5000], JASON_VOICE_ID, api_key)  # ElevenLabs limit
+    except Exception as e:
+        return JSONResponse({'error': f'Voice generation error: {str(e)}'}, status_code=500)
+
+    with metrics.span('base64'):
+        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+    with metrics.span('store'):
+        stored = await asyncio.to_thread(store_audio, audio_bytes)
+    return JSONResponse({
+        'audio_base64': audio_base64,
+        **stored,
+        'audio_mime': 'audio/mpeg',
+        'duration_estimate': len(script.split()) / 130
+    })
+
+
+async def api_voice_stream(request):
+    data = await _json_body(request)
+    text = data.get('text') or data.get('script', '')[:5000]  # ElevenLabs limit
+
+    if not text:
+        return JSONResponse({'error': 'Text required'}, status_code=400)
+
+    api_key = get_elevenlabs_key()
+    if not api_key:
+        return JSONResponse({'error': 'Voice generation requires ElevenLabs API key'}, status_code=500)
+
+    try:
+        blocks = await longform_async.stream_chunk(
+            text, JASON_VOICE_ID, api_key,
+            data.get('previous_text'), data.get('next_text')
+        )
+    except Exception as e:
+        return JSONResponse({'error': f'Voice synthesis failed: {str(e)[:200]}'}, status_code=500)
+
+    return _ClosingStreamingResponse(
+        blocks, media_type='audio/mpeg',
+        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def api_longform_outline(request):
+    """Step 1: Generate outline only. Single API call, fast."""
+    data = await _json_body(request)
+    topic = data.get('topic', '')
+    duration = data.get('duration_minutes', 45)
+
+    if not topic:
+        return JSONResponse({'error': 'Topic required'}, status_code=400)
+
+    duration = max(10, min(45, int(duration)))
+
+    try:
+        outline = await longform_async.generate_outline(topic, duration, fresh=bool(data.get('fresh')))
+        return JSONResponse(outline)
+    except Exception as e:
+        return JSONResponse({'error': f'Outline generation failed: {str(e)[:300]}'}, status_code=500)
+
+
+async def api_longform_section(request):
+    """Step 2: Generate one section. Single API call per section."""
+    data = await _json_body(request)
+    section_outline = data.get('section_outline', {})
+    previous_summaries = data.get('previous_summaries', [])
+    topic = data.get('topic', '')
+
+    if not topic or not section_outline:
+        return JSONResponse({'error': 'Topic and section_outline required'}, status_code=400)
+
+    ledger_id = data.get('ledger_id') or new_ledger_id()
+    ledger = await asyncio.to_thread(load_ledger, ledger_id)
+    ledger.extend(data.get('used_quotes') or [])
+
+    try:
+        text, new_quotes = await longform_async.generate_section(
+            section_outline, previous_summaries, ledger, topic
+        )
+        text = await asyncio.to_thread(_desmell_text, text)
+        ledger.extend(new_quotes)
+        await asyncio.to_thread(save_ledger, ledger_id, ledger)
+
+        return JSONResponse({
+            'text': text,
+            'new_quotes': new_quotes,
+            'ledger_id': ledger_id,
+            'summary': _section_summary(section_outline.get('section_number', '?'), section_outline, text),
+            'word_count': len(text.split())
+        })
+    except Exception as e:
+        return JSONResponse({'error': f'Section generation failed: {str(e)[:300]}'}, status_code=500)
+
+
+async def api_jobs_submit(request):
+    """Submit a whole long-form run as one background job (worker threads, see jobs.py)."""
+    from jobs import JOBS
+
+    data = await _json_body(request)
+    topic = data.get('topic', '')
+    duration = data.get('duration_minutes', 45)
+
+    if not topic:
+        return JSONResponse({'error': 'Topic required'}, status_code=400)
+
+    duration = max(10, min(45, int(duration)))
+
+    job = JOBS.submit(topic, duration, voice=bool(data.get('voice')), parallel=bool(data.get('parallel')))
+    return JSONResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}',
+        'events_url': f'/api/jobs/{job.id}/events'
+    }, status_code=202)
+
+
+async def api_jobs_status(request):
+    from jobs import JOBS
+
+    job = JOBS.get(request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({'error': 'Job not found'}, status_code=404)
+
+    since = _since(request)
+    include_result = request.query_params.get('result', '').lower() in ('1', 'true', 'yes')
+    return JSONResponse(job.to_dict(since=since, include_result=include_result))
+
+
+async def api_jobs_events(request):
+    from jobs import JOBS
+
+    job = JOBS.get(request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({'error': 'Job not found'}, status_code=404)
+
+    since = _since(request)
+
+    async def events():
+        cursor = since
+        while True:
+            new_events = await job.await_events(cursor)
+            cursor += len(new_events)
+            for event in new_events:
+                if event['stage'] not in ('done', 'failed'):
+                    yield _sse('progress', event)
+            if job.finished and cursor >= len(job.events):
+                yield _sse(job.status, job.to_dict(since=cursor, include_result=True))
+                return
+            if not new_events:
+                yield ': keep-alive\n\n'
+
+    return StreamingResponse(
+        events(), media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def api_voice_chunk(request):
+    """Generate voice for a single text chunk. One ElevenLabs call."""
+    data = await _json_body(request)
+    text = data.get('text', '')
+
+    if not text:
+        return JSONResponse({'error': 'Text required'}, status_code=400)
+
+    api_key = get_elevenlabs_key()
+    if not api_key:
+        return JSONResponse({'error': 'ElevenLabs API key not configured'}, status_code=500)
+
+    try:
+        audio_bytes = await longform_async.synthesize_chunk(
+            text, JASON_VOICE_ID, api_key, data.get('previous_text'), data.get('next_text')
+        )
+        with metrics.span('base64'):
+            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+        return JSONResponse({
+            'audio_base64': audio_base64,
+            'audio_mime': 'audio/mpeg'
+        })
+    except Exception as e:
+        return JSONResponse({'error': f'Voice synthesis failed: {str(e)[:200]}'}, status_code=500)
+
+
+async def api_audio(request):
+    """Stored keynote audio; FileResponse handles Range / If-Range, If-None-Match is answered here."""
+    audio_id = request.path_params['audio_id']
+    path = await asyncio.to_thread(AUDIO_STORE.path, audio_id) if is_audio_id(audio_id) else None
+    if path is None:
+        return JSONResponse({'error': 'Audio not found'}, status_code=404)
+
+    etag = f'"{audio_id}"'
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=31536000, immutable'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type='audio/mpeg', headers=headers)
+
+
+async def api_voice_split(request):
+    """Split script text into size-balanced chunks for voice synthesis."""
+    data = await _json_body(request)
+    text = data.get('text', '')
+
+    if not text:
+        return JSONResponse({'error': 'Text required'}, status_code=400)
+
+    try:
+        target_chunks, max_latency = _chunk_targets(data)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    with metrics.span('chunking'):
+        spans = plan_chunks(text, max_chars=4500, target_chunks=target_chunks, max_latency=max_latency)
+    return JSONResponse({'chunks': [text[start:end] for start, end in spans], 'offsets': spans, 'count': len(spans)})
+
+
+async def api_status(request):
+    return JSONResponse(service_status())
+
+
+async def api_cache_stats(request):
+    return JSONResponse({
+        'audio': AUDIO_CACHE.stats(),
+        'scripts': SCRIPT_CACHE.stats(),
+        'audio_store': AUDIO_STORE.stats(),
+        'prompt_cache': upstream.usage_stats()
+    })
+
+
+async def api_metrics(request):
+    body = metrics.render({
+        'audio_cache': AUDIO_CACHE.stats(),
+        'script_cache': SCRIPT_CACHE.stats(),
+        'audio_store': AUDIO_STORE.stats(),
+        'prompt_cache': upstream.usage_stats(),
+        'model_tokens_per_second': model_router.stats(),
+        **breaker.gauges()
+    })
+    return PlainTextResponse(body, media_type='text/plain; version=0.0.4')
+
+
+async def api_guardrails(request):
+    data = await _json_body(request)
+    return JSONResponse(check_guardrails(data.get('script', '')))
+
+
+class TraceMiddleware:
+    """Times every HTTP request to its last body byte, records its stage spans and starts its deadline."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = metrics.start_trace(scope['method'], 'unmatched')
+        deadline.start(deadline.REQUEST_DEADLINE_SECONDS)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched endpoint in scope; label by its path template
+            trace.route = _route_paths.get(scope.get('endpoint'), 'unmatched')
+            metrics.finish_trace(trace, status)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await upstream_async.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/api/generate', api_generate, methods=['POST']),
+        Route('/api/generate/stream', api_generate_stream, methods=['POST']),
+        Route('/api/voice', api_voice, methods=['POST']),
+        Route('/api/voice/stream', api_voice_stream, methods=['POST']),
+        Route('/api/longform/outline', api_longform_outline, methods=['POST']),
+        Route('/api/longform/section', api_longform_section, methods=['POST']),
+        Route('/api/jobs', api_jobs_submit, methods=['POST']),
+        Route('/api/jobs/{job_id}', api_jobs_status, methods=['GET']),
+        Route('/api/jobs/{job_id}/events', api_jobs_events, methods=['GET']),
+        Route('/api/voice/chunk', api_voice_chunk, methods=['POST']),
+        Route('/api/voice/split', api_voice_split, methods=['POST']),
+        Route('/api/audio/{audio_id}', api_audio, methods=['GET']),
+        Route('/api/status', api_status, methods=['GET']),
+        Route('/api/cache/stats', api_cache_stats, methods=['GET']),
+        Route('/api/guardrails', api_guardrails, methods=['POST']),
+        Route('/metrics', api_metrics, methods=['GET']),
+    ],
+    middleware=[Middleware(TraceMiddleware)],
+    lifespan=lifespan
+)
+
+_route_paths = {route.endpoint: route.path for route in app.routes}
@@ -0,0 +1,289 @@
+"""
+Content-addressed cache for synthesized audio
+In-memory LRU in front of a size-capped disk tier. Keys hash everything that changes the audio.
+"""
+
+import os
+import json
+import hashlib
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+
+AUDIO_CACHE_MEMORY_BYTES = int(os.getenv('AUDIO_CACHE_MEMORY_MB', '64')) * 1024 * 1024
+AUDIO_CACHE_DISK_BYTES = int(os.getenv('AUDIO_CACHE_DISK_MB', '512')) * 1024 * 1024
+# /tmp is the only writable path on Vercel; set AUDIO_CACHE_DIR="" to disable the disk tier
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'jason_audio_cache'))
+# Streamed audio is spooled straight to the disk tier; without one, a stream is held in memory
+# for caching only up to this size, then dropped uncached
+AUDIO_CACHE_STREAM_BUFFER_BYTES = int(float(os.getenv('AUDIO_CACHE_STREAM_BUFFER_MB', '1')) * 1024 * 1024)
+# Spool (.part) files untouched this long belong to a writer that died; eviction removes them
+SPOOL_STALE_SECONDS = 3600
+
+
+def cache_key(voice_id, payload):
+    """Hash of voice + TTS payload (text, model_id, voice_settings, previous/next context)."""
+    canonical = json.dumps({"voice_id": voice_id, **payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class StreamWriter:
+    """Caches audio as it streams past: blocks go to a temp file in the disk tier (or a small
+    memory buffer without one) and only commit() makes them visible. Oversized streams stop
+    being kept and are never cached."""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.size = 0
+        self._file = None
+        self._tmp_path = None
+        self._parts = []
+        self._dropped = False
+        if cache._disk_ready():
+            try:
+                fd, self._tmp_path = tempfile.mkstemp(dir=cache.disk_dir, suffix='.part')
+                self._file = os.fdopen(fd, 'wb')
+            except OSError:
+                self._tmp_path = None
+
+    def write(self, block):
+        if self._dropped:
+            return
+        self.size += len(block)
+        limit = self.cache.disk_bytes if self._file else min(AUDIO_CACHE_STREAM_BUFFER_BYTES, self.cache.memory_bytes)
+        if self.size > limit:
+            self.abort()
+            return
+        try:
+            if self._file:
+                self._file.write(block)
+            else:
+                self._parts.append(block)
+        except OSError:
+            self.abort()
+
+    def commit(self):
+        """The stream finished: store what was kept under the key."""
+        if self._dropped:
+            return
+        if self._file:
+            try:
+                self._file.close()
+            except OSError:
+                self.abort()
+                return
+            self._file = None
+            self.cache._adopt(self.key, self._tmp_path, self.size)
+        else:
+            self.cache.put(self.key, b"".join(self._parts))
+        self._dropped = True
+
+    def abort(self):
+        """Discard the partial stream (client went away, upstream failed, or it grew too large)."""
+        self._dropped = True
+        self._parts = []
+        if self._file:
+            try:
+                self._file.close()
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+            self._file = None
+
+
+class AudioCache:
+    """Two-tier byte cache: LRU in memory, then files on disk evicted oldest-first past a size cap.
+
+    The lock covers only the memory tier and the bookkeeping; file reads, writes and the eviction
+    scan run outside it, which write-then-rename keeps safe.
+    """
+
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None  # scanned lazily on first disk access
+        self._lock = threading.Lock()
+        self._disk_init_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    # --- memory tier ---
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+            self.counters["evictions"] += 1
+
+    # --- disk tier ---
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.mp3")
+
+    def _ensure_disk(self):
+        """Create the cache dir, sweep stale spool files and total its size once.
+        Disables the disk tier if unwritable."""
+        if self._disk_used is not None or not self.disk_dir:
+            return
+        with self._disk_init_lock:
+            if self._disk_used is not None or not self.disk_dir:
+                return
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                used = sum(size for _, size, _ in self._scan_disk())
+            except OSError:
+                self.disk_dir = None
+                return
+            with self._lock:
+                self._disk_used = used
+
+    def _scan_disk(self):
+        """(mtime, size, path) of every cached file, removing .part spool files left behind by
+        writers that died mid-stream."""
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.disk_dir):
+            try:
+                stat = entry.stat()
+                if entry.name.endswith('.part'):
+                    if now - stat.st_mtime > SPOOL_STALE_SECONDS:
+                        os.remove(entry.path)
+                elif entry.name.endswith('.mp3'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                continue
+        return entries
+
+    def _added(self, size):
+        with self._lock:
+            self._disk_used += size
+            over = self._disk_used > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # One evictor at a time; anyone else over the cap leaves it to that one
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            for _, size, path in sorted(self._scan_disk()):
+                with self._lock:
+                    if self._disk_used <= self.disk_bytes:
+                        break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                with self._lock:
+                    self._disk_used -= size
+                    self.counters["evictions"] += 1
+        except OSError:
+            pass
+        finally:
+            self._evict_lock.release()
+
+    def _disk_ready(self):
+        self._ensure_disk()
+        return bool(self.disk_dir)
+
+    def _adopt(self, key, tmp_path, size):
+        """Move a fully written temp file from the disk tier into place under key."""
+        with self._lock:
+            self.counters["writes"] += 1
+        path = self._path(key)
+        try:
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._added(size)
+
+    # --- public API ---
+
+    def get(self, key):
+        """Cached bytes for key, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return data
+
+        self._ensure_disk()
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)  # mtime doubles as last-used time for eviction
+            except OSError:
+                data = None
+
+        with self._lock:
+            if data is None:
+                self.counters["misses"] += 1
+                return None
+            self._remember(key, data)
+            self.counters["disk_hits"] += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+            self.counters["writes"] += 1
+
+        self._ensure_disk()
+        if not self.disk_dir or len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        tmp_path = None
+        try:
+            # Write-then-rename so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.part')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+        self._added(len(data))
+
+    def writer(self, key):
+        """StreamWriter that caches a stream under key as its blocks arrive, without holding it all."""
+        return StreamWriter(self, key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_bytes": self._disk_used or 0,
+                "disk_enabled": bool(self.disk_dir),
+            }
+
+
+AUDIO_CACHE = AudioCache(AUDIO_CACHE_MEMORY_BYTES, AUDIO_CACHE_DIR, AUDIO_CACHE_DISK_BYTES)
@@ -0,0 +1,111 @@
+"""
+Frame-aware MP3 stitching
+Joins per-chunk ElevenLabs MP3s into one stream in memory. Each chunk's ID3v2/ID3v1 tags and
+Xing/Info/VBRI (+LAME) header frame are cut away with memoryview slices, so the audio frames are
+copied exactly once into the output and players see one continuous CBR stream with the right
+duration and seek positions, instead of the first chunk's header describing the whole file.
+"""
+
+# Bitrates (kbps) by [version is MPEG1][layer] and bitrate index; index 0 (free) and 15 are invalid
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Sample rates by version bits (0 = MPEG2.5, 2 = MPEG2, 3 = MPEG1)
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+# How far past the tags to look for the first frame before giving up on parsing a chunk
+SYNC_SEARCH_BYTES = 64 * 1024
+
+ID3V1_SIZE = 128
+
+
+def frame_info(data, offset):
+    """(frame_length, is_mpeg1, is_mono) for a valid MPEG audio frame header at offset, else None."""
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = 4 - ((b1 >> 1) & 3)  # bits 01 = Layer III, 10 = II, 11 = I
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and not mpeg1:
+        length = 72 * bitrate // sample_rate + padding
+    else:
+        length = 144 * bitrate // sample_rate + padding
+    return length, mpeg1, (b3 >> 6) == 3
+
+
+def _skip_id3v2(data, offset):
+    """Offset just past any ID3v2 tags starting at offset."""
+    while data[offset:offset + 3] == b"ID3" and offset + 10 <= len(data):
+        size = 0
+        for byte in data[offset + 6:offset + 10]:
+            size = (size << 7) | (byte & 0x7F)  # syncsafe integer
+        footer = 10 if data[offset + 5] & 0x10 else 0
+        offset += 10 + size + footer
+    return offset
+
+
+def _first_frame(data, start, end):
+    """Offset of the first frame header that is followed by another frame (or the end), else None."""
+    limit = min(end - 4, start + SYNC_SEARCH_BYTES)
+    offset = data.find(b"\xff", start, end)
+    while 0 <= offset <= limit:
+        info = frame_info(data, offset)
+        if info:
+            following = offset + info[0]
+            if following == end or (following < end and frame_info(data, following)):
+                return offset
+        offset = data.find(b"\xff", offset + 1, end)
+    return None
+
+
+def _is_vbr_header(data, offset, info):
+    """True if the frame at offset carries a Xing/Info (with any LAME extension) or VBRI header."""
+    _, mpeg1, mono = info
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = offset + 4 + side_info
+    return data[xing:xing + 4] in (b"Xing", b"Info") or data[offset + 36:offset + 40] == b"VBRI"
+
+
+def audio_frames(data):
+    """memoryview over just the audio frames of one MP3 file (no tags, no VBR header frame).
+
+    Data that doesn't parse as MPEG audio is returned whole rather than risk dropping sound.
+    """
+    view = memoryview(data)
+    start = _skip_id3v2(data, 0)
+    end = len(data)
+    if end - start >= ID3V1_SIZE and data[end - ID3V1_SIZE:end - ID3V1_SIZE + 3] == b"TAG":
+        end -= ID3V1_SIZE
+
+    first = _first_frame(data, start, end)
+    if first is None:
+        return view[min(start, end):end]
+    info = frame_info(data, first)
+    if _is_vbr_header(data, first, info):
+        first += info[0]
+    return view[first:end]
+
+
+def stitch(chunks):
+    """Join MP3 chunks (bytes, in order) into one MP3 stream, copying each audio byte once."""
+    return b"".join(audio_frames(chunk) for chunk in chunks)
+
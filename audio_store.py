@@ -0,0 +1,155 @@
+"""
+Durable store for finished keynote audio
+Artifacts are content-addressed (sha256 of the MP3 bytes) and served from /api/audio/<id> with
+Range, ETag and conditional GET, so players can seek, replay and re-download without another
+synthesis. Backends are pluggable via AUDIO_STORE_BACKEND; local disk is the first one.
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+
+AUDIO_STORE_BACKEND = os.getenv('AUDIO_STORE_BACKEND', 'local')
+# /tmp is the only writable path on Vercel; set AUDIO_STORE_DIR="" to disable storing
+AUDIO_STORE_DIR = os.getenv('AUDIO_STORE_DIR', os.path.join(tempfile.gettempdir(), 'jason_audio_store'))
+AUDIO_STORE_MAX_BYTES = int(os.getenv('AUDIO_STORE_MAX_MB', '2048')) * 1024 * 1024
+
+_AUDIO_ID = re.compile(r"[0-9a-f]{64}")
+
+
+def audio_id_for(data):
+    """Content hash naming an artifact; doubles as its strong ETag."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_audio_id(value):
+    return bool(_AUDIO_ID.fullmatch(value or ""))
+
+
+def audio_url(audio_id):
+    return f"/api/audio/{audio_id}"
+
+
+class AudioStore(ABC):
+    """Artifact backend interface. Stored bytes never change, so ids are safe to cache forever."""
+
+    @abstractmethod
+    def put(self, data):
+        """Store MP3 bytes; returns the audio id, or None if the store is unavailable."""
+
+    @abstractmethod
+    def path(self, audio_id):
+        """Local file holding a stored artifact (servers answer Range requests from it), or None."""
+
+    def stats(self):
+        return {}
+
+
+class LocalDiskStore(AudioStore):
+    """Artifacts as <id>.mp3 files in one directory, evicted least-recently-served first past a size cap."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory or None
+        self.max_bytes = max_bytes
+        self._used = None  # scanned lazily on first access
+        self._lock = threading.Lock()
+        self.counters = {"writes": 0, "dedup_hits": 0, "reads": 0, "misses": 0, "evictions": 0}
+
+    def _file(self, audio_id):
+        return os.path.join(self.directory, f"{audio_id}.mp3")
+
+    def _ensure_dir(self):
+        """Create the store dir and total its size once. Disables the store if unwritable."""
+        if self._used is not None or not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._used = sum(
+                entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.mp3')
+            )
+        except OSError:
+            self.directory = None
+
+    def _evict(self):
+        if self._used <= self.max_bytes:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.mp3')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self._used <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._used -= size
+            self.counters["evictions"] += 1
+
+    def put(self, data):
+        audio_id = audio_id_for(data)
+        with self._lock:
+            self._ensure_dir()
+            if not self.directory or len(data) > self.max_bytes:
+                return None
+            path = self._file(audio_id)
+            if os.path.exists(path):
+                # Same audio already stored (e.g. a cached script voiced again)
+                os.utime(path)
+                self.counters["dedup_hits"] += 1
+                return audio_id
+            try:
+                # Write-then-rename so a concurrent GET never serves a partial file
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                return None
+            self._used += len(data)
+            self.counters["writes"] += 1
+            self._evict()
+            # The new artifact is the newest file, so eviction never removes it while others remain
+            return audio_id if os.path.exists(path) else None
+
+    def path(self, audio_id):
+        if not is_audio_id(audio_id):
+            return None
+        with self._lock:
+            self._ensure_dir()
+            if not self.directory:
+                return None
+            path = self._file(audio_id)
+            try:
+                os.utime(path)  # mtime doubles as last-served time for eviction
+            except OSError:
+                self.counters["misses"] += 1
+                return None
+            self.counters["reads"] += 1
+            return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "bytes": self._used or 0,
+                "enabled": bool(self.directory),
+            }
+
+
+BACKENDS = {
+    "local": lambda: LocalDiskStore(AUDIO_STORE_DIR, AUDIO_STORE_MAX_BYTES),
+}
+
+AUDIO_STORE = BACKENDS[AUDIO_STORE_BACKEND]()
+
+
+def store_audio(data):
+    """Store finished audio; returns {audio_id, audio_url} for the response, or {} if not stored."""
+    audio_id = AUDIO_STORE.put(data)
+    return {"audio_id": audio_id, "audio_url": audio_url(audio_id)} if audio_id else {}
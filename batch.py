@@ -0,0 +1,217 @@
+"""
+Batch keynote generation for Jason Silva AI
+Reads topics and durations from a CSV or JSONL file and runs generate_full_keynote (and
+optionally synthesize_long_audio) for many of them at once. Keynotes run on a bounded pool and
+share the process-wide Anthropic / ElevenLabs rate limiters, so total load stays within the
+plans' limits however many run together. Each keynote's files are written as soon as it
+finishes; finished outlines, sections, joins and voice chunks are checkpointed, so re-running
+an interrupted batch skips completed keynotes and resumes the rest without regenerating work.
+
+    python batch.py topics.csv --out keynotes/ --voice
+
+CSV needs a header with `topic` and `duration` columns (JSONL: one {"topic", "duration"}
+object per line); optional `id` names the output files and `voice` overrides --voice per row.
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import deadline
+import longform_engine
+from checkpoint import Checkpoint
+
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '2'))
+
+RESULTS_FILE = "results.jsonl"
+CHECKPOINT_DIR = ".checkpoints"
+
+TRUE_VALUES = ("1", "true", "yes", "y")
+
+_print_lock = threading.Lock()
+
+
+def _log(line):
+    """print() for lines coming from several keynote threads at once."""
+    with _print_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:48] or "keynote"
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def read_topics(path):
+    """Batch items from a CSV (header row) or JSONL file. Raises ValueError on a bad row."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    items = []
+    seen = set()
+    for n, row in enumerate(rows, start=1):
+        row = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+        topic = str(row.get("topic") or "").strip()
+        if not topic:
+            raise ValueError(f"{path}: row {n} has no topic")
+        try:
+            duration = int(row.get("duration") or row.get("duration_minutes") or 45)
+        except (TypeError, ValueError):
+            raise ValueError(f"{path}: row {n} has a non-numeric duration")
+        item_id = _slug(str(row.get("id") or "")) if row.get("id") else f"{n:03d}-{_slug(topic)}"
+        if item_id in seen:
+            raise ValueError(f"{path}: row {n} repeats id {item_id}")
+        seen.add(item_id)
+        voice = row.get("voice")
+        items.append({
+            "id": item_id,
+            "topic": topic,
+            "duration": duration,
+            "voice": _flag(voice) if voice not in (None, "") else None,
+        })
+    return items
+
+
+def _is_done(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f).get("status") == "done"
+    except (OSError, ValueError):
+        return False
+
+
+def run_item(item, out_dir, voice=False, parallel=False, max_workers=None, deadline_seconds=0, log=_log):
+    """Generate one keynote into out_dir. Returns its result record; never raises."""
+    base = os.path.join(out_dir, item["id"])
+    if _is_done(base + ".json"):
+        return {"id": item["id"], "status": "skipped"}
+
+    checkpoint = Checkpoint(os.path.join(out_dir, CHECKPOINT_DIR, item["id"]))
+    voice = voice if item["voice"] is None else item["voice"]
+    started = time.perf_counter()
+    record = {"id": item["id"], "topic": item["topic"], "duration_minutes": item["duration"]}
+
+    def progress(stage, value):
+        log(f"[{item['id']}] {stage} {value}")
+
+    deadline.start(deadline_seconds)
+    try:
+        keynote = longform_engine.generate_full_keynote(
+            item["topic"], item["duration"], progress_callback=progress,
+            parallel=parallel, max_workers=max_workers, checkpoint=checkpoint
+        )
+        with open(base + ".md", 'w') as f:
+            f.write(f"# {keynote['topic']}\n")
+            f.write(f"*{keynote['estimated_duration']} min | {keynote['word_count']} words*\n\n")
+            f.write(keynote['script'])
+        record.update(
+            script=base + ".md",
+            word_count=keynote["word_count"],
+            sections_count=keynote["sections_count"],
+            quotes_used=keynote["quotes_used"],
+        )
+
+        # Failed sections stay as placeholders in the script; the checkpoint lets a re-run retry just those
+        failed = [s["name"] for s in keynote["sections"] if s["preview"].startswith("[Section ")]
+        error = f"{len(failed)} section(s) failed: {', '.join(failed)}" if failed else None
+
+        if voice and not error:
+            audio, error = longform_engine.synthesize_long_audio(
+                keynote["script"], progress_callback=progress, checkpoint=checkpoint
+            )
+            if audio:
+                with open(base + ".mp3", 'wb') as f:
+                    f.write(base64.b64decode(audio["audio_base64"]))
+                record.update(audio=base + ".mp3", audio_id=audio.get("audio_id"), chunks_count=audio["chunks_count"])
+    except Exception as e:
+        error = f"Keynote failed: {str(e)[:300]}"
+
+    record.update(
+        status="failed" if error else "done",
+        error=error,
+        reused=checkpoint.counters["reused"],
+        seconds=round(time.perf_counter() - started, 1),
+    )
+    try:
+        with open(base + ".json", 'w') as f:
+            json.dump(record, f, indent=2)
+    except Exception as e:
+        # Without its .json the keynote isn't done; keep the checkpoint so a re-run resumes it
+        record.update(status="failed", error=f"Could not write {base}.json: {str(e)[:200]}")
+        return record
+    if not error:
+        checkpoint.clear()
+    return record
+
+
+def run_batch(items, out_dir, workers=None, log=_log, **options):
+    """Run every item on a bounded pool, appending each record to results.jsonl as it finishes."""
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, RESULTS_FILE)
+    records = []
+
+    with ThreadPoolExecutor(max_workers=workers or BATCH_WORKERS, thread_name_prefix="batch") as pool:
+        futures = [pool.submit(run_item, item, out_dir, log=log, **options) for item in items]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            if record["status"] == "skipped":
+                log(f"[{record['id']}] already done, skipped")
+                continue
+            with open(results_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+            if record["error"]:
+                log(f"❌ [{record['id']}] {record['error']}")
+            else:
+                log(f"✅ [{record['id']}] {record['word_count']} words in {record['seconds']}s "
+                    f"({record['reused']} checkpointed pieces reused)")
+    return records
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Jason Silva AI — Batch Keynote Generator')
+    parser.add_argument('topics', help='CSV (topic,duration[,id,voice]) or JSONL file of keynotes to generate')
+    parser.add_argument('--out', default='keynotes', help='Output directory (re-run with the same one to resume)')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help='Keynotes generated at once')
+    parser.add_argument('--voice', action='store_true', help='Also synthesize audio for every keynote')
+    parser.add_argument('--parallel', action='store_true', help='Draft each keynote\'s sections concurrently')
+    parser.add_argument('--section-workers', type=int, default=None, help='Max concurrent section drafts per keynote (with --parallel)')
+    parser.add_argument('--deadline', type=float, default=deadline.JOB_DEADLINE_SECONDS,
+                        help='Time budget in seconds per keynote for upstream calls (0 = none)')
+
+    args = parser.parse_args()
+    try:
+        items = read_topics(args.topics)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    # Every keynote's Anthropic calls share one limiter, like ElevenLabs' already do
+    longform_engine.LIMIT_ANTHROPIC = True
+
+    print(f"\n⚡ Jason Silva AI — {len(items)} keynotes, {args.workers} at a time → {args.out}\n")
+    records = run_batch(
+        items, args.out, workers=args.workers,
+        voice=args.voice, parallel=args.parallel, max_workers=args.section_workers, deadline_seconds=args.deadline
+    )
+    counts = {}
+    for record in records:
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+    print(f"\n📊 {', '.join(f'{n} {status}' for status, n in sorted(counts.items()))}")
+    sys.exit(1 if counts.get("failed") else 0)
@@ -0,0 +1,377 @@
+"""
+Offline benchmark harness
+Starts local Anthropic/ElevenLabs stand-ins, points the app at them and drives the routes and
+engine calls at each concurrency level. Reports p50/p95/p99 latency, throughput and peak RSS,
+and compares every run against bench/baseline.json so regressions show up.
+
+    python bench/run.py                                  # all scenarios, compare with baseline
+    python bench/run.py --scenarios generate,voice --concurrency 1,8
+    python bench/run.py --save-baseline                  # record the current numbers
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from stubs import Latency, StubConfig, StubServer  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+
+# A result regresses when p95 grows, or throughput drops, by more than this fraction...
+REGRESSION_TOLERANCE = 0.25
+# ...and the p95 change is also larger than this many seconds (ignores jitter on fast paths)
+REGRESSION_FLOOR_SECONDS = 0.1
+
+SECTION_OUTLINE = {
+    "section_number": 2, "name": "Context", "theme": "emergence", "tone": "grounding",
+    "key_points": ["awe", "complexity"], "thinkers": ["Carl Sagan"], "target_words": 300
+}
+
+
+# --- Measurement ---
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler:
+    """Samples resident memory in the background; .peak is the highest value seen."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def run_load(call, concurrency, requests_count):
+    """Run call(i) requests_count times with `concurrency` workers. Returns the result dict."""
+    latencies, first_bytes, errors = [], [], []
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            first_byte = call(i)
+        except Exception as e:
+            errors.append(str(e)[:200])
+            return
+        latencies.append(time.perf_counter() - started)
+        if first_byte is not None:
+            first_bytes.append(first_byte - started)
+
+    with RSSSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(requests_count)))
+        wall = time.perf_counter() - started
+
+    result = {
+        "requests": requests_count,
+        "errors": len(errors),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "throughput": round(len(latencies) / wall, 3) if wall else None,
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+    }
+    if first_bytes:
+        result["ttfb_p50"] = percentile(first_bytes, 50)
+        result["ttfb_p95"] = percentile(first_bytes, 95)
+    if errors:
+        result["first_error"] = errors[0]
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in result.items()}
+
+
+# --- Scenarios ---
+# Each builder returns call(i): one request, raising on failure, returning the first-byte time for streams.
+
+def _tag(ctx):
+    """Unique suffix per request, so no scenario is served from the script or audio caches."""
+    return f"{ctx['run']}-{next(ctx['sequence'])}"
+
+
+def _post(ctx, path, payload, stream=False):
+    response = ctx["http"].post(ctx["app_url"] + path, json=payload, stream=stream, timeout=120)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def _streamed(ctx, path, payload):
+    response = _post(ctx, path, payload, stream=True)
+    first_byte = None
+    with response:
+        for block in response.iter_content(8192):
+            if block and first_byte is None:
+                first_byte = time.perf_counter()
+    return first_byte
+
+
+def scenario_generate(ctx):
+    def call(i):
+        data = _post(ctx, '/api/generate', {"topic": f"bench topic {_tag(ctx)}", "fresh": True}).json()
+        if data.get('demo_mode'):
+            raise RuntimeError("fell back to the demo script")
+    return call
+
+
+def scenario_generate_stream(ctx):
+    return lambda i: _streamed(ctx, '/api/generate/stream', {"topic": f"bench stream {_tag(ctx)}", "fresh": True})
+
+
+def scenario_voice(ctx):
+    def call(i):
+        _post(ctx, '/api/voice', {"script": f"Bench voice {_tag(ctx)}. " + ctx["short_script"]})
+    return call
+
+
+def scenario_voice_stream(ctx):
+    return lambda i: _streamed(ctx, '/api/voice/stream', {"script": f"Bench stream {_tag(ctx)}. " + ctx["short_script"]})
+
+
+def scenario_outline(ctx):
+    def call(i):
+        _post(ctx, '/api/longform/outline', {"topic": f"bench outline {_tag(ctx)}", "duration_minutes": 20, "fresh": True})
+    return call
+
+
+def scenario_section(ctx):
+    def call(i):
+        _post(ctx, '/api/longform/section', {
+            "topic": f"bench section {_tag(ctx)}", "section_outline": SECTION_OUTLINE,
+            "previous_summaries": ["Section 1 (Hook): opened with wonder"]
+        })
+    return call
+
+
+def scenario_keynote(ctx):
+    from longform_engine import generate_full_keynote
+
+    def call(i):
+        keynote = generate_full_keynote(f"bench keynote {_tag(ctx)}", 10)
+        if any(s["preview"].startswith("[Section ") for s in keynote["sections"]):
+            raise RuntimeError("a section failed")
+    return call
+
+
+def scenario_long_audio(ctx):
+    from longform_engine import synthesize_long_audio
+
+    def call(i):
+        _, error = synthesize_long_audio(f"Bench audio {_tag(ctx)}.\n\n" + ctx["long_script"])
+        if error:
+            raise RuntimeError(error)
+    return call
+
+
+SCENARIOS = {
+    "generate": scenario_generate,
+    "generate_stream": scenario_generate_stream,
+    "voice": scenario_voice,
+    "voice_stream": scenario_voice_stream,
+    "outline": scenario_outline,
+    "section": scenario_section,
+    "keynote": scenario_keynote,
+    "long_audio": scenario_long_audio,
+}
+
+
+# --- Setup ---
+
+def start_stubs(args):
+    anthropic = StubServer(StubConfig(
+        latency=Latency(args.llm_latency, args.llm_sigma), error_rate=args.llm_error_rate,
+        words=args.llm_words, token_interval=args.token_interval
+    )).start()
+    elevenlabs = StubServer(StubConfig(
+        latency=Latency(args.tts_latency, args.tts_sigma), error_rate=args.tts_error_rate,
+        error_status=429, retry_after=0, audio_bytes=args.audio_kb * 1024
+    )).start()
+    return anthropic, elevenlabs
+
+
+def configure_app(anthropic, elevenlabs):
+    """Point the app at the stubs. Must run before the app modules are imported."""
+    os.environ.update({
+        'ANTHROPIC_BASE_URL': anthropic.base_url,
+        'ELEVENLABS_BASE_URL': elevenlabs.base_url,
+        'ANTHROPIC_API_KEY': 'bench',
+        'ELEVENLABS_API_KEY': 'bench',
+        'SCRIPT_CACHE_PATH': os.path.join(tempfile.mkdtemp(prefix='jason_bench_'), 'scripts.sqlite3'),
+        'AUDIO_CACHE_DIR': '',
+    })
+    # Plan quotas would otherwise set the pace; export these to benchmark with real limits
+    for name, value in (('ANTHROPIC_RATE', '200'), ('ANTHROPIC_BURST', '200'), ('ANTHROPIC_CONCURRENCY', '64'),
+                        ('ELEVENLABS_RATE', '200'), ('ELEVENLABS_BURST', '200'), ('ELEVENLABS_CONCURRENCY', '16')):
+        os.environ.setdefault(name, value)
+
+
+def serve_app():
+    """The Flask app on a threaded local server, like a real deployment behind a WSGI server."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# --- Baselines ---
+
+def compare(results, baseline):
+    """Lines describing each result against its baseline entry, and the list of regressions."""
+    lines, regressions = [], []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base or result.get("p95") is None or base.get("p95") is None:
+            continue
+        p95_change = (result["p95"] - base["p95"]) / base["p95"] if base["p95"] else 0.0
+        tput_change = (result["throughput"] - base["throughput"]) / base["throughput"] if base.get("throughput") else 0.0
+        slower = p95_change > REGRESSION_TOLERANCE and result["p95"] - base["p95"] > REGRESSION_FLOOR_SECONDS
+        lower = tput_change < -REGRESSION_TOLERANCE
+        flag = "REGRESSION" if slower or lower else "ok"
+        if slower or lower:
+            regressions.append(key)
+        lines.append(f"{key:<24} p95 {p95_change:+.0%}  throughput {tput_change:+.0%}  {flag}")
+    return lines, regressions
+
+
+def format_table(results):
+    header = f"{'scenario@concurrency':<24}{'n':>5}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'ttfb50':>9}{'req/s':>9}{'rss MB':>9}"
+    rows = [header, "-" * len(header)]
+
+    def fmt(value):
+        return f"{value:9.3f}" if isinstance(value, (int, float)) else f"{'-':>9}"
+
+    for key, r in results.items():
+        rows.append(
+            f"{key:<24}{r['requests']:>5}{r['errors']:>5}{fmt(r['p50'])}{fmt(r['p95'])}{fmt(r['p99'])}"
+            f"{fmt(r.get('ttfb_p50'))}{fmt(r['throughput'])}{r['peak_rss_mb']:>9.1f}"
+        )
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks against local API stand-ins')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=16, help='Requests per scenario and level (keynote/long_audio use a quarter)')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Median Anthropic latency before the first byte (s)')
+    parser.add_argument('--llm-sigma', type=float, default=0.3, help='Lognormal spread of the Anthropic latency')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='Share of Anthropic calls answered with 529')
+    parser.add_argument('--llm-words', type=int, default=400, help='Words per generated text')
+    parser.add_argument('--token-interval', type=float, default=0.002, help='Delay between streamed words (s)')
+    parser.add_argument('--tts-latency', type=float, default=0.4, help='Median ElevenLabs latency (s)')
+    parser.add_argument('--tts-sigma', type=float, default=0.3, help='Lognormal spread of the ElevenLabs latency')
+    parser.add_argument('--tts-error-rate', type=float, default=0.0, help='Share of ElevenLabs calls answered with 429')
+    parser.add_argument('--audio-kb', type=int, default=200, help='Audio bytes returned per TTS call (KiB)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write these results as the new baseline')
+    parser.add_argument('--report', default=None, help='Also write the report to this file')
+    args = parser.parse_args()
+
+    anthropic, elevenlabs = start_stubs(args)
+    configure_app(anthropic, elevenlabs)
+    server, app_url = serve_app()
+
+    import requests
+    ctx = {
+        "app_url": app_url,
+        "http": requests.Session(),
+        "run": int(time.time()),
+        "sequence": itertools.count(),
+        "short_script": "Have you ever considered... the adjacent possible. " * 20,
+        "long_script": ("Have you ever considered the adjacent possible... Every idea opens doors to rooms "
+                        "that did not exist a moment ago. " * 40 + "\n\n") * 6,
+    }
+    ctx["http"].mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=64))
+
+    results = {}
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    try:
+        for name in [s.strip() for s in args.scenarios.split(',') if s.strip()]:
+            call = SCENARIOS[name](ctx)
+            count = max(2, args.requests // 4) if name in ("keynote", "long_audio") else args.requests
+            for level in levels:
+                results[f"{name}@{level}"] = run_load(call, level, count)
+                print(f"  {name}@{level} done", file=sys.stderr, flush=True)
+    finally:
+        server.shutdown()
+        anthropic.stop()
+        elevenlabs.stop()
+
+    config = {k: v for k, v in vars(args).items() if k not in ('baseline', 'save_baseline', 'report', 'scenarios', 'concurrency')}
+    report = [format_table(results), "",
+              f"stub requests: anthropic {anthropic.counters['requests']} ({anthropic.counters['errors']} errors), "
+              f"elevenlabs {elevenlabs.counters['requests']} ({elevenlabs.counters['errors']} errors)"]
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({"config": config, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        report.append(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            report.append("Note: stub settings differ from the baseline's — comparison is only indicative")
+        lines, regressions = compare(results, baseline.get("results", {}))
+        report += ["", "vs baseline:"] + lines
+        if regressions:
+            report.append(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+    text = "\n".join(report)
+    print(text)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(text + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Local stand-ins for the Anthropic and ElevenLabs APIs
+Serve /v1/messages (plain and streaming) and /v1/text-to-speech/{voice_id}[/stream] with
+configurable latency, error rate and payload size, so the app can be load-tested offline.
+"""
+
+import json
+import math
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = (
+    "have you ever considered the adjacent possible... consciousness unfolding into wonder, "
+    "technology as an extension of the human imagination, awe as the doorway to transcendence"
+).split()
+
+
+class Latency:
+    """Lognormal latency: `median` seconds, spread by `sigma` (0 = fixed).
+
+    Seeded, so repeated benchmark runs draw the same latencies and stay comparable.
+    """
+
+    def __init__(self, median, sigma=0.0, seed=1):
+        self.median = median
+        self.sigma = sigma
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median
+        with self._lock:
+            return self._random.lognormvariate(math.log(self.median), self.sigma)
+
+
+class StubConfig:
+    """Behaviour of one stub server. error_rate is the share of requests answered with error_status."""
+
+    def __init__(self, latency=None, error_rate=0.0, error_status=529, retry_after=None,
+                 words=400, token_interval=0.0, audio_bytes=200_000, audio_block=8192, seed=1):
+        self.latency = latency or Latency(0.0)
+        self.error_rate = error_rate
+        self.errors = random.Random(seed)
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.words = words
+        self.token_interval = token_interval
+        self.audio_bytes = audio_bytes
+        self.audio_block = audio_block
+
+
+def _text(words, seed):
+    rng = random.Random(seed)
+    body = " ".join(rng.choice(WORDS) for _ in range(words))
+    return f'As Carl Sagan said, "we are a way for the cosmos to know itself" ({seed}).\n\n{body}.'
+
+
+def _outline():
+    names = ["Hook", "Context", "Tension", "Exploration", "Synthesis", "Crescendo", "Landing"]
+    return json.dumps({"sections": [
+        {
+            "section_number": i + 1, "name": name, "theme": f"{name.lower()} of wonder",
+            "key_points": ["awe", "emergence", "the adjacent possible"],
+            "thinkers": ["Carl Sagan", "Alan Watts"], "opening_hook": "Have you ever considered...",
+            "target_words": 300, "tone": "awe"
+        }
+        for i, name in enumerate(names)
+    ]})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+    counters = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.counters["requests"] += 1
+        time.sleep(self.config.latency.sample())
+
+        if self.config.error_rate and self.config.errors.random() < self.config.error_rate:
+            self.counters["errors"] += 1
+            headers = {"Retry-After": str(self.config.retry_after)} if self.config.retry_after is not None else None
+            self._send(self.config.error_status, b'{"error": "stub error"}', headers=headers)
+            return
+
+        if self.path.startswith("/v1/messages"):
+            self._messages(body)
+        elif self.path.startswith("/v1/text-to-speech/"):
+            self._speech(stream=self.path.endswith("/stream"))
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def _messages(self, body):
+        system = body.get("system")
+        if "Return ONLY valid JSON" in json.dumps(system):
+            text = _outline()
+        else:
+            text = _text(self.config.words, self.counters["requests"])
+        usage = {"input_tokens": 1200, "output_tokens": len(text) // 4,
+                 "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+
+        if not body.get("stream"):
+            self._send(200, json.dumps({"content": [{"type": "text", "text": text}], "usage": usage}).encode())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self._event("message_start", {"type": "message_start", "message": {"usage": usage}})
+        for word in text.split(" "):
+            self._event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                "delta": {"type": "text_delta", "text": word + " "}})
+            if self.config.token_interval:
+                time.sleep(self.config.token_interval)
+        self._event("message_delta", {"type": "message_delta", "usage": {"output_tokens": usage["output_tokens"]}})
+        self._event("message_stop", {"type": "message_stop"})
+        self.close_connection = True
+
+    def _event(self, name, payload):
+        self.wfile.write(f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+    def _speech(self, stream):
+        audio = b"\xff\xfb\x90\x64" + b"\x00" * max(0, self.config.audio_bytes - 4)
+        if not stream:
+            self._send(200, audio, content_type="audio/mpeg")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(audio), self.config.audio_block):
+            block = audio[i:i + self.config.audio_block]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(block), block))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class StubServer:
+    """A stub API on 127.0.0.1 in a background thread. base_url is ready once start() returns."""
+
+    def __init__(self, config, port=0):
+        self.counters = {"requests": 0, "errors": 0}
+        handler = type("Handler", (_Handler,), {"config": config, "counters": self.counters})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,195 @@
+"""
+Per-upstream circuit breakers for Jason Silva AI
+Each upstream (Anthropic, ElevenLabs) keeps a rolling window of call outcomes. When too many
+recent calls failed or were too slow the breaker opens and calls fail in microseconds instead
+of waiting out a timeout; after a cool-down one probe call is let through to test recovery.
+State is per process and shown at /api/status.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+import metrics
+
+# Rolling window the error rate is computed over, and the calls it needs before it can trip
+WINDOW_SECONDS = float(os.getenv('BREAKER_WINDOW_SECONDS', '60'))
+MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '5'))
+# Share of failed (error, 5xx or slow-to-start) calls in the window that opens the breaker
+FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', '0.5'))
+# How long an open breaker rejects calls before letting one probe through
+OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))
+
+# Streamed calls whose first byte (response headers) takes longer than this count as failures;
+# 0 = latency never trips. A non-streamed call's time depends on how much it was asked to
+# produce, so only its status counts.
+SLOW_CALL_SECONDS = {
+    "anthropic": float(os.getenv('ANTHROPIC_SLOW_CALL_SECONDS', '15')),
+    "elevenlabs": float(os.getenv('ELEVENLABS_SLOW_CALL_SECONDS', '20')),
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Numeric state for the /metrics gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+LABELS = {"anthropic": "Anthropic", "elevenlabs": "ElevenLabs"}
+
+
+class CircuitOpen(Exception):
+    """Upstream call refused because its breaker is open. Never retried."""
+
+    retryable = False
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"{LABELS.get(host, host)} is unavailable (circuit open, next probe in {retry_after:.0f}s)")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def is_failure(status):
+    """Outcomes that count against an upstream's health: network errors and 5xx (incl. 529 overloaded).
+
+    4xx — 429 included, which the rate limiter handles — mean the upstream is up.
+    """
+    return status == "error" or status >= 500
+
+
+class CircuitBreaker:
+    """Closed → open on a high rolling failure rate → half-open single probe → closed or open again."""
+
+    def __init__(self, host, slow_call_seconds=0.0):
+        self.host = host
+        self.slow_call_seconds = slow_call_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._calls = deque()  # (finished_at, failed, seconds)
+        self._probing = False
+        self._lock = threading.Lock()
+        self.counters = {"rejected": 0, "opened": 0}
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            metrics.inc("breaker_transitions_total", host=self.host, state=state)
+
+    def _prune(self, now):
+        while self._calls and self._calls[0][0] < now - WINDOW_SECONDS:
+            self._calls.popleft()
+
+    def acquire(self):
+        """Call before sending a request. Raises CircuitOpen if the call should not be made.
+
+        Returns True if this call is the half-open probe. Pass that to the record() or release()
+        that must follow every successful acquire().
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            wait = self.opened_at + OPEN_SECONDS - time.monotonic()
+            if self.state == OPEN and wait <= 0:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.counters["rejected"] += 1
+        metrics.inc("breaker_rejections_total", host=self.host)
+        raise CircuitOpen(self.host, max(0.0, wait))
+
+    def record(self, status, seconds, probe=False, streamed=False):
+        """Outcome of an acquired call: HTTP status (or "error") and time to response headers,
+        which for a streamed call is its time to first byte."""
+        slow = streamed and self.slow_call_seconds and seconds > self.slow_call_seconds
+        failed = is_failure(status) or bool(slow)
+        now = time.monotonic()
+        with self._lock:
+            if probe:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self._calls.clear()
+                    self._set_state(CLOSED)
+                return
+            self._calls.append((now, failed, seconds))
+            self._prune(now)
+            if self.state == CLOSED and failed and len(self._calls) >= MIN_CALLS:
+                failures = sum(1 for _, f, _ in self._calls if f)
+                if failures / len(self._calls) >= FAILURE_RATE:
+                    self._open(now)
+
+    def release(self, probe=False):
+        """An acquired call ended without an outcome (cancelled, never sent, or cut off by the
+        request's own deadline)."""
+        if probe:
+            with self._lock:
+                self._probing = False
+
+    def _open(self, now):
+        self.opened_at = now
+        self.counters["opened"] += 1
+        self._set_state(OPEN)
+
+    def stats(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            latencies = sorted(seconds for _, _, seconds in self._calls)
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            calls = len(latencies)
+            retry_after = self.opened_at + OPEN_SECONDS - time.monotonic() if self.state == OPEN else 0.0
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "p50_seconds": round(latencies[calls // 2], 3) if calls else None,
+                "p95_seconds": round(latencies[min(calls - 1, int(calls * 0.95))], 3) if calls else None,
+                "retry_after": round(max(0.0, retry_after), 1),
+                **self.counters,
+            }
+
+
+BREAKERS = {host: CircuitBreaker(host, slow) for host, slow in SLOW_CALL_SECONDS.items()}
+
+
+def get(host):
+    return BREAKERS[host]
+
+
+def is_open(host):
+    """True while host is in its open cool-down, i.e. a call now would certainly be refused.
+
+    Once the cool-down ends this is False again so that the next call can be the probe.
+    """
+    circuit = BREAKERS[host]
+    return circuit.state == OPEN and time.monotonic() < circuit.opened_at + OPEN_SECONDS
+
+
+def check(host):
+    """Raise CircuitOpen during host's open cool-down, without taking the probe. For callers
+    about to queue for the upstream (rate limiter waits), so a doomed call doesn't wait first."""
+    circuit = BREAKERS[host]
+    if is_open(host):
+        with circuit._lock:
+            circuit.counters["rejected"] += 1
+        metrics.inc("breaker_rejections_total", host=host)
+        raise CircuitOpen(host, circuit.opened_at + OPEN_SECONDS - time.monotonic())
+
+
+def status():
+    """Breaker state per upstream, for /api/status."""
+    return {host: breaker.stats() for host, breaker in BREAKERS.items()}
+
+
+def gauges():
+    """Flat numeric breaker fields per upstream, for the /metrics gauges."""
+    return {
+        f"breaker_{host}": {
+            "state": STATE_VALUES[stats["state"]],
+            "failure_rate": stats["failure_rate"],
+            "calls": stats["calls"],
+            "rejected": stats["rejected"],
+            "opened": stats["opened"],
+        }
+        for host, stats in status().items()
+    }
@@ -0,0 +1,71 @@
+"""
+Resumable long-form checkpoints
+A directory of finished pieces of one keynote run — the outline, each written section, each
+smoothed join and each synthesized voice chunk. generate_full_keynote and synthesize_long_audio
+take an optional Checkpoint, reuse whatever it already holds and save each piece as it finishes,
+so an interrupted run picks up where it stopped instead of paying for that work again.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+
+def content_name(prefix, *parts):
+    """Checkpoint name tied to the inputs that produced a piece, so stale pieces are never reused."""
+    digest = hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:16]
+    return f"{prefix}-{digest}"
+
+
+class Checkpoint:
+    """Named JSON values and byte blobs in one directory. Writes are atomic (write-then-rename)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.counters = {"reused": 0, "saved": 0}
+        self._lock = threading.Lock()  # parallel section and chunk threads share one checkpoint
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, name + suffix)
+
+    def _write(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._count("saved")
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._count("reused")
+        return data
+
+    def load(self, name):
+        """Saved JSON value, or None."""
+        data = self._read(self._path(name, ".json"))
+        return json.loads(data) if data is not None else None
+
+    def save(self, name, value):
+        self._write(self._path(name, ".json"), json.dumps(value).encode("utf-8"))
+
+    def load_bytes(self, name):
+        return self._read(self._path(name, ".bin"))
+
+    def save_bytes(self, name, data):
+        self._write(self._path(name, ".bin"), data)
+
+    def clear(self):
+        """Drop the checkpoint once its run's results are written."""
+        shutil.rmtree(self.directory, ignore_errors=True)
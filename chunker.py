@@ -0,0 +1,198 @@
+"""
+Sentence-aware, size-balanced text chunking for voice synthesis
+Chunks are cut at sentence boundaries (paragraph breaks preferred) and sized evenly, because
+parallel TTS finishes when its slowest chunk does. Spans are (start, end) offsets into the source.
+"""
+
+import os
+import re
+import math
+
+import upstream
+
+# Rough ElevenLabs latency model: fixed request overhead plus time per character of text
+TTS_BASE_SECONDS = float(os.getenv('TTS_BASE_SECONDS', '1.0'))
+TTS_SECONDS_PER_CHAR = float(os.getenv('TTS_SECONDS_PER_CHAR', '0.005'))
+
+# A cut may move this far (fraction of the ideal chunk size) to land on a paragraph break
+PARAGRAPH_SLACK = 0.15
+
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "eg", "ie", "cf", "al",
+    "approx", "dept", "fig", "inc", "ltd", "corp", "mt", "vol",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+# Sentence terminator (incl. ellipses), closing quotes/brackets, then the whitespace after it
+_TERMINATOR = re.compile(r"(\.{3}|…|[.!?]+)[\"'”’)\]]*(\s+)")
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_WORD_BEFORE = re.compile(r"([A-Za-z][A-Za-z.]*)$")
+
+
+def _is_sentence_end(text, match):
+    """Decide whether a terminator candidate really ends a sentence."""
+    following = text[match.end():match.end() + 1]
+    if not following:
+        return True
+    if "\n" in match.group(2):
+        return True
+    punct = match.group(1)
+    if punct in ("...", "…"):
+        # Scripts use ellipses as pauses mid-sentence; only a capital after one starts a new sentence
+        return following.isupper() or following in "\"'“‘"
+    if punct != ".":
+        return True
+    if following.islower() or following.isdigit():
+        return False
+    word = _WORD_BEFORE.search(text, max(0, match.start() - 32), match.start())
+    if word:
+        token = word.group(1)
+        if len(token) == 1 and token.isupper():
+            return False  # an initial: "J. Robert"
+        if token.replace(".", "").lower() in ABBREVIATIONS or "." in token:
+            return False  # "Dr.", "e.g.", "U.S."
+    return True
+
+
+def sentence_spans(text):
+    """(start, end, paragraph_end) for each sentence, whitespace trimmed."""
+    spans = []
+    for para in _paragraph_spans(text):
+        p_start, p_end = para
+        start = p_start
+        for match in _TERMINATOR.finditer(text, p_start, p_end):
+            if _is_sentence_end(text, match):
+                spans.append((start, match.start(2), False))
+                start = match.end()
+        spans.append((start, p_end, True))
+    return spans
+
+
+def _paragraph_spans(text):
+    spans = []
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return [_trim(text, s, e) for s, e in spans if text[s:e].strip()]
+
+
+def _trim(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _split_long(text, start, end, max_chars):
+    """Break one over-long sentence at clause or word boundaries so no unit exceeds max_chars."""
+    units = []
+    while end - start > max_chars:
+        # Aim for equal pieces, with a little room to reach back to a comma or space
+        size = min(max_chars, (end - start) // math.ceil((end - start) / max_chars) + 50)
+        window = text[start:start + size]
+        cut = max(window.rfind(", "), window.rfind("; "), window.rfind(" — "))
+        if cut < size // 2:
+            cut = window.rfind(" ")
+        if cut <= 0:
+            cut = size - 1
+        piece_start, piece_end = _trim(text, start, start + cut + 1)
+        units.append((piece_start, piece_end, False))
+        start, _ = _trim(text, start + cut + 1, end)
+    units.append((start, end, True))
+    return units
+
+
+def estimate_latency(chunk_chars, concurrency):
+    """Wall-clock estimate for synthesizing chunks of these sizes with `concurrency` parallel requests."""
+    if not chunk_chars:
+        return 0.0
+    waves = math.ceil(len(chunk_chars) / concurrency)
+    return waves * (TTS_BASE_SECONDS + TTS_SECONDS_PER_CHAR * max(chunk_chars))
+
+
+def _chunk_count(total, units, max_chars, target_chunks, max_latency, concurrency):
+    """How many chunks to cut: the fewest that fit max_chars, raised to meet the count or latency target."""
+    count = max(1, math.ceil(total / max_chars))
+    if target_chunks:
+        count = max(count, target_chunks)
+    count = min(count, units)
+    if not max_latency:
+        return count
+
+    # Latency is not monotonic in the count (extra chunks can add a wave), so take the first
+    # count that meets the target, else the fastest one seen
+    best, best_estimate = count, None
+    for k in range(count, units + 1):
+        estimate = estimate_latency([math.ceil(total / k)] * k, concurrency)
+        if estimate <= max_latency:
+            return k
+        if best_estimate is None or estimate < best_estimate:
+            best, best_estimate = k, estimate
+    return best
+
+
+def _balanced_cuts(units, count, max_chars):
+    """Unit indices to cut after, so chunk lengths land near total/count, preferring paragraph ends."""
+    first = units[0][0]
+    last = units[-1][1]
+    ideal = (last - first) / count
+    cuts = []
+    i = 0
+    for n in range(1, count):
+        target = first + ideal * n
+        remaining = count - n  # chunks still needed after this cut
+        best = i
+        best_score = None
+        for j in range(i, len(units) - remaining):
+            end = units[j][1]
+            if end - units[i][0] > max_chars:
+                break
+            if last - units[j + 1][0] > remaining * max_chars:
+                continue  # what is left could not fit in the remaining chunks
+            score = abs(end - target) - (PARAGRAPH_SLACK * ideal if units[j][2] else 0)
+            if best_score is None or score < best_score:
+                best, best_score = j, score
+        cuts.append(best)
+        i = best + 1
+    return cuts
+
+
+def plan_chunks(text, max_chars=4500, target_chunks=None, max_latency=None, concurrency=None):
+    """Split text into balanced chunks; returns [(start, end), ...] offsets into text.
+
+    By default uses the fewest chunks that fit max_chars, sized evenly. target_chunks asks for at
+    least that many; max_latency (seconds) picks the count whose estimated parallel synthesis time
+    meets it, given `concurrency` simultaneous requests (the ElevenLabs limiter's by default).
+    """
+    concurrency = concurrency or upstream.HOST_LIMITS["elevenlabs"]["concurrency"]
+
+    units = []
+    for start, end, paragraph_end in sentence_spans(text):
+        if end - start > max_chars:
+            pieces = _split_long(text, start, end, max_chars)
+            units.extend(pieces[:-1])
+            units.append((pieces[-1][0], pieces[-1][1], paragraph_end))
+        else:
+            units.append((start, end, paragraph_end))
+    if not units:
+        return []
+
+    total = units[-1][1] - units[0][0]
+    count = _chunk_count(total, len(units), max_chars, target_chunks, max_latency, concurrency)
+
+    while True:
+        cuts = _balanced_cuts(units, count, max_chars)
+        bounds = [0] + [c + 1 for c in cuts] + [len(units)]
+        spans = [(units[a][0], units[b - 1][1]) for a, b in zip(bounds, bounds[1:])]
+        # Uneven sentence sizes can push a chunk past the cap; one more chunk fixes that
+        if count >= len(units) or all(end - start <= max_chars for start, end in spans):
+            return spans
+        count += 1
+
+
+def split_chunks(text, max_chars=4500, target_chunks=None, max_latency=None):
+    """plan_chunks, as chunk strings."""
+    return [text[start:end] for start, end in plan_chunks(text, max_chars, target_chunks, max_latency)]
@@ -0,0 +1,135 @@
+"""
+Request deadlines for Jason Silva AI
+A Deadline starts at each route, job or CLI entry and follows the request (through a contextvar,
+like the metrics trace) into every upstream call: timeouts are cut from the remaining budget,
+retries back off with jitter only while budget remains, and slow calls can be hedged.
+"""
+
+import os
+import time
+import random
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+import metrics
+
+# Budget per HTTP request: vercel.json caps functions at 60s (maxDuration), keep 5s to answer
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '55'))
+# Budget per background job / CLI run; 0 = no deadline (retries still back off)
+JOB_DEADLINE_SECONDS = float(os.getenv('JOB_DEADLINE_SECONDS', '0'))
+
+# Retry backoff: full jitter over base * 2^attempt, capped
+BACKOFF_BASE_SECONDS = float(os.getenv('RETRY_BACKOFF_BASE', '1'))
+BACKOFF_MAX_SECONDS = float(os.getenv('RETRY_BACKOFF_MAX', '8'))
+
+# Don't start (or retry) a call with less budget than this left — it could only time out
+MIN_ATTEMPT_SECONDS = float(os.getenv('DEADLINE_MIN_ATTEMPT_SECONDS', '2'))
+
+_current = contextvars.ContextVar("deadline", default=None)
+_random = random.Random()
+
+
+class DeadlineExceeded(Exception):
+    """The request's budget ran out before an upstream call could be made. Never retried."""
+
+    retryable = False
+
+
+class Deadline:
+    """Wall-clock budget for one request. seconds=None means unbounded."""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        """Seconds left, or None if unbounded."""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeout(self, cap):
+        """Timeout for the next call: cap, cut to the remaining budget. Raises if too little is left."""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if remaining < MIN_ATTEMPT_SECONDS:
+            metrics.inc("deadline_exceeded_total")
+            raise DeadlineExceeded(f"Request deadline reached ({self.seconds:g}s budget)")
+        return min(cap, remaining) if cap else remaining
+
+    def allows(self, delay):
+        """True if waiting `delay` seconds still leaves time for a useful attempt."""
+        remaining = self.remaining()
+        return remaining is None or remaining - delay >= MIN_ATTEMPT_SECONDS
+
+
+UNBOUNDED = Deadline()
+
+
+def start(seconds):
+    """Begin a deadline for the current request / job on this thread or task and return it."""
+    deadline = Deadline(seconds)
+    _current.set(deadline)
+    return deadline
+
+
+def current():
+    """The active Deadline (UNBOUNDED outside a request)."""
+    return _current.get() or UNBOUNDED
+
+
+def backoff(attempt, retry_after=None):
+    """Delay before retry number attempt+1: the upstream's Retry-After, else jittered exponential.
+
+    Returns None when the current deadline can't afford the wait plus another attempt.
+    """
+    if retry_after is not None:
+        delay = retry_after
+    else:
+        delay = _random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    return delay if current().allows(delay) else None
+
+
+# --- Hedged calls ---
+
+def _start(fn, args, kwargs):
+    """Run fn on its own thread (in the caller's context); returns its Future."""
+    future = Future()
+    future.set_running_or_notify_cancel()
+
+    def run():
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=metrics.bind(run), daemon=True).start()
+    return future
+
+
+def hedged(fn, after, *args, **kwargs):
+    """Call fn; if it hasn't returned after `after` seconds, start one duplicate and return the first success.
+
+    after=0 (or a deadline too short for a second attempt) calls fn directly. Blocking HTTP calls
+    can't be cancelled, so the slower copy runs to completion and its result is dropped.
+    """
+    if not after or not current().allows(after):
+        return fn(*args, **kwargs)
+
+    first = _start(fn, args, kwargs)
+    done, _ = wait([first], timeout=after)
+    if done:
+        return first.result()
+
+    metrics.inc("hedged_calls_total", fn=fn.__name__)
+    pending = {first, _start(fn, args, kwargs)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
@@ -0,0 +1,242 @@
+"""
+Curated demo scripts for Jason Silva AI
+Served when no Anthropic key is set, the Anthropic breaker is open, or a generation fails.
+Each script is a text file in demo_scripts/ that opens with a metadata header:
+
+    title: Consciousness as the greatest mystery
+    keywords: consciousness, mind, awareness, meditation
+    tags: consciousness, philosophy
+    priority: 2          (optional; precedence when a topic hits several scripts' keywords)
+    default: true        (optional; candidate when nothing matches)
+    ---
+    <script text>
+
+On first use only the headers are read, into an inverted index from keyword / tag / title
+terms to scripts; bodies are read from disk when a script is served. A topic word hits a
+keyword when it is that keyword or starts with it ("designing", "mindfulness"), as the original
+substring matcher did, without mid-word matches. Among scripts whose keywords the topic hits,
+the highest priority wins (then the best score); otherwise tag / title matches are ranked by
+how specific each matched term is.
+"""
+
+import os
+import re
+import sys
+import math
+import zlib
+import logging
+import threading
+from functools import lru_cache
+
+DEMO_SCRIPTS_DIR = os.getenv(
+    'DEMO_SCRIPTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'demo_scripts')
+)
+# Script bodies kept in memory after first use
+DEMO_BODY_CACHE = int(os.getenv('DEMO_BODY_CACHE', '256'))
+
+HEADER_END = "---"
+
+# A topic word matching a script's keywords counts more than one matching its tags or title
+FIELD_WEIGHTS = {"keywords": 3.0, "tags": 2.0, "title": 1.0}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Shortest keyword a longer topic word can hit by starting with it ("art" → "artistic")
+MIN_PREFIX = 3
+
+log = logging.getLogger(__name__)
+
+# Function words in titles and topics that say nothing about which script fits
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it its of on or our the through to we what why with".split()
+)
+
+
+def _stem(token):
+    """Fold simple plurals so "technologies" finds "technology" and "minds" finds "mind"."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def terms(text):
+    """Normalized word tokens of text."""
+    return [_stem(token) for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _priority(name, value):
+    """Header priority as a number; a malformed one counts as 0 so a bad file can't break the fallback."""
+    try:
+        return float(value or 0)
+    except ValueError:
+        log.warning("demo script %s: ignoring invalid priority %r", name, value)
+        return 0.0
+
+
+class DemoScript:
+    """Header metadata of one script; the body stays on disk until body() is called."""
+
+    __slots__ = ("name", "path", "body_offset", "title", "keywords", "tags", "priority", "default")
+
+    def __init__(self, name, path, body_offset, meta):
+        self.name = name
+        self.path = path
+        self.body_offset = body_offset
+        self.title = meta.get("title", name)
+        self.keywords = [k.strip() for k in meta.get("keywords", "").split(",") if k.strip()]
+        self.tags = [t.strip() for t in meta.get("tags", "").split(",") if t.strip()]
+        self.priority = _priority(name, meta.get("priority"))
+        self.default = meta.get("default", "").lower() in ("true", "yes", "1")
+
+    def body(self):
+        return _read_body(self.path, self.body_offset)
+
+
+@lru_cache(maxsize=DEMO_BODY_CACHE)
+def _read_body(path, offset):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read().decode("utf-8").strip()
+
+
+def read_header(path):
+    """(metadata dict, byte offset of the body). Reads only up to the header's closing line."""
+    meta = {}
+    offset = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            offset += len(raw)
+            line = raw.decode("utf-8").strip()
+            if line == HEADER_END:
+                return meta, offset
+            key, sep, value = line.partition(":")
+            if sep:
+                meta[key.strip().lower()] = value.strip()
+    # No header: the whole file is the script
+    return {}, 0
+
+
+class DemoLibrary:
+    """Inverted index over the demo scripts in one directory, built lazily on first lookup."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.scripts = None
+        self._postings = {}  # term -> {script index: weight}, idf applied
+        self._keywords = {}  # term -> set of script indexes with it among their keywords
+        self._defaults = []
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self.scripts is not None:
+            return
+        with self._lock:
+            if self.scripts is None:
+                self._load()
+
+    def _load(self):
+        scripts = []
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(".txt"))
+        except OSError:
+            names = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            meta, offset = read_header(path)
+            scripts.append(DemoScript(name[:-4], path, offset, meta))
+
+        postings = {}
+        keywords = {}
+        for i, script in enumerate(scripts):
+            for term in terms(", ".join(script.keywords)):
+                keywords.setdefault(term, set()).add(i)
+            fields = {"keywords": ", ".join(script.keywords), "tags": ", ".join(script.tags), "title": script.title}
+            for field, text in fields.items():
+                for term in set(terms(text)):
+                    entry = postings.setdefault(term, {})
+                    entry[i] = max(entry.get(i, 0.0), FIELD_WEIGHTS[field])
+
+        # A term few scripts carry says more about a topic than one most scripts carry
+        for entry in postings.values():
+            idf = math.log(1 + len(scripts) / len(entry))
+            for i in entry:
+                entry[i] *= idf
+
+        self._postings = postings
+        self._keywords = keywords
+        self._defaults = [i for i, script in enumerate(scripts) if script.default] or ([0] if scripts else [])
+        self.scripts = scripts
+
+    def scores(self, topic):
+        """{script index: relevance} for every script sharing a term with the topic."""
+        self._ensure_loaded()
+        scores = {}
+        for term in set(terms(topic)):
+            for i, weight in self._postings.get(term, {}).items():
+                scores[i] = scores.get(i, 0.0) + weight
+        return scores
+
+    def keyword_hits(self, topic):
+        """Indexes of scripts with a keyword the topic names, exactly or as a word's prefix."""
+        self._ensure_loaded()
+        hits = set()
+        for term in set(terms(topic)):
+            hits |= self._keywords.get(term, set())
+            for end in range(MIN_PREFIX, len(term)):
+                hits |= self._keywords.get(term[:end], set())
+        return hits
+
+    def match(self, topic):
+        """Best DemoScript for a topic; a default script if nothing matches.
+
+        Scripts whose keywords the topic hits come first, by priority then score, so e.g. a
+        topic naming both art and technology keeps going to the higher-priority creativity
+        script. Tag / title-only matches are ranked by score, then priority.
+        """
+        scores = self.scores(topic)
+        hits = self.keyword_hits(topic)
+        if hits:
+            best = max(hits, key=lambda i: (self.scripts[i].priority, scores.get(i, 0.0), -i))
+            return self.scripts[best]
+        if scores:
+            best = max(scores, key=lambda i: (scores[i], self.scripts[i].priority, -i))
+            return self.scripts[best]
+        if not self._defaults:
+            return None
+        # Spread unmatched topics across the default scripts, stably per topic
+        pick = zlib.crc32(topic.strip().lower().encode("utf-8")) % len(self._defaults)
+        return self.scripts[self._defaults[pick]]
+
+    def stats(self):
+        self._ensure_loaded()
+        return {"scripts": len(self.scripts), "terms": len(self._postings), "defaults": len(self._defaults)}
+
+
+DEMO_LIBRARY = DemoLibrary(DEMO_SCRIPTS_DIR)
+
+# Last resort if the library directory is missing or empty
+FALLBACK_SCRIPT = """Have you ever considered that we are living in a moment of unprecedented possibility?
+
+The adjacent possible awaits.
+
+Stay curious."""
+
+
+def get_demo_script(topic):
+    """Return the demo script that best matches the topic."""
+    script = DEMO_LIBRARY.match(topic)
+    return script.body() if script is not None else FALLBACK_SCRIPT
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(DEMO_LIBRARY.stats())
+        sys.exit(0)
+    topic = " ".join(sys.argv[1:])
+    ranked = sorted(DEMO_LIBRARY.scores(topic).items(), key=lambda item: -item[1])
+    for i, score in ranked[:10]:
+        print(f"{score:7.3f}  {DEMO_LIBRARY.scripts[i].name}  ({DEMO_LIBRARY.scripts[i].title})")
+    chosen = DEMO_LIBRARY.match(topic)
+    print(f"→ {chosen.name if chosen else 'built-in fallback'}")
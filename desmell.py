@@ -0,0 +1,146 @@
+"""
+Desmell engine — strips common AI rhetorical patterns ("not just X, it's Y") from generated text
+Rules are compiled once into a single alternation, so text is scanned in one pass regardless of
+rule count. DesmellStream cleans streamed fragments incrementally, holding back only the tail
+that could still be part of a match.
+"""
+
+import re
+
+# Free-text runs inside a rule are capped so every match has a bounded length; that bound is
+# what lets the streaming cleaner decide a match without seeing the rest of the text.
+MAX_SPAN = 300
+
+# (pattern, replacement) in priority order — at the same position, earlier rules win.
+RULES = [
+    # "X isn't just Y — it's Z" → "X is Z"
+    (r"\b(\w{1,50}) (?:isn't|is not|aren't|are not) (?:just|only|merely|simply) [^—,;.!?]{1,300}?[—,;]\s{0,10}(?:it'?s|they'?re|this is|that'?s)\s{1,10}", r"\1 is "),
+    # "not just X, we're Y" → "We are Y"
+    (r"[Ww]e'?re not (?:just|only|merely|simply) [^.!?]{1,300}?[,;—]\s{0,10}we'?re\s{1,10}", "We are "),
+    # "not just X. We're Y" → "We are Y"
+    (r"[Ww]e'?re not (?:just|only|merely|simply) [^.!?]{1,300}\.\s{0,10}[Ww]e'?re\s{1,10}", "We are "),
+    # "It's not just/only about X, it's about Y" → "It's about Y"
+    (r"[Ii]t'?s not (?:just|only|merely|simply) (?:about )?[^,;—]{1,300}?[,;—]\s{0,10}it'?s (?:about )?", "It's about "),
+    # "This isn't merely X — it's Y" → "This is Y"
+    (r"[Tt]his (?:isn't|is not) (?:just|merely|simply) [^—,;]{1,300}?[—,;]\s{0,10}(?:it'?s|this is)\s{1,10}", "This is "),
+    # "not just the X, not just the Y" → "the X, the Y" (list patterns)
+    (r"[Nn]ot just (the [^,]{1,300}), not just (the [^,]{1,300})", r"\1, \2"),
+    # "creativity isn't just about X — it's about Y" → "creativity is about Y"
+    (r"\b(\w{1,50}) (?:isn't|is not) (?:just|only|merely) about [^—,;]{1,300}?[—,;]\s{0,10}(?:it'?s|that'?s) (?:about )?", r"\1 is about "),
+    # Catch remaining "not just" with dash/comma patterns
+    (r"(?:isn't|is not|aren't|are not) (?:just|only|merely) ([^—,;.!?]{1,300}?)\s{0,10}[—]\s{0,10}(?:it'?s|they'?re|we'?re)\s{1,10}", r"is \1. It is "),
+]
+
+# Longest possible match of any rule (two MAX_SPAN runs plus fixed words) — generous upper bound
+MAX_MATCH_CHARS = 2 * MAX_SPAN + 200
+
+# Every rule contains "not" or "n't" within this many chars of where its match starts
+TRIGGER_LEAD_CHARS = 64
+
+_TRIGGER = re.compile(r"n't|[Nn]ot")
+
+
+class DesmellEngine:
+    """Compiled rule set: one combined regex, replacements dispatched by which rule matched."""
+
+    def __init__(self, rules=RULES):
+        parts = []
+        self._templates = {}
+        group_index = 0
+        for i, (pattern, replacement) in enumerate(rules):
+            name = f"r{i}"
+            offset = group_index + 1  # the rule's own groups follow its wrapper group
+            group_index += 1 + re.compile(pattern).groups
+            parts.append(f"(?P<{name}>{pattern})")
+            # Shift \1, \2 ... onto the rule's position inside the combined pattern
+            self._templates[name] = re.sub(r"\\(\d)", lambda m: f"\\g<{int(m.group(1)) + offset}>", replacement)
+        self.pattern = re.compile("|".join(parts))
+        # Same alternation behind a lazy skip: match() tries only the start positions within
+        # TRIGGER_LEAD_CHARS of where it is anchored, leftmost first.
+        self._windowed = re.compile(f"(?s:.){{0,{TRIGGER_LEAD_CHARS}}}?(?:{self.pattern.pattern})")
+
+    def _replace(self, match):
+        return match.expand(self._templates[match.lastgroup])
+
+    def _matches(self, text, stop=None):
+        """Yield non-overlapping matches in the order re.sub would apply them, starting before stop.
+
+        The combined pattern is only tried in the window just before each trigger, so text with
+        no "not"/"n't" in it costs one literal scan.
+        """
+        stop = len(text) if stop is None else stop
+        pos = 0
+        scan = 0
+        while True:
+            trigger = _TRIGGER.search(text, scan)
+            if trigger is None or trigger.start() - TRIGGER_LEAD_CHARS >= stop:
+                return
+            t = trigger.start()
+            match = self._windowed.match(text, max(pos, t - TRIGGER_LEAD_CHARS))
+            if match is not None and match.start(match.lastgroup) <= t and match.start(match.lastgroup) < stop:
+                yield match
+                pos = scan = match.end()
+            else:
+                scan = t + 1
+
+    def clean_prefix(self, text, limit):
+        """Desmell text up to `limit`, given every match starting before limit ends inside text.
+
+        Returns (cleaned, consumed) — consumed >= limit when a match straddles it.
+        """
+        out = []
+        pos = 0
+        for match in self._matches(text, limit):
+            out.append(text[pos:match.start(match.lastgroup)])
+            out.append(self._replace(match))
+            pos = match.end()
+        consumed = max(pos, limit)
+        out.append(text[pos:consumed])
+        return "".join(out), consumed
+
+    def clean(self, text):
+        """Desmell a complete text."""
+        return self.clean_prefix(text, len(text))[0]
+
+    def safe_limit(self, text):
+        """Position before which every possible match is fully decided by the text so far."""
+        limit = len(text) - TRIGGER_LEAD_CHARS
+        unresolved_from = len(text) - MAX_MATCH_CHARS
+        for trigger in _TRIGGER.finditer(text, max(0, unresolved_from)):
+            limit = min(limit, trigger.start() - TRIGGER_LEAD_CHARS)
+            break
+        return max(0, limit)
+
+
+class DesmellStream:
+    """Incremental desmell: feed() streamed fragments, emit cleaned text as soon as it is decided.
+
+    Concatenating every feed() result plus flush() equals DesmellEngine.clean() on the whole text.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or ENGINE
+        self._buffer = ""
+
+    def feed(self, fragment):
+        self._buffer += fragment
+        limit = self.engine.safe_limit(self._buffer)
+        if limit <= 0:
+            return ""
+        cleaned, consumed = self.engine.clean_prefix(self._buffer, limit)
+        self._buffer = self._buffer[consumed:]
+        return cleaned
+
+    def flush(self):
+        """Clean and return whatever is still held back (call once the stream ends)."""
+        cleaned = self.engine.clean(self._buffer)
+        self._buffer = ""
+        return cleaned
+
+
+ENGINE = DesmellEngine()
+
+
+def desmell(text):
+    """Post-process to remove common AI rhetorical patterns."""
+    return ENGINE.clean(text)
@@ -0,0 +1,181 @@
+"""
+Server-side long-form jobs
+Submit once, get a job ID; a background worker runs generate_full_keynote (and optionally
+synthesize_long_audio) and publishes each progress_callback stage as an event.
+Needs a long-running server process — serverless functions stop background work after the response.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+# Finished jobs are kept this long for polling, then dropped
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '3600'))
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class Job:
+    """One long-form run: status, ordered progress events and the final result."""
+
+    def __init__(self, topic, duration_minutes, voice=False, parallel=False):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.duration_minutes = duration_minutes
+        self.voice = voice
+        self.parallel = parallel
+        self.status = "queued"
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._changed = threading.Condition()
+        self._async_waiters = []  # (loop, asyncio.Event) of listeners in await_events
+
+    def _notify(self):
+        """Wake every listener; called with self._changed held."""
+        self._changed.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # that listener's loop has closed
+
+    def publish(self, stage, value):
+        """progress_callback target — records the stage and wakes any event listeners."""
+        with self._changed:
+            self.events.append({"stage": stage, "value": value, "at": time.time()})
+            self._notify()
+
+    def finish(self, status, result=None, error=None):
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self.events.append({"stage": status, "value": 0, "at": self.finished_at})
+            self._notify()
+
+    @property
+    def finished(self):
+        return self.status in TERMINAL_STATUSES
+
+    def wait_for_events(self, since, timeout=15):
+        """Block until there are events past index `since` or the job finishes. Returns new events."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > since or self.finished, timeout=timeout)
+            return self.events[since:]
+
+    async def await_events(self, since, timeout=15):
+        """wait_for_events for event-loop callers, without holding a thread while waiting."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._changed:
+            if len(self.events) > since or self.finished:
+                return self.events[since:]
+            self._async_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._changed:
+                self._async_waiters.remove(waiter)
+        with self._changed:
+            return self.events[since:]
+
+    def to_dict(self, since=0, include_result=False):
+        """Job state for polling and SSE. The result (script and audio links) is only attached
+        when asked for: the final SSE event and ?result=1 polls."""
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "topic": self.topic,
+            "duration_minutes": self.duration_minutes,
+            "voice": self.voice,
+            "events": self.events[since:],
+            "next_event": len(self.events),
+            "error": self.error,
+        }
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+def _run(job):
+    """Worker body: script, then (optionally) voice, reporting every stage on the job."""
+    import deadline
+    from longform_engine import generate_full_keynote, generate_keynote_with_voice, synthesize_long_audio
+
+    job.status = "running"
+    # Jobs outlive the request that submitted them, so they get their own (optional) budget
+    deadline.start(deadline.JOB_DEADLINE_SECONDS)
+    try:
+        if job.voice and not job.parallel:
+            # Sequential sections: voice each one while the next is being written
+            keynote, audio, error = generate_keynote_with_voice(
+                job.topic, job.duration_minutes, progress_callback=job.publish
+            )
+        else:
+            keynote = generate_full_keynote(
+                job.topic, job.duration_minutes,
+                progress_callback=job.publish, parallel=job.parallel
+            )
+            audio, error = None, None
+            if job.voice:
+                audio, error = synthesize_long_audio(keynote["script"], progress_callback=job.publish)
+        result = {"keynote": keynote}
+
+        if job.voice:
+            if error:
+                job.finish("failed", result=result, error=error)
+                return
+            # Clients fetch the audio from audio_url; inline base64 is only kept if it couldn't be stored
+            if audio.get("audio_id"):
+                audio = {k: v for k, v in audio.items() if k != "audio_base64"}
+            result["audio"] = audio
+
+        job.finish("done", result=result)
+    except Exception as e:
+        job.finish("failed", error=f"Long-form job failed: {str(e)[:300]}")
+
+
+class JobManager:
+    """In-process job registry backed by a bounded worker pool."""
+
+    def __init__(self, workers):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="longform-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def submit(self, topic, duration_minutes, voice=False, parallel=False):
+        job = Job(topic, duration_minutes, voice=voice, parallel=parallel)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(_run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+
+JOBS = JobManager(JOB_WORKERS)
@@ -0,0 +1,344 @@
+"""
+Knowledge base retrieval for Jason Silva AI
+BM25 index over the article blocks in jason_knowledge_base.txt, shared by every entry point.
+The corpus is memory-mapped and the index loads on first use from a prebuilt snapshot
+(jason_knowledge_base.index.json), so cold starts skip parsing; passages are byte ranges into
+the mapping and only the ones a prompt uses are decoded. Rebuild the snapshot after editing the
+corpus with `python knowledge_base.py --build` — a stale one is detected and rebuilt in memory.
+Prompts get only the passages relevant to the topic, packed under a token budget.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import heapq
+import hashlib
+import threading
+from collections import Counter, defaultdict
+
+_kb_dir = os.path.dirname(os.path.abspath(__file__))
+_kb_path = os.path.join(_kb_dir, 'jason_knowledge_base.txt')
+_snapshot_path = os.path.join(_kb_dir, 'jason_knowledge_base.index.json')
+
+# Bump when the snapshot layout or passage splitting changes
+SNAPSHOT_VERSION = 1
+
+# Retrieval settings (override via env)
+KB_TOKEN_BUDGET = int(os.getenv('KB_TOKEN_BUDGET', '3000'))
+KB_TOP_K = int(os.getenv('KB_TOP_K', '8'))
+
+# Passages are paragraph groups of roughly this size, so a budget packs several sources
+PASSAGE_CHARS = 1200
+
+# ~4 chars per token for English prose — close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_ARTICLE_RE = re.compile(r'^=== (.+?) ===[ \t]*$', re.MULTILINE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they
+this those through to too under until up very was we were what when where which while who whom
+why will with you your yours yourself yourselves it's i'm we're you're that's there's what's
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _trim(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _segments(text, start, end, separator):
+    """Trimmed, non-empty (start, end) spans of text[start:end] split on separator."""
+    spans = []
+    while start <= end:
+        cut = text.find(separator, start, end)
+        if cut < 0:
+            cut = end
+        s, e = _trim(text, start, cut)
+        if s < e:
+            spans.append((s, e))
+        start = cut + len(separator)
+    return spans
+
+
+def _split_passages(text, start, end, max_chars=PASSAGE_CHARS):
+    """Group paragraphs into passage spans of up to max_chars; break oversized paragraphs on lines.
+
+    Spans index into text, so a passage is always a contiguous slice of the corpus.
+    """
+    pieces = []
+    for p_start, p_end in _segments(text, start, end, '\n\n'):
+        if p_end - p_start <= max_chars:
+            pieces.append((p_start, p_end))
+            continue
+        # Oversized paragraph (e.g. the YouTube title list) — window it on line breaks
+        window = None
+        for line in _segments(text, p_start, p_end, '\n'):
+            if window and line[1] - window[0] > max_chars:
+                pieces.append(window)
+                window = line
+            else:
+                window = (window[0], line[1]) if window else line
+        if window:
+            pieces.append(window)
+
+    passages = []
+    current = None
+    for piece in pieces:
+        if current and piece[1] - current[0] > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = (current[0], piece[1]) if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def parse_articles(text):
+    """(title, body_start, body_end) for each === Title === block, body span trimmed."""
+    matches = list(_ARTICLE_RE.finditer(text))
+    articles = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        articles.append((match.group(1).strip(), *_trim(text, match.end(), end)))
+    return articles
+
+
+def build_snapshot(text):
+    """Index data for a corpus: article titles, passage byte ranges, lengths and BM25 postings."""
+    encoded = text.encode('utf-8')
+    articles = []
+    passages = []
+    doc_lens = []
+    postings = defaultdict(list)
+    byte_offset = 0
+    char_offset = 0
+
+    def to_bytes(char_index):
+        # Offsets only move forward, so encode just the stretch since the last one
+        nonlocal byte_offset, char_offset
+        byte_offset += len(text[char_offset:char_index].encode('utf-8'))
+        char_offset = char_index
+        return byte_offset
+
+    for title, body_start, body_end in parse_articles(text):
+        articles.append(title)
+        for start, end in _split_passages(text, body_start, body_end):
+            # Article title counts toward every passage it contains
+            tf = Counter(tokenize(title + " " + text[start:end]))
+            for term, freq in tf.items():
+                postings[term].append([len(passages), freq])
+            passages.append([len(articles) - 1, to_bytes(start), to_bytes(end)])
+            doc_lens.append(sum(tf.values()))
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "source_sha256": hashlib.sha256(encoded).hexdigest(),
+        "articles": articles,
+        "passages": passages,
+        "doc_lens": doc_lens,
+        "postings": postings,
+    }
+
+
+class KnowledgeIndex:
+    """BM25 index over knowledge-base passages, backed by the corpus bytes (usually an mmap)."""
+
+    def __init__(self, corpus, snapshot, source="snapshot"):
+        self.corpus = corpus
+        self.source = source  # "snapshot", or "built" when the snapshot was missing or stale
+        self.articles = snapshot["articles"]
+        self.spans = snapshot["passages"]
+        self.doc_lens = snapshot["doc_lens"]
+        self.postings = snapshot["postings"]
+
+        n = len(self.spans)
+        self.avg_len = (sum(self.doc_lens) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(hits) + 0.5) / (len(hits) + 0.5))
+            for term, hits in self.postings.items()
+        }
+        # Length normalisation depends only on the passage, so it is computed once
+        self.norms = [
+            BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_len) for length in self.doc_lens
+        ]
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text.encode('utf-8'), build_snapshot(text), source="built")
+
+    def __len__(self):
+        return len(self.spans)
+
+    def passage(self, i):
+        """Passage i as {"article", "text", "order"}, decoded from the corpus on demand."""
+        article, start, end = self.spans[i]
+        return {
+            "article": self.articles[article],
+            "text": bytes(self.corpus[start:end]).decode('utf-8'),
+            "order": i
+        }
+
+    def search(self, query, k=KB_TOP_K):
+        """Return the top-k (score, passage) pairs for a query, best first."""
+        terms = set(tokenize(query))
+        if not terms or not self.spans:
+            return []
+
+        # Walk only the postings of the query terms instead of scoring every passage
+        scores = defaultdict(float)
+        for term in terms:
+            hits = self.postings.get(term)
+            if not hits:
+                continue
+            idf = self.idf[term]
+            for i, freq in hits:
+                scores[i] += idf * freq * (BM25_K1 + 1) / (freq + self.norms[i])
+
+        # Ties keep corpus order, matching a stable sort over all passages
+        best = heapq.nlargest(k, sorted(scores.items()), key=lambda item: item[1])
+        return [(score, self.passage(i)) for i, score in best]
+
+    def build_context(self, query, token_budget=None, k=None):
+        """Pack the most relevant passages for a query under a token budget.
+
+        Passages are kept in corpus order so excerpts from one article read naturally.
+        Falls back to the opening passages when nothing in the query matches.
+        """
+        token_budget = token_budget or KB_TOKEN_BUDGET
+        k = k or KB_TOP_K
+
+        hits = [p for _, p in self.search(query, k)]
+        if not hits:
+            hits = [self.passage(i) for i in range(min(k, len(self.spans)))]
+
+        selected = []
+        used = 0
+        for passage in hits:
+            cost = estimate_tokens(passage["text"])
+            if used + cost > token_budget:
+                continue
+            selected.append(passage)
+            used += cost
+
+        selected.sort(key=lambda p: p["order"])
+        return "\n\n".join(f"[{p['article']}]\n{p['text']}" for p in selected)
+
+
+# --- Shared, lazily loaded index ---
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _map_corpus():
+    """Read-only mapping of the corpus (pages shared between worker processes), or b"" if absent."""
+    try:
+        with open(_kb_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return b""
+
+
+def _read_snapshot():
+    try:
+        with open(_snapshot_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_is_current(snapshot, corpus):
+    return (
+        snapshot is not None
+        and snapshot.get("version") == SNAPSHOT_VERSION
+        and snapshot.get("source_sha256") == hashlib.sha256(corpus).hexdigest()
+    )
+
+
+def _load_index():
+    corpus = _map_corpus()
+    snapshot = _read_snapshot()
+    if snapshot_is_current(snapshot, corpus):
+        return KnowledgeIndex(corpus, snapshot)
+    # Missing or stale snapshot (corpus edited without --build): index it here instead
+    return KnowledgeIndex(corpus, build_snapshot(bytes(corpus).decode('utf-8')), source="built")
+
+
+def get_index():
+    """The process-wide index, loaded on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _load_index()
+    return _index
+
+
+def retrieve_context(query, token_budget=None, k=None):
+    """Relevant knowledge-base excerpt for a query ("" if the corpus is missing)."""
+    index = get_index()
+    if not len(index):
+        return ""
+    return index.build_context(query, token_budget=token_budget, k=k)
+
+
+def write_snapshot():
+    """Rebuild the snapshot from the corpus on disk. Returns the snapshot dict."""
+    with open(_kb_path, encoding='utf-8') as f:
+        snapshot = build_snapshot(f.read())
+    tmp_path = _snapshot_path + '.part'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f, separators=(',', ':'), sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, _snapshot_path)
+    return snapshot
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Knowledge-base index snapshot')
+    parser.add_argument('--build', action='store_true', help='Rebuild the index snapshot from the corpus')
+    parser.add_argument('--check', action='store_true', help='Exit 1 if the snapshot is missing or stale')
+    args = parser.parse_args()
+
+    if args.build:
+        built = write_snapshot()
+        print(f"Wrote {_snapshot_path}: {len(built['articles'])} articles, "
+              f"{len(built['passages'])} passages, {len(built['postings'])} terms")
+    elif args.check:
+        if not snapshot_is_current(_read_snapshot(), _map_corpus()):
+            print(f"{_snapshot_path} is stale — run: python knowledge_base.py --build")
+            sys.exit(1)
+        print("Snapshot is current")
+    else:
+        index = get_index()
+        print(f"{len(index.articles)} articles, {len(index)} passages, {len(index.postings)} terms (from {index.source})")
@@ -0,0 +1,209 @@
+"""
+Async long-form engine for the ASGI serving mode
+Non-blocking twins of the per-request longform_engine calls only: Anthropic messages,
+outline, section, and single-chunk voice (whole or streamed). Prompts, parsing and caches are
+shared with longform_engine; only the upstream I/O differs.
+
+There are no async generate_full_keynote / synthesize_long_audio. Whole keynotes run as jobs
+on the sync engine in a worker thread (jobs.py), in both serving modes. That engine is the one
+with checkpoint support, and it shares the upstream rate limiters with these calls.
+"""
+
+import time
+import asyncio
+
+import metrics
+import model_router
+import upstream
+import upstream_async
+from audio_cache import AUDIO_CACHE, cache_key
+from script_cache import SCRIPT_CACHE, request_key
+from longform_engine import (
+    STREAM_BLOCK_BYTES, get_anthropic_key, _anthropic_payload, _outline_prompts, _parse_outline,
+    _section_prompts, _extract_quotes, _tts_payload, _raise_for_tts_status
+)
+
+
+async def call_anthropic(system_prompt, user_prompt, max_tokens=4000, temperature=0.8, model=None, timeout=None):
+    """Make a single Anthropic API call without blocking the loop. Returns text or raises.
+
+    A response cut off at max_tokens is retried once with a larger cap, as in _call_anthropic.
+    """
+    api_key = get_anthropic_key()
+    if not api_key:
+        raise ValueError("No ANTHROPIC_API_KEY set")
+
+    while True:
+        payload = _anthropic_payload(system_prompt, user_prompt, max_tokens, temperature, model)
+        start = time.perf_counter()
+        response = await upstream_async.post(
+            "anthropic", "/v1/messages",
+            headers=upstream.anthropic_headers(api_key),
+            json=payload,
+            timeout=timeout
+        )
+
+        if response.status_code != 200:
+            raise upstream.UpstreamError(
+                f"Anthropic API error {response.status_code}: {response.text[:300]}",
+                status_code=response.status_code
+            )
+
+        data = response.json()
+        usage = data.get('usage') or {}
+        upstream.record_usage(usage)
+        model_router.record(payload["model"], time.perf_counter() - start, usage.get('output_tokens') or 0)
+        if data.get('stop_reason') != 'max_tokens':
+            return data['content'][0]['text']
+        max_tokens = model_router.after_truncation(payload["model"], max_tokens)
+
+
+async def generate_outline(topic, duration_minutes=45, fresh=False):
+    """Async generate_outline, sharing the same script cache and single-flight."""
+
+    async def request_outline():
+        system_prompt, user_prompt, arc_key = _outline_prompts(topic, duration_minutes)
+        route = model_router.route("outline")
+        with metrics.span("outline_llm", tier=route.tier):
+            result = await call_anthropic(
+                system_prompt, user_prompt, max_tokens=route.max_tokens, temperature=0.7, model=route.model
+            )
+        return _parse_outline(result, arc_key, duration_minutes)
+
+    return await SCRIPT_CACHE.aget_or_compute(
+        request_key("outline", topic=topic, duration_minutes=duration_minutes),
+        request_outline,
+        fresh=fresh
+    )
+
+
+async def generate_section(section_outline, previous_summaries, used_quotes, topic):
+    """Generate one section of the keynote. used_quotes is a QuoteLedger or a list of quote lines."""
+    # Off the loop: the prompt embeds a KB excerpt (loaded on first use, BM25-scored)
+    system_prompt, user_prompt = await asyncio.to_thread(
+        _section_prompts, section_outline, previous_summaries, used_quotes, topic
+    )
+    route = model_router.route(
+        "section", section_outline.get('target_words', 500), role=section_outline.get('name')
+    )
+    with metrics.span("section_llm", tier=route.tier):
+        text = await call_anthropic(
+            system_prompt, user_prompt, max_tokens=route.max_tokens, temperature=0.8, model=route.model
+        )
+    return text.strip(), _extract_quotes(text)
+
+
+# --- Voice ---
+
+async def synthesize_chunk(text, voice_id, api_key, previous_text=None, next_text=None):
+    """Synthesize one chunk to audio bytes (through the audio cache)."""
+    payload = _tts_payload(text, previous_text, next_text)
+
+    key = cache_key(voice_id, payload)
+    cached = await asyncio.to_thread(AUDIO_CACHE.get, key)
+    if cached is not None:
+        return cached
+
+    limiter = upstream_async.get_limiter("elevenlabs")
+    with metrics.span("tts"):
+        async with limiter.aslot():
+            response = await upstream_async.post(
+                "elevenlabs", f"/v1/text-to-speech/{voice_id}",
+                headers=upstream.elevenlabs_headers(api_key),
+                json=payload
+            )
+
+    if response.status_code != 200:
+        _raise_for_tts_status(response, limiter)
+
+    await asyncio.to_thread(AUDIO_CACHE.put, key, response.content)
+    return response.content
+
+
+class AsyncAudioStream:
+    """Async AudioStream: MP3 blocks of one streamed synthesis, holding its limiter slot and
+    upstream response until aclose(). That runs by itself once the stream is drained or fails;
+    routes must also await it when the response ends, in case the body is never iterated."""
+
+    def __init__(self, response=None, slot=None, writer=None, cached=None):
+        self._response = response
+        self._slot = slot
+        self._writer = writer
+        self._cached = cached
+        self._blocks = response.aiter_bytes(STREAM_BLOCK_BYTES) if response is not None else None
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        if self._blocks is None:
+            block, self._cached = self._cached, None
+            if block is None:
+                await self.aclose()
+                raise StopAsyncIteration
+            return block
+        try:
+            block = await self._blocks.__anext__()
+            while not block:
+                block = await self._blocks.__anext__()
+        except StopAsyncIteration:
+            # Only a fully drained stream is cacheable
+            await asyncio.to_thread(self._writer.commit)
+            await self.aclose()
+            raise
+        except BaseException:
+            await self.aclose()
+            raise
+        # Spooled to the cache block by block; the file writes run off the loop
+        await asyncio.to_thread(self._writer.write, block)
+        return block
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer:
+            self._writer.abort()
+        if self._response is not None:
+            try:
+                await self._response.aclose()
+            finally:
+                await self._slot.__aexit__(None, None, None)
+
+
+async def stream_chunk(text, voice_id, api_key, previous_text=None, next_text=None):
+    """Start a streaming synthesis; returns an AsyncAudioStream of MP3 blocks.
+
+    Errors raise before any audio is yielded. Completed streams are written to the audio cache.
+    """
+    payload = _tts_payload(text, previous_text, next_text)
+
+    key = cache_key(voice_id, payload)
+    cached = await asyncio.to_thread(AUDIO_CACHE.get, key)
+    if cached is not None:
+        return AsyncAudioStream(cached=cached)
+
+    limiter = upstream_async.get_limiter("elevenlabs")
+    slot = limiter.aslot()
+    await slot.__aenter__()
+    try:
+        response = await upstream_async.open_stream(
+            "elevenlabs", f"/v1/text-to-speech/{voice_id}/stream",
+            headers=upstream.elevenlabs_headers(api_key),
+            json=payload
+        )
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                _raise_for_tts_status(response, limiter)
+            writer = await asyncio.to_thread(AUDIO_CACHE.writer, key)
+        except BaseException:
+            await response.aclose()
+            raise
+        return AsyncAudioStream(response, slot, writer)
+    except BaseException:
+        await slot.__aexit__(None, None, None)
+        raise
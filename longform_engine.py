@@ -8,20 +8,53 @@ import sys
 import json
 import time
 import base64
-import tempfile
-import requests
-import certifi
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+import deadline
+import metrics
+import model_router
+import upstream
+from audio_cache import AUDIO_CACHE, cache_key
+from audio_stitch import stitch
+from audio_store import store_audio
+from checkpoint import content_name
+from chunker import split_chunks
+from desmell import desmell
+from knowledge_base import retrieve_context
+from quote_ledger import THINKER_POOL, QuoteLedger, extract_quotes
+from script_cache import SCRIPT_CACHE, request_key
+
 # Voice ID constant
 JASON_VOICE_ID = 'Xar9jZKMXSKxBNlDsFCr'
 
-# Load knowledge base
-JASON_KB = ""
-_kb_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jason_knowledge_base.txt')
-if os.path.exists(_kb_path):
-    with open(_kb_path) as _f:
-        JASON_KB = _f.read()
+# Voice retries: attempts per chunk, and how long a 429 without Retry-After pauses every caller.
+# Delays between attempts are jittered exponential backoff within the request deadline (deadline.py).
+VOICE_MAX_ATTEMPTS = int(os.getenv('VOICE_MAX_ATTEMPTS', '3'))
+VOICE_RETRY_DELAY = 3
+
+# Section attempts (first try + retries), and seconds before a slow section draft gets a
+# duplicate request racing it (0 = never hedge; a hedge can double that section's token cost)
+SECTION_MAX_ATTEMPTS = int(os.getenv('SECTION_MAX_ATTEMPTS', '2'))
+SECTION_HEDGE_SECONDS = float(os.getenv('SECTION_HEDGE_SECONDS', '0'))
+
+# Optional wall-clock target (seconds) for long-form synthesis; chunk count is raised to meet it
+VOICE_TARGET_LATENCY = float(os.getenv('VOICE_TARGET_LATENCY', '0')) or None
+
+# Read size when passing streamed audio through — bounds per-request buffering
+STREAM_BLOCK_BYTES = 8192
+
+# Concurrent section drafts in parallel mode
+LONGFORM_MAX_WORKERS = int(os.getenv('LONGFORM_MAX_WORKERS', '4'))
+
+# Pace Anthropic calls through the shared limiter (ANTHROPIC_RATE / _BURST / _CONCURRENCY).
+# Off for the web app, where the request deadline bounds each call; batch runs turn it on.
+LIMIT_ANTHROPIC = os.getenv('LIMIT_ANTHROPIC', '').lower() in ('1', 'true', 'yes')
+
+# Knowledge-base budget per section prompt (sections send a smaller excerpt than short scripts)
+SECTION_KB_TOKENS = int(os.getenv('KB_SECTION_TOKEN_BUDGET', '1000'))
 
 def get_anthropic_key():
     return os.getenv('ANTHROPIC_API_KEY', '').strip()
@@ -65,49 +98,80 @@ NARRATIVE_ARCS = {
     ],
 }
 
-# Thinker pool — each section draws from different thinkers
-THINKER_POOL = [
-    "Terence McKenna", "Carl Sagan", "Alan Watts", "Carl Jung", "Joseph Campbell",
-    "Stuart Kauffman", "Ray Kurzweil", "Buckminster Fuller", "Aldous Huxley",
-    "Pierre Teilhard de Chardin", "Rupert Sheldrake", "Douglas Hofstadter",
-    "William James", "Albert Einstein", "Marshall McLuhan", "Nikola Tesla",
-    "Werner Heisenberg", "David Bohm", "Ilya Prigogine", "Freeman Dyson"
-]
+
+def _anthropic_payload(system_prompt, user_prompt, max_tokens=4000, temperature=0.8, model=None):
+    """Messages API request body shared by the sync and async clients."""
+    model = model or model_router.TIERS["quality"]["model"]
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "system": upstream.fit_cache(system_prompt, model_router.min_cache_tokens(model)),
+        "messages": [{"role": "user", "content": user_prompt}]
+    }
+
 
 def _call_anthropic(system_prompt, user_prompt, max_tokens=4000, temperature=0.8, model=None):
-    """Make a single Anthropic API call. Returns text or raises."""
+    """Make a single Anthropic API call. Returns text or raises.
+
+    A response cut off at max_tokens is retried once with a larger cap (model_router.after_truncation).
+    """
     api_key = get_anthropic_key()
     if not api_key:
         raise ValueError("No ANTHROPIC_API_KEY set")
 
-    model = model or "claude-sonnet-4-20250514"
-
-    response = requests.post(
-        "https://api.anthropic.com/v1/messages",
-        headers={
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "Content-Type": "application/json"
-        },
-        json={
-            "model": model,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "system": system_prompt,
-            "messages": [{"role": "user", "content": user_prompt}]
-        },
-        timeout=55,
-        verify=certifi.where()
+    limiter = upstream.get_limiter("anthropic") if LIMIT_ANTHROPIC else None
+    while True:
+        payload = _anthropic_payload(system_prompt, user_prompt, max_tokens, temperature, model)
+        start = time.perf_counter()
+        with limiter.slot() if limiter else nullcontext():
+            response = upstream.post(
+                "anthropic", "/v1/messages",
+                headers=upstream.anthropic_headers(api_key),
+                json=payload
+            )
+
+        if response.status_code != 200:
+            retry_after = upstream.parse_retry_after(response)
+            if limiter and response.status_code == 429:
+                limiter.pause(retry_after if retry_after is not None else VOICE_RETRY_DELAY)
+            raise upstream.UpstreamError(
+                f"Anthropic API error {response.status_code}: {response.text[:300]}",
+                status_code=response.status_code, retry_after=retry_after
+            )
+
+        data = response.json()
+        usage = data.get('usage') or {}
+        upstream.record_usage(usage)
+        model_router.record(payload["model"], time.perf_counter() - start, usage.get('output_tokens') or 0)
+        if data.get('stop_reason') != 'max_tokens':
+            return data['content'][0]['text']
+        max_tokens = model_router.after_truncation(payload["model"], max_tokens)
+
+
+def generate_outline(topic, duration_minutes=45, fresh=False):
+    """Generate a structured outline with narrative arc.
+
+    Identical (topic, duration) requests share one cached outline; fresh=True regenerates.
+    """
+    return SCRIPT_CACHE.get_or_compute(
+        request_key("outline", topic=topic, duration_minutes=duration_minutes),
+        lambda: _request_outline(topic, duration_minutes),
+        fresh=fresh
     )
 
-    if response.status_code != 200:
-        raise Exception(f"Anthropic API error {response.status_code}: {response.text[:300]}")
 
-    return response.json()['content'][0]['text']
+def _request_outline(topic, duration_minutes):
+    """One fast-tier call for the outline JSON. Returns the parsed outline or raises."""
+    system_prompt, user_prompt, arc_key = _outline_prompts(topic, duration_minutes)
+    route = model_router.route("outline")
+    with metrics.span("outline_llm", tier=route.tier):
+        result = _call_anthropic(system_prompt, user_prompt, max_tokens=route.max_tokens, temperature=0.7, model=route.model)
+    return _parse_outline(result, arc_key, duration_minutes)
 
 
-def generate_outline(topic, duration_minutes=45):
-    """Generate a structured outline with narrative arc."""
+def _outline_prompts(topic, duration_minutes):
+    """Build (system_prompt, user_prompt, arc_key) for the outline call."""
 
     # Find closest arc
     arc_key = min(NARRATIVE_ARCS.keys(), key=lambda k: abs(k - duration_minutes))
@@ -155,7 +219,12 @@ For each section, provide:
 
 Return a JSON object: {{"topic": "...", "sections": [...]}}"""
 
-    result = _call_anthropic(system_prompt, user_prompt, max_tokens=2000, temperature=0.7, model="claude-haiku-4-5-20251001")
+    return system_prompt, user_prompt, arc_key
+
+
+def _parse_outline(result, arc_key, duration_minutes):
+    """Parse the outline JSON returned by the model and attach arc metadata."""
+    arc = NARRATIVE_ARCS[arc_key]
 
     # Parse JSON (handle potential markdown wrapping)
     result = result.strip()
@@ -173,9 +242,29 @@ Return a JSON object: {{"topic": "...", "sections": [...]}}"""
 
 
 def generate_section(section_outline, previous_summaries, used_quotes, topic):
-    """Generate one section of the keynote."""
+    """Generate one section of the keynote. used_quotes is a QuoteLedger or a list of quote lines."""
+    system_prompt, user_prompt = _section_prompts(section_outline, previous_summaries, used_quotes, topic)
+    route = model_router.route(
+        "section", section_outline.get('target_words', 500), role=section_outline.get('name')
+    )
+    with metrics.span("section_llm", tier=route.tier):
+        text = _call_anthropic(system_prompt, user_prompt, max_tokens=route.max_tokens, temperature=0.8, model=route.model)
+    return text.strip(), _extract_quotes(text)
+
 
-    kb_excerpt = JASON_KB[:4000] if JASON_KB else ""
+def _section_prompts(section_outline, previous_summaries, used_quotes, topic):
+    """Build (system_prompt, user_prompt) for one section."""
+
+    # Retrieved by topic alone so every section of a run shares the same cacheable prefix
+    with metrics.span("kb_retrieve"):
+        kb_excerpt = retrieve_context(topic, token_budget=SECTION_KB_TOKENS)
+
+    kb_context = ""
+    if kb_excerpt:
+        kb_context = f"""
+JASON'S ACTUAL WRITINGS (ground ideas and vocabulary here):
+{kb_excerpt}
+"""
 
     prev_context = ""
     if previous_summaries:
@@ -185,13 +274,14 @@ PREVIOUS SECTIONS (summary — maintain continuity, do NOT repeat ideas):
 """
 
     used_q = ""
-    if used_quotes:
+    ledger = QuoteLedger.coerce(used_quotes)
+    if ledger:
         used_q = f"""
 QUOTES ALREADY USED (do NOT repeat these):
-{chr(10).join(f'- {q}' for q in used_quotes)}
+{ledger.render()}
 """
 
-    system_prompt = f"""You are Jason Silva delivering a keynote. Channel his actual voice.
+    persona = f"""You are Jason Silva delivering a keynote. Channel his actual voice.
 
 Style: wonder/awe hooks, rapid-fire with pauses ("..."), philosopher quotes, emotional crescendo, poetic intensity.
 Phrases: "the adjacent possible," "cosmic perspective," "aesthetic arrest," "ecstatic truth"
@@ -200,7 +290,10 @@ Patterns: "Have you ever considered...", "Picture this...", "Here's the thing...
 NEVER USE: "not just X, it's Y" / "not about X, it's about Y" / "not merely" / "In a world where" / "At its core" / "Let's delve" / "arguably" — these are AI tells. Make DIRECT assertions instead.
 
 RULES: Only spoken text. No markdown/headers/bold. Use "..." for pauses. Attribute quotes. Hit the word count target — write LONG, develop ideas fully.
-{prev_context}{used_q}"""
+{kb_context}"""
+
+    # Persona + knowledge base are identical for every section; run-specific context goes after the cache breakpoint
+    system_prompt = upstream.cached_system(persona, f"{prev_context}{used_q}")
 
     user_prompt = f"""Write section {section_outline.get('section_number', '?')} of a keynote on "{topic}".
 
@@ -214,51 +307,184 @@ Opening hook: {section_outline.get('opening_hook', 'Start with wonder')}
 
 Write approximately {section_outline.get('target_words', 500)} words. Pure spoken word only."""
 
-    text = _call_anthropic(system_prompt, user_prompt, max_tokens=1500, temperature=0.8)
+    return system_prompt, user_prompt
 
-    # Extract any new quotes used
-    new_quotes = []
-    for line in text.split('\n'):
-        for thinker in THINKER_POOL:
-            if thinker.lower() in line.lower() and '"' in line:
-                new_quotes.append(line.strip()[:200])
-                break
 
-    return text.strip(), new_quotes
+def _extract_quotes(text):
+    """Lines of a section that quote a pool thinker."""
+    return [line for _, line in extract_quotes(text)]
 
 
 def _desmell_text(text):
     """Post-process to remove common AI rhetorical patterns."""
-    import re
-
-    replacements = [
-        # "X isn't just Y — it's Z" → "X is Z"
-        (r"(\w+) (?:isn't|is not|aren't|are not) (?:just|only|merely|simply) [^—,;.!?]+?[—,;]\s*(?:it'?s|they'?re|this is|that'?s)\s+", r"\1 is "),
-        # "not just X, we're Y" → "We are Y"
-        (r"[Ww]e'?re not (?:just|only|merely|simply) [^.!?]+?[,;—]\s*we'?re\s+", "We are "),
-        # "not just X. We're Y" → "We are Y"
-        (r"[Ww]e'?re not (?:just|only|merely|simply) [^.!?]+\.\s*[Ww]e'?re\s+", "We are "),
-        # "It's not just/only about X, it's about Y" → "It's about Y"
-        (r"[Ii]t'?s not (?:just|only|merely|simply) (?:about )?[^,;—]+?[,;—]\s*it'?s (?:about )?", "It's about "),
-        # "This isn't merely X — it's Y" → "This is Y"
-        (r"[Tt]his (?:isn't|is not) (?:just|merely|simply) [^—,;]+?[—,;]\s*(?:it'?s|this is)\s+", "This is "),
-        # "not just the X, not just the Y" → "the X, the Y" (list patterns)
-        (r"[Nn]ot just (the [^,]+), not just (the [^,]+)", r"\1, \2"),
-        # "creativity isn't just about X — it's about Y" → "creativity is about Y"
-        (r"(\w+) (?:isn't|is not) (?:just|only|merely) about [^—,;]+?[—,;]\s*(?:it'?s|that'?s) (?:about )?", r"\1 is about "),
-        # Catch remaining "not just" with dash/comma patterns
-        (r"(?:isn't|is not|aren't|are not) (?:just|only|merely) ([^—,;.!?]+?)\s*[—]\s*(?:it'?s|they'?re|we'?re)\s+", r"is \1. It is "),
-    ]
-
-    for pattern, replacement in replacements:
-        text = re.sub(pattern, replacement, text)
-
-    return text
-
-
-def generate_full_keynote(topic, duration_minutes=45, progress_callback=None):
+    return desmell(text)
+
+
+def _write_section(index, section, previous_summaries, used_quotes, topic):
+    """Generate one section (hedged, retried within the deadline), then desmell. Never raises."""
+    for attempt in range(SECTION_MAX_ATTEMPTS):
+        try:
+            text, new_quotes = deadline.hedged(
+                generate_section, SECTION_HEDGE_SECONDS, section, previous_summaries, used_quotes, topic
+            )
+            break
+        except Exception as e:
+            delay = None
+            if attempt < SECTION_MAX_ATTEMPTS - 1 and getattr(e, "retryable", True):
+                delay = deadline.backoff(attempt, getattr(e, "retry_after", None))
+            if delay is None:
+                text = f"[Section {index+1} generation failed: {str(e)[:100]}]"
+                new_quotes = []
+                break
+            metrics.inc("upstream_retries_total", host="anthropic")
+            time.sleep(delay)
+
+    # Post-process to remove AI smell
+    with metrics.span("desmell"):
+        return _desmell_text(text), new_quotes
+
+
+def _section_written(result):
+    return not result[0].startswith("[Section ")
+
+
+def _section_checkpoint(i, section, mode):
+    """Checkpoint name of a section draft: its position, its outline entry and how it was drafted
+    ("parallel" from outline summaries, "sequential" from the sections before it), so a resume
+    after the outline or the mode changed never reuses a stale draft."""
+    return content_name(f"section-{i+1:02d}", json.dumps(section, sort_keys=True), mode)
+
+
+def _checkpointed(checkpoint, name, keep, fn, *args):
+    """fn(*args), reused from the checkpoint if it holds `name`; saved there if keep(result) allows."""
+    if checkpoint is None:
+        return fn(*args)
+    saved = checkpoint.load(name)
+    if saved is not None:
+        return saved
+    result = fn(*args)
+    if keep is None or keep(result):
+        checkpoint.save(name, result)
+    return result
+
+
+def _section_summary(section_number, section, text):
+    """Short continuity summary of a finished section for later prompts."""
+    words = text.split()
+    return f"Section {section_number} ({section.get('name', '')}): {' '.join(words[:50])}..."
+
+
+def _outline_summaries(outline, index):
+    """Continuity context for a parallel draft, built from the outline alone."""
+    summaries = []
+    for j, other in enumerate(outline["sections"]):
+        if j == index:
+            continue
+        position = "earlier" if j < index else "later"
+        summaries.append(
+            f"Section {j+1} ({other.get('name', '')}, {position}): {other.get('theme', '')} "
+            f"Opens with: {other.get('opening_hook', '')}"
+        )
+    return summaries
+
+
+def _smooth_join(previous_text, next_text, topic):
+    """Rewrite the opening paragraph of next_text so it flows out of previous_text."""
+    system_prompt, user_prompt = _smooth_join_prompts(previous_text, next_text, topic)
+    route = model_router.route("join")
+    with metrics.span("smooth_join_llm", tier=route.tier):
+        rewritten = _call_anthropic(
+            system_prompt, user_prompt,
+            max_tokens=route.max_tokens, temperature=0.5, model=route.model
+        )
+    return _apply_join(next_text, rewritten)
+
+
+def _smooth_join_prompts(previous_text, next_text, topic):
+    """Build (system_prompt, user_prompt) for the continuity pass over one join."""
+    opening = next_text.split("\n\n", 1)[0]
+    tail = " ".join(previous_text.split()[-80:])
+
+    system_prompt = """You are editing a Jason Silva keynote that was drafted section by section. Fix the seam between two sections.
+
+Return ONLY the rewritten paragraph. Pure spoken word, no markdown, no commentary."""
+
+    user_prompt = f"""Keynote topic: "{topic}"
+
+END OF PREVIOUS SECTION:
+...{tail}
+
+OPENING PARAGRAPH OF NEXT SECTION:
+{opening}
+
+Rewrite the opening paragraph so it picks up naturally from where the previous section ended. Keep its ideas, quotes and energy, keep roughly the same length, and do not repeat the previous section's final lines."""
+
+    return system_prompt, user_prompt
+
+
+def _apply_join(next_text, rewritten):
+    """Swap the rewritten opening paragraph into next_text."""
+    rewritten = rewritten.strip()
+    if not rewritten:
+        return next_text
+    paragraphs = next_text.split("\n\n", 1)
+    paragraphs[0] = _desmell_text(rewritten)
+    return "\n\n".join(paragraphs)
+
+
+def _generate_sections_parallel(outline, topic, max_workers, progress_callback=None, checkpoint=None):
+    """Draft every section concurrently from the outline, then smooth the joins."""
+    sections = outline["sections"]
+    sections_text = [None] * len(sections)
+    all_used_quotes = QuoteLedger()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(
+                metrics.bind(_checkpointed), checkpoint, _section_checkpoint(i, section, "parallel"), _section_written,
+                _write_section, i, section, _outline_summaries(outline, i), [], topic
+            ): i
+            for i, section in enumerate(sections)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            text, new_quotes = future.result()
+            sections_text[i] = text
+            all_used_quotes.extend(new_quotes)
+            if progress_callback:
+                progress_callback("generating_section", done)
+
+        # Continuity pass: each join only needs its two neighbouring drafts
+        if progress_callback:
+            progress_callback("smoothing_joins", len(sections) - 1)
+
+        joins = {
+            pool.submit(
+                metrics.bind(_checkpointed), checkpoint,
+                content_name("join", sections_text[i - 1], sections_text[i]), None,
+                _smooth_join, sections_text[i - 1], sections_text[i], topic
+            ): i
+            for i in range(1, len(sections))
+            if not sections_text[i].startswith("[Section ")
+        }
+        for future in as_completed(joins):
+            try:
+                sections_text[joins[future]] = future.result()
+            except Exception:
+                # Keep the unsmoothed draft — a rough seam beats a missing section
+                pass
+
+    return sections_text, all_used_quotes
+
+
+def generate_full_keynote(topic, duration_minutes=45, progress_callback=None,
+                          parallel=False, max_workers=None, checkpoint=None):
     """
     Full pipeline: outline → sections → assembly.
+    With parallel=True, sections are drafted concurrently from the outline and
+    a continuity pass smooths the joins.
+    With a checkpoint (see checkpoint.py), the outline, finished sections and joins are
+    saved as they complete and reused on the next run; failed sections are retried.
     Returns dict with script, metadata, outline.
     """
 
@@ -266,46 +492,41 @@ def generate_full_keynote(topic, duration_minutes=45, progress_callback=None):
         progress_callback("generating_outline", 0)
 
     # Step 1: Generate outline
-    outline = generate_outline(topic, duration_minutes)
-
-    sections_text = []
-    previous_summaries = []
-    all_used_quotes = []
-    total_words = 0
+    with metrics.span("outline"):
+        outline = _checkpointed(checkpoint, "outline", None, generate_outline, topic, duration_minutes)
 
     # Step 2: Generate each section
-    for i, section in enumerate(outline["sections"]):
-        if progress_callback:
-            progress_callback("generating_section", i + 1)
+    if parallel:
+        sections_text, all_used_quotes = _generate_sections_parallel(
+            outline, topic, max_workers or LONGFORM_MAX_WORKERS, progress_callback, checkpoint
+        )
+    else:
+        sections_text = []
+        previous_summaries = []
+        all_used_quotes = QuoteLedger()
+
+        for i, section in enumerate(outline["sections"]):
+            if progress_callback:
+                progress_callback("generating_section", i + 1)
 
-        try:
-            text, new_quotes = generate_section(
-                section, previous_summaries, all_used_quotes, topic
+            text, new_quotes = _checkpointed(
+                checkpoint, _section_checkpoint(i, section, "sequential"), _section_written,
+                _write_section, i, section, previous_summaries, all_used_quotes, topic
             )
-        except Exception as e:
-            # Retry once
-            try:
-                time.sleep(2)
-                text, new_quotes = generate_section(
-                    section, previous_summaries, all_used_quotes, topic
-                )
-            except Exception:
-                text = f"[Section {i+1} generation failed: {str(e)[:100]}]"
-                new_quotes = []
 
-        # Post-process to remove AI smell
-        text = _desmell_text(text)
+            sections_text.append(text)
+            all_used_quotes.extend(new_quotes)
 
-        sections_text.append(text)
-        all_used_quotes.extend(new_quotes)
-
-        # Create summary of this section for context
-        words = text.split()
-        summary = f"Section {i+1} ({section['name']}): {' '.join(words[:50])}..."
-        previous_summaries.append(summary)
-        total_words += len(words)
+            # Create summary of this section for context
+            previous_summaries.append(_section_summary(i + 1, section, text))
 
     # Step 3: Assemble full script with section breaks
+    return _assemble_keynote(topic, duration_minutes, outline, sections_text, all_used_quotes)
+
+
+def _assemble_keynote(topic, duration_minutes, outline, sections_text, all_used_quotes):
+    """Join finished sections into the keynote result dict."""
+    total_words = sum(len(text.split()) for text in sections_text)
     full_script = "\n\n".join(sections_text)
 
     return {
@@ -331,8 +552,8 @@ def generate_full_keynote(topic, duration_minutes=45, progress_callback=None):
 
 # --- Voice Synthesis Pipeline ---
 
-def _synthesize_chunk(text, voice_id, api_key, previous_text=None, next_text=None):
-    """Synthesize a single text chunk to audio bytes with context for prosody continuity."""
+def _tts_payload(text, previous_text=None, next_text=None):
+    """ElevenLabs request body with context for prosody continuity."""
     payload = {
         "text": text,
         "model_id": "eleven_multilingual_v2",
@@ -349,75 +570,202 @@ def _synthesize_chunk(text, voice_id, api_key, previous_text=None, next_text=Non
     if next_text:
         payload["next_text"] = next_text[:200]
 
-    response = requests.post(
-        f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
-        headers={
-            "xi-api-key": api_key,
-            "Content-Type": "application/json"
-        },
-        json=payload,
-        timeout=120,
-        verify=certifi.where()
+    return payload
+
+
+def _raise_for_tts_status(response, limiter):
+    """Raise UpstreamError for a non-200 ElevenLabs response, pausing the limiter on 429."""
+    retry_after = upstream.parse_retry_after(response)
+    if response.status_code == 429:
+        # Over the plan's concurrency/rate limit — hold every caller, not just this one
+        limiter.pause(retry_after if retry_after is not None else VOICE_RETRY_DELAY)
+    raise upstream.UpstreamError(
+        f"ElevenLabs error {response.status_code}: {response.text[:200]}",
+        status_code=response.status_code, retry_after=retry_after
     )
 
+
+def _synthesize_chunk(text, voice_id, api_key, previous_text=None, next_text=None):
+    """Synthesize a single text chunk to audio bytes with context for prosody continuity.
+
+    Served from the audio cache when the same text/voice/settings/context was synthesized before.
+    """
+    payload = _tts_payload(text, previous_text, next_text)
+
+    key = cache_key(voice_id, payload)
+    cached = AUDIO_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    limiter = upstream.get_limiter("elevenlabs")
+    # Includes the wait for a limiter slot; upstream_request_seconds is the request alone
+    with metrics.span("tts"), limiter.slot():
+        response = upstream.post(
+            "elevenlabs", f"/v1/text-to-speech/{voice_id}",
+            headers=upstream.elevenlabs_headers(api_key),
+            json=payload
+        )
+
     if response.status_code != 200:
-        raise Exception(f"ElevenLabs error {response.status_code}: {response.text[:200]}")
+        _raise_for_tts_status(response, limiter)
 
+    AUDIO_CACHE.put(key, response.content)
     return response.content
 
 
-def _split_into_chunks(text, max_chars=4500):
-    """Split text at paragraph boundaries, respecting max char limit."""
-    paragraphs = text.split('\n\n')
-    chunks = []
-    current_chunk = ""
+class AudioStream:
+    """MP3 blocks of one streamed synthesis. Holds its limiter slot and upstream response until
+    close(), which runs by itself once the stream is drained or fails. Routes must also call it
+    when the response ends, so neither leaks if the body is never iterated."""
 
-    for para in paragraphs:
-        para = para.strip()
-        if not para:
-            continue
-
-        if len(current_chunk) + len(para) + 2 > max_chars:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            # If single paragraph exceeds max, split at sentence boundaries
-            if len(para) > max_chars:
-                sentences = para.replace('. ', '.\n').replace('? ', '?\n').replace('! ', '!\n').split('\n')
-                sub_chunk = ""
-                for sent in sentences:
-                    if len(sub_chunk) + len(sent) + 1 > max_chars:
-                        if sub_chunk:
-                            chunks.append(sub_chunk.strip())
-                        sub_chunk = sent
-                    else:
-                        sub_chunk += " " + sent
-                current_chunk = sub_chunk
-            else:
-                current_chunk = para
+    def __init__(self, key, response=None, slot=None, cached=None):
+        self._response = response
+        self._slot = slot
+        self._closed = False
+        if cached is not None:
+            self._blocks, self._writer = iter([cached]), None
         else:
-            current_chunk += "\n\n" + para if current_chunk else para
+            # Blocks are spooled to the cache as they pass, so no request holds the whole MP3
+            self._blocks = response.iter_content(chunk_size=STREAM_BLOCK_BYTES)
+            self._writer = AUDIO_CACHE.writer(key)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            block = next(self._blocks)
+            while not block:
+                block = next(self._blocks)
+        except StopIteration:
+            # Only a fully drained stream is cacheable
+            if self._writer:
+                self._writer.commit()
+            self.close()
+            raise
+        except BaseException:
+            self.close()
+            raise
+        if self._writer:
+            self._writer.write(block)
+        return block
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer:
+            self._writer.abort()
+        if self._response is not None:
+            try:
+                self._response.close()
+            finally:
+                self._slot.__exit__(None, None, None)
+
 
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+def stream_chunk(text, voice_id, api_key, previous_text=None, next_text=None):
+    """Start a streaming synthesis and return an AudioStream of MP3 byte blocks.
+
+    Upstream errors raise here, before any audio is yielded, so callers can still
+    answer with a JSON error. The limiter slot is held until the stream is drained or closed.
+    Cache hits come back as a single block; completed streams are written to the cache.
+    """
+    payload = _tts_payload(text, previous_text, next_text)
+
+    key = cache_key(voice_id, payload)
+    cached = AUDIO_CACHE.get(key)
+    if cached is not None:
+        return AudioStream(key, cached=cached)
+
+    limiter = upstream.get_limiter("elevenlabs")
+    slot = limiter.slot()
+    slot.__enter__()
+    try:
+        response = upstream.post(
+            "elevenlabs", f"/v1/text-to-speech/{voice_id}/stream",
+            headers=upstream.elevenlabs_headers(api_key),
+            json=payload,
+            stream=True
+        )
+        if response.status_code != 200:
+            try:
+                _raise_for_tts_status(response, limiter)
+            finally:
+                response.close()
+        return AudioStream(key, response, slot)
+    except BaseException:
+        slot.__exit__(None, None, None)
+        raise
 
-    return chunks
 
+def _synthesize_chunk_with_retry(text, voice_id, api_key, previous_text=None, next_text=None):
+    """_synthesize_chunk with retries on 429/5xx/network errors, honouring Retry-After.
 
-def _stitch_audio(chunk_paths, output_path):
-    """Stitch audio chunks by direct MP3 byte concatenation.
-    
-    Works without ffmpeg. ElevenLabs outputs same-format MP3s,
-    so raw concatenation produces valid playback.
+    Gives up early when the request deadline can't cover the backoff plus another attempt.
     """
-    with open(output_path, 'wb') as out_f:
-        for chunk_path in chunk_paths:
-            with open(chunk_path, 'rb') as chunk_f:
-                out_f.write(chunk_f.read())
+    for attempt in range(VOICE_MAX_ATTEMPTS):
+        try:
+            return _synthesize_chunk(text, voice_id, api_key, previous_text, next_text)
+        except Exception as e:
+            retryable = getattr(e, "retryable", True)
+            if not retryable or attempt == VOICE_MAX_ATTEMPTS - 1:
+                raise
+            delay = deadline.backoff(attempt, getattr(e, "retry_after", None))
+            if delay is None:
+                raise
+            metrics.inc("upstream_retries_total", host="elevenlabs")
+            time.sleep(delay)
+
+
+def _synthesize_chunk_checkpointed(checkpoint, text, voice_id, api_key, previous_text=None, next_text=None):
+    """_synthesize_chunk_with_retry, reusing audio the checkpoint already holds for this exact chunk."""
+    if checkpoint is None:
+        return _synthesize_chunk_with_retry(text, voice_id, api_key, previous_text, next_text)
+    name = "chunk-" + cache_key(voice_id, _tts_payload(text, previous_text, next_text))
+    audio = checkpoint.load_bytes(name)
+    if audio is None:
+        audio = _synthesize_chunk_with_retry(text, voice_id, api_key, previous_text, next_text)
+        checkpoint.save_bytes(name, audio)
+    return audio
+
+
+def _split_into_chunks(text, max_chars=4500, target_chunks=None, max_latency=None):
+    """Split text into size-balanced chunks at sentence boundaries (see chunker.plan_chunks)."""
+    with metrics.span("chunking"):
+        return split_chunks(text, max_chars, target_chunks, max_latency)
+
+
+def _stitch_audio(audio_chunks):
+    """Stitch MP3 chunks in memory, frame-aware (see audio_stitch).
+
+    Works without ffmpeg or a writable filesystem. ElevenLabs outputs same-format MP3s, so
+    once per-chunk tags and VBR header frames are dropped the frames join into one valid stream.
+    """
+    with metrics.span("stitch"):
+        return stitch(audio_chunks)
+
+
+def _voice_result(audio, chunks_count, script_text):
+    """Response dict for finished audio: inline base64 plus a stored, seekable artifact URL."""
+    with metrics.span("base64"):
+        audio_base64 = base64.b64encode(audio).decode('utf-8')
+    with metrics.span("store"):
+        stored = store_audio(audio)
+    return {
+        "audio_base64": audio_base64,
+        **stored,
+        "audio_mime": "audio/mpeg",
+        "chunks_count": chunks_count,
+        "total_duration_estimate": round(len(script_text.split()) / 130, 1)
+    }
 
 
-def synthesize_long_audio(script_text, voice_id=None, progress_callback=None):
+def synthesize_long_audio(script_text, voice_id=None, progress_callback=None, checkpoint=None):
     """
     Full voice pipeline: chunk → synthesize → stitch → return base64.
+    With a checkpoint, each synthesized chunk is saved and reused by the next run.
     """
     api_key = get_elevenlabs_key()
     if not api_key:
@@ -426,66 +774,127 @@ def synthesize_long_audio(script_text, voice_id=None, progress_callback=None):
     voice_id = voice_id or JASON_VOICE_ID
 
     # Split into chunks
-    chunks = _split_into_chunks(script_text, max_chars=4500)
+    chunks = _split_into_chunks(script_text, max_chars=4500, max_latency=VOICE_TARGET_LATENCY)
 
     if progress_callback:
         progress_callback("voice_chunking", len(chunks))
 
-    # Create temp directory
-    tmp_dir = tempfile.mkdtemp(prefix='jason_audio_')
-    chunk_paths = []
+    audio_chunks = [None] * len(chunks)
+
+    # Synthesize chunks concurrently; the ElevenLabs limiter paces the actual requests.
+    # Each chunk still gets its neighbours as prosody context, so order only matters at stitch time.
+    workers = max(1, min(len(chunks), upstream.HOST_LIMITS["elevenlabs"]["concurrency"]))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                metrics.bind(_synthesize_chunk_checkpointed), checkpoint, chunk_text, voice_id, api_key,
+                chunks[i - 1] if i > 0 else None,
+                chunks[i + 1] if i < len(chunks) - 1 else None
+            ): i
+            for i, chunk_text in enumerate(chunks)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                audio_chunks[i] = future.result()
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                return None, f"Voice synthesis failed on chunk {i+1}: {str(e)[:200]}"
 
-    try:
-        # Synthesize each chunk with context for prosody continuity
-        for i, chunk_text in enumerate(chunks):
             if progress_callback:
-                progress_callback("voice_synthesizing", i + 1)
+                progress_callback("voice_synthesizing", done)
 
-            # Provide surrounding context for smoother transitions
-            prev_text = chunks[i - 1] if i > 0 else None
-            next_text = chunks[i + 1] if i < len(chunks) - 1 else None
+    # Stitch chunks
+    if progress_callback:
+        progress_callback("voice_stitching", 0)
 
-            try:
-                audio_bytes = _synthesize_chunk(chunk_text, voice_id, api_key, prev_text, next_text)
-            except Exception as e:
-                # Retry once
-                time.sleep(3)
-                try:
-                    audio_bytes = _synthesize_chunk(chunk_text, voice_id, api_key, prev_text, next_text)
-                except Exception:
-                    return None, f"Voice synthesis failed on chunk {i+1}: {str(e)[:200]}"
-
-            chunk_path = os.path.join(tmp_dir, f'chunk_{i:03d}.mp3')
-            with open(chunk_path, 'wb') as f:
-                f.write(audio_bytes)
-            chunk_paths.append(chunk_path)
+    audio = _stitch_audio(audio_chunks)
+    return _voice_result(audio, len(chunks), script_text), None
 
-            # Rate limiting (ElevenLabs)
-            if i < len(chunks) - 1:
-                time.sleep(0.5)
 
-        # Stitch chunks
+def generate_keynote_with_voice(topic, duration_minutes=45, voice_id=None, progress_callback=None):
+    """
+    Pipelined script + voice: each section is chunked and queued for TTS as soon as it is
+    written, so synthesis of section N overlaps generation of section N+1.
+    Returns (keynote, audio_result, error) — the keynote is returned even if voice fails.
+    """
+    api_key = get_elevenlabs_key()
+    if not api_key:
+        return generate_full_keynote(topic, duration_minutes, progress_callback), None, "ElevenLabs API key required"
+
+    voice_id = voice_id or JASON_VOICE_ID
+
+    if progress_callback:
+        progress_callback("generating_outline", 0)
+
+    with metrics.span("outline"):
+        outline = generate_outline(topic, duration_minutes)
+    sections = outline["sections"]
+
+    sections_text = []
+    previous_summaries = []
+    all_used_quotes = QuoteLedger()
+    futures = []
+    previous_chunk = None
+    finished = [0]
+    finished_lock = threading.Lock()
+
+    def on_chunk_done(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with finished_lock:
+            finished[0] += 1
+            done = finished[0]
         if progress_callback:
-            progress_callback("voice_stitching", 0)
+            progress_callback("voice_synthesizing", done)
 
-        output_path = os.path.join(tmp_dir, 'final_keynote.mp3')
-        _stitch_audio(chunk_paths, output_path)
+    workers = max(1, upstream.HOST_LIMITS["elevenlabs"]["concurrency"])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, section in enumerate(sections):
+            if progress_callback:
+                progress_callback("generating_section", i + 1)
+
+            text, new_quotes = _write_section(i, section, previous_summaries, all_used_quotes, topic)
+            sections_text.append(text)
+            all_used_quotes.extend(new_quotes)
+            previous_summaries.append(_section_summary(i + 1, section, text))
+
+            # Failed-section placeholders stay in the script but are not voiced
+            if text.startswith("[Section "):
+                continue
+
+            chunks = _split_into_chunks(text, max_chars=4500)
+            # The next section isn't written yet; its outline hook stands in as prosody context
+            upcoming = sections[i + 1].get("opening_hook") if i < len(sections) - 1 else None
+            for j, chunk_text in enumerate(chunks):
+                next_text = chunks[j + 1] if j < len(chunks) - 1 else upcoming
+                future = pool.submit(
+                    metrics.bind(_synthesize_chunk_with_retry), chunk_text, voice_id, api_key, previous_chunk, next_text
+                )
+                future.add_done_callback(on_chunk_done)
+                futures.append(future)
+                previous_chunk = chunk_text
 
-        # Read and encode
-        with open(output_path, 'rb') as f:
-            audio_base64 = base64.b64encode(f.read()).decode('utf-8')
+            if progress_callback:
+                progress_callback("voice_chunking", len(futures))
 
-        return {
-            "audio_base64": audio_base64,
-            "audio_mime": "audio/mpeg",
-            "chunks_count": len(chunks),
-            "total_duration_estimate": round(len(script_text.split()) / 130, 1)
-        }, None
+        keynote = _assemble_keynote(topic, duration_minutes, outline, sections_text, all_used_quotes)
 
-    finally:
-        # Cleanup temp files
-        import shutil
-        shutil.rmtree(tmp_dir, ignore_errors=True)
+        audio_chunks = []
+        for i, future in enumerate(futures):
+            try:
+                audio_chunks.append(future.result())
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                return keynote, None, f"Voice synthesis failed on chunk {i+1}: {str(e)[:200]}"
+
+    if progress_callback:
+        progress_callback("voice_stitching", 0)
+
+    audio = _stitch_audio(audio_chunks)
+    return keynote, _voice_result(audio, len(audio_chunks), keynote["script"]), None
 
 
 # --- CLI Mode ---
@@ -499,13 +908,20 @@ if __name__ == '__main__':
     parser.add_argument('--output', default=None, help='Output file for script (.md)')
     parser.add_argument('--voice', default=None, help='Output file for audio (.mp3)')
     parser.add_argument('--json', action='store_true', help='Output metadata as JSON')
+    parser.add_argument('--parallel', action='store_true', help='Draft sections concurrently from the outline')
+    parser.add_argument('--workers', type=int, default=None, help='Max concurrent section drafts (with --parallel)')
+    parser.add_argument('--pipeline', action='store_true', help='Synthesize each section as soon as it is written (with --voice)')
+    parser.add_argument('--deadline', type=float, default=deadline.JOB_DEADLINE_SECONDS,
+                        help='Overall time budget in seconds for upstream calls (0 = none)')
 
     args = parser.parse_args()
+    deadline.start(args.deadline)
 
     def progress(stage, value):
         stages = {
             "generating_outline": "📋 Generating outline...",
             "generating_section": f"✍️  Writing section {value}...",
+            "smoothing_joins": f"🧵 Smoothing {value} section joins...",
             "voice_chunking": f"🔪 Split into {value} chunks",
             "voice_synthesizing": f"🎙️  Synthesizing chunk {value}...",
             "voice_stitching": "🎵 Stitching audio..."
@@ -515,7 +931,17 @@ if __name__ == '__main__':
     print(f"\n⚡ Jason Silva AI — Generating {args.duration}-min keynote")
     print(f"📝 Topic: {args.topic}\n")
 
-    result = generate_full_keynote(args.topic, args.duration, progress_callback=progress)
+    audio_result, voice_error = None, None
+    if args.pipeline and args.voice:
+        print("🎙️  Voice synthesis runs alongside section writing\n")
+        result, audio_result, voice_error = generate_keynote_with_voice(
+            args.topic, args.duration, progress_callback=progress
+        )
+    else:
+        result = generate_full_keynote(
+            args.topic, args.duration, progress_callback=progress,
+            parallel=args.parallel, max_workers=args.workers
+        )
 
     print(f"\n✅ Generated: {result['word_count']} words, ~{result['estimated_duration']} min")
     print(f"📊 Sections: {result['sections_count']}, Quotes: {result['quotes_used']}")
@@ -532,8 +958,11 @@ if __name__ == '__main__':
         print(json.dumps(meta, indent=2))
 
     if args.voice:
-        print("\n🎙️  Starting voice synthesis...")
-        audio_result, error = synthesize_long_audio(result['script'], progress_callback=progress)
+        if args.pipeline:
+            error = voice_error
+        else:
+            print("\n🎙️  Starting voice synthesis...")
+            audio_result, error = synthesize_long_audio(result['script'], progress_callback=progress)
         if error:
             print(f"❌ Voice error: {error}")
         else:
@@ -0,0 +1,215 @@
+"""
+Latency instrumentation for Jason Silva AI
+Timing spans around each pipeline stage (outline, section LLM calls, desmell, chunking, TTS,
+stitching, base64), counters for upstream status codes, retries and bytes, a Prometheus text
+rendering for /metrics, and an optional JSON-lines trace of every request's spans.
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Append one JSON line per request (route, status, duration, spans) to this file; unset = off
+TRACE_LOG = os.getenv('TRACE_LOG', '')
+
+# Histogram bucket bounds (seconds): sub-millisecond desmell passes up to multi-minute keynotes
+BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PREFIX = "jsai_"
+
+HELP = {
+    "stage_seconds": "Time spent in one pipeline stage",
+    "http_request_seconds": "Time to answer one HTTP request (streamed bodies included)",
+    "upstream_request_seconds": "Time from sending an upstream request to its response headers",
+    "upstream_requests_total": "Upstream responses by host and status (status=\"error\" for network failures, \"deadline\" for timeouts set by the request deadline)",
+    "upstream_retries_total": "Upstream calls retried after a retryable failure",
+    "upstream_bytes_sent_total": "Request body bytes sent upstream",
+    "upstream_bytes_received_total": "Response body bytes received from upstream (non-streamed or sized)",
+    "anthropic_tokens_total": "Anthropic tokens by kind (input, output, cache writes, cache reads)",
+    "deadline_exceeded_total": "Upstream calls not made because the request deadline was nearly spent",
+    "hedged_calls_total": "Slow calls that had a duplicate request started",
+    "breaker_transitions_total": "Circuit breaker state changes by upstream and new state",
+    "breaker_rejections_total": "Upstream calls refused instantly by an open circuit breaker",
+    "model_routes_total": "Model routing decisions by task, tier and reason",
+    "router_decision_seconds": "Time taken to make one model routing decision",
+    "model_call_seconds": "Anthropic call time by model tier",
+    "truncated_responses_total": "Anthropic responses that stopped at max_tokens, by model tier",
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+_current = contextvars.ContextVar("trace", default=None)
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add value to a counter."""
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Record one duration in a histogram."""
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS)] += 1
+        hist[-1] += seconds
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a block as one pipeline stage; also added to the current request's trace."""
+    trace = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_seconds", elapsed, stage=stage, **labels)
+        if trace is not None:
+            trace.add(stage, start, elapsed, labels)
+
+
+def record_upstream(host, status, seconds, bytes_sent=0, bytes_received=0):
+    """Count one upstream round trip."""
+    inc("upstream_requests_total", host=host, status=status)
+    observe("upstream_request_seconds", seconds, host=host)
+    if bytes_sent:
+        inc("upstream_bytes_sent_total", bytes_sent, host=host)
+    if bytes_received:
+        inc("upstream_bytes_received_total", bytes_received, host=host)
+
+
+# --- Per-request traces ---
+
+class Trace:
+    """Spans of one request, written to TRACE_LOG as a single JSON line when it finishes."""
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, start, elapsed, labels):
+        entry = {"stage": stage, "start_ms": round((start - self.started) * 1000, 1), "ms": round(elapsed * 1000, 1)}
+        if labels:
+            entry.update(labels)
+        with self._lock:
+            self.spans.append(entry)
+
+
+def start_trace(method, route):
+    """Begin timing a request on this thread / task. Returns the Trace to pass to finish_trace."""
+    trace = Trace(method, route)
+    _current.set(trace)
+    return trace
+
+
+def finish_trace(trace, status):
+    """Record the request duration and, if TRACE_LOG is set, append its trace line."""
+    elapsed = time.perf_counter() - trace.started
+    if _current.get() is trace:
+        _current.set(None)
+    observe("http_request_seconds", elapsed, method=trace.method, route=trace.route, status=status)
+    if not TRACE_LOG:
+        return
+    line = json.dumps({
+        "ts": round(trace.started_at, 3),
+        "method": trace.method,
+        "route": trace.route,
+        "status": status,
+        "ms": round(elapsed * 1000, 1),
+        "spans": sorted(trace.spans, key=lambda s: s["start_ms"]),
+    })
+    try:
+        with _lock, open(TRACE_LOG, "a") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass  # tracing must never fail a request
+
+
+def bind(fn):
+    """Wrap fn to run in a worker thread with the caller's context.
+
+    Spans it records land in the caller's request trace, and its upstream calls share the
+    caller's deadline (see deadline.py).
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A copy per call, so one bound fn can run on several threads at once
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+# --- Prometheus exposition ---
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render(gauges=None):
+    """Prometheus text format. gauges maps a metric name to a flat dict of numeric fields."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(hist) for key, hist in _histograms.items()}
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {PREFIX}{name} {HELP[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), hist in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist):
+            cumulative += count
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', repr(bound))])} {cumulative}")
+        total = cumulative + hist[len(BUCKETS)]
+        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {total}")
+        lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {round(hist[-1], 6)}")
+        lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {total}")
+
+    for name, fields in sorted((gauges or {}).items()):
+        header(name, "gauge")
+        for field, value in sorted(fields.items()):
+            if isinstance(value, (bool, int, float)):
+                lines.append(f"{PREFIX}{name}{_format_labels([('field', field)])} {float(value):g}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,201 @@
+"""
+Latency-tiered model routing for Jason Silva AI
+Picks the Anthropic model and max_tokens for each call from the words it has to produce,
+the request's remaining deadline and per-task latency / cost SLOs. Short scripts and short
+sections go to the fast tier; longer ones stay on the quality tier unless its predicted
+latency would miss the SLO or the deadline. Tier speed estimates start from configuration
+and track observed throughput, and every decision is counted and timed in /metrics.
+"""
+
+import os
+import math
+import time
+import threading
+
+import deadline
+import metrics
+
+# Output tokens per spoken word, and slack so a response that runs past its target isn't cut off
+TOKENS_PER_WORD = 1.35
+TOKEN_HEADROOM = float(os.getenv('ROUTER_TOKEN_HEADROOM', '1.5'))
+
+# A response stopped by max_tokens is retried once with at least double the cap, up to this
+TRUNCATION_RETRY_MAX_TOKENS = int(os.getenv('ROUTER_TRUNCATION_RETRY_MAX_TOKENS', '4000'))
+
+# Seconds kept back from the deadline for parsing, desmell and the response itself
+DEADLINE_MARGIN_SECONDS = 3.0
+
+# Weight of the newest observation in a tier's running throughput estimate
+ADAPT_WEIGHT = 0.2
+
+TIERS = {
+    "fast": {
+        "model": os.getenv('MODEL_FAST', 'claude-haiku-4-5-20251001'),
+        "first_token_seconds": float(os.getenv('MODEL_FAST_FIRST_TOKEN_SECONDS', '0.6')),
+        "tokens_per_second": float(os.getenv('MODEL_FAST_TOKENS_PER_SECOND', '150')),
+        "usd_per_mtok_out": float(os.getenv('MODEL_FAST_USD_PER_MTOK', '5')),
+        # Shortest system prefix (tokens) the model will prompt-cache
+        "min_cache_tokens": int(os.getenv('MODEL_FAST_MIN_CACHE_TOKENS', '4096')),
+    },
+    "quality": {
+        "model": os.getenv('MODEL_QUALITY', 'claude-sonnet-4-20250514'),
+        "first_token_seconds": float(os.getenv('MODEL_QUALITY_FIRST_TOKEN_SECONDS', '1.5')),
+        "tokens_per_second": float(os.getenv('MODEL_QUALITY_TOKENS_PER_SECOND', '70')),
+        "usd_per_mtok_out": float(os.getenv('MODEL_QUALITY_USD_PER_MTOK', '15')),
+        "min_cache_tokens": int(os.getenv('MODEL_QUALITY_MIN_CACHE_TOKENS', '1024')),
+    },
+}
+
+# Per task: tiers in order of preference, token bounds, latency SLO (seconds), and the word
+# count at or under which the fast tier is used outright (for sections, only the named roles)
+TASKS = {
+    "script": {
+        "tiers": ("quality", "fast"), "min_tokens": 600, "max_tokens": 4000,
+        "slo_seconds": float(os.getenv('ROUTER_SCRIPT_SLO_SECONDS', '25')),
+        "fast_words": int(os.getenv('ROUTER_SCRIPT_FAST_WORDS', '150')),
+        "fast_roles": None,
+    },
+    "section": {
+        "tiers": ("quality", "fast"), "min_tokens": 600, "max_tokens": 4000,
+        "slo_seconds": float(os.getenv('ROUTER_SECTION_SLO_SECONDS', '45')),
+        "fast_words": int(os.getenv('ROUTER_SECTION_FAST_WORDS', '650')),
+        "fast_roles": ("Hook", "Landing"),
+    },
+    "outline": {"tiers": ("fast",), "min_tokens": 2000, "max_tokens": 2000, "slo_seconds": 15.0},
+    "join": {"tiers": ("fast",), "min_tokens": 600, "max_tokens": 600, "slo_seconds": 10.0},
+}
+
+# Predicted output cost (USD) above which a call drops to the fast tier; 0 = no cost cap
+MAX_CALL_USD = float(os.getenv('ROUTER_MAX_CALL_USD', '0'))
+
+_lock = threading.Lock()
+_tokens_per_second = {tier: config["tokens_per_second"] for tier, config in TIERS.items()}
+_tier_by_model = {config["model"]: tier for tier, config in TIERS.items()}
+
+
+class ResponseTruncated(Exception):
+    """The model hit max_tokens even at the retry cap. Never cached, never retried."""
+
+    retryable = False
+
+
+class Route:
+    """One routing decision."""
+
+    __slots__ = ("task", "tier", "model", "max_tokens", "predicted_seconds", "reason")
+
+    def __init__(self, task, tier, max_tokens, predicted_seconds, reason):
+        self.task = task
+        self.tier = tier
+        self.model = TIERS[tier]["model"]
+        self.max_tokens = max_tokens
+        self.predicted_seconds = predicted_seconds
+        self.reason = reason
+
+
+def predict_seconds(tier, tokens):
+    """Expected time for a tier to produce `tokens` output tokens."""
+    return TIERS[tier]["first_token_seconds"] + tokens / _tokens_per_second[tier]
+
+
+def _cost(tier, tokens):
+    return tokens * TIERS[tier]["usd_per_mtok_out"] / 1_000_000
+
+
+def _tokens_for(task, target_words):
+    policy = TASKS[task]
+    if not target_words:
+        return policy["max_tokens"]
+    tokens = math.ceil(target_words * TOKENS_PER_WORD * TOKEN_HEADROOM)
+    return max(policy["min_tokens"], min(policy["max_tokens"], tokens))
+
+
+def _is_short(policy, target_words, role):
+    if not target_words or target_words > policy.get("fast_words", 0):
+        return False
+    return policy.get("fast_roles") is None or role in policy["fast_roles"]
+
+
+def route(task, target_words=None, role=None, budget=None):
+    """Choose (model, max_tokens) for one call of `task` ("script", "section", "outline", "join").
+
+    role is the section name ("Hook", "Landing", ...); budget is the Deadline to fit in
+    (defaults to the current request's).
+    """
+    start = time.perf_counter()
+    policy = TASKS[task]
+    tokens = _tokens_for(task, target_words)
+    remaining = (budget or deadline.current()).remaining()
+    limit = policy["slo_seconds"]
+    if remaining is not None:
+        limit = min(limit, remaining - DEADLINE_MARGIN_SECONDS)
+
+    if len(policy["tiers"]) == 1:
+        tier, reason = policy["tiers"][0], "pinned"
+    elif _is_short(policy, target_words, role):
+        tier, reason = "fast", "short"
+    else:
+        tier, reason = policy["tiers"][-1], "slo"
+        for candidate in policy["tiers"]:
+            if MAX_CALL_USD and _cost(candidate, tokens) > MAX_CALL_USD:
+                continue
+            if predict_seconds(candidate, tokens) <= limit:
+                tier, reason = candidate, "fits"
+                break
+
+    # Even the chosen tier can't finish in what's left of the deadline: ask for fewer tokens
+    # rather than have the call time out with nothing
+    if remaining is not None and predict_seconds(tier, tokens) > remaining - DEADLINE_MARGIN_SECONDS:
+        fits = (remaining - DEADLINE_MARGIN_SECONDS - TIERS[tier]["first_token_seconds"]) * _tokens_per_second[tier]
+        tokens = max(policy["min_tokens"], min(tokens, int(fits)))
+        reason = "deadline"
+
+    decision = Route(task, tier, tokens, round(predict_seconds(tier, tokens), 2), reason)
+    metrics.observe("router_decision_seconds", time.perf_counter() - start, task=task)
+    metrics.inc("model_routes_total", task=task, tier=tier, reason=reason)
+    return decision
+
+
+def after_truncation(model, max_tokens):
+    """max_tokens for retrying a response that stopped at `max_tokens`; raises ResponseTruncated
+    when the cap can't grow any further. Truncated text must never be cached or served as final."""
+    metrics.inc("truncated_responses_total", tier=_tier_by_model.get(model, "other"))
+    retry = min(max(max_tokens * 2, 1), TRUNCATION_RETRY_MAX_TOKENS)
+    if retry <= max_tokens:
+        raise ResponseTruncated(f"Response truncated at max_tokens={max_tokens}")
+    return retry
+
+
+def min_cache_tokens(model):
+    """Shortest prefix the model prompt-caches; 0 for models outside the tiers."""
+    tier = _tier_by_model.get(model)
+    return TIERS[tier]["min_cache_tokens"] if tier else 0
+
+
+def stream_tokens(decision):
+    """max_tokens for a streamed call. Streamed text reaches the client as it is written, so a
+    larger cap costs no latency, and a truncated stream can't be retried: keep the retry cap
+    unless the deadline itself forced a smaller one."""
+    if decision.reason == "deadline":
+        return decision.max_tokens
+    return max(decision.max_tokens, TRUNCATION_RETRY_MAX_TOKENS)
+
+
+def record(model, seconds, output_tokens):
+    """Fold one finished call into its tier's throughput estimate and the per-tier metrics."""
+    tier = _tier_by_model.get(model)
+    if tier is None:
+        return
+    metrics.observe("model_call_seconds", seconds, tier=tier)
+    generating = seconds - TIERS[tier]["first_token_seconds"]
+    # Tiny responses say little about throughput
+    if output_tokens < 100 or generating <= 0:
+        return
+    with _lock:
+        _tokens_per_second[tier] += ADAPT_WEIGHT * (output_tokens / generating - _tokens_per_second[tier])
+
+
+def stats():
+    """Current throughput estimate per tier (tokens/s), for tuning the configured defaults."""
+    with _lock:
+        return {tier: round(tps, 1) for tier, tps in _tokens_per_second.items()}
@@ -0,0 +1,130 @@
+"""
+Quote ledger for long-form keynotes
+Tracks which thinker quotes a keynote has already used so later sections don't repeat them.
+Thinker names are matched in one pass with a compiled alternation, quotes are deduplicated by a
+normalized fingerprint, and the prompt gets one compact line per thinker instead of every quote.
+Ledgers live server-side per session (keyed by ledger_id) or per job run.
+"""
+
+import re
+import uuid
+
+from script_cache import SCRIPT_CACHE, request_key
+
+# Thinker pool — each section draws from different thinkers
+THINKER_POOL = [
+    "Terence McKenna", "Carl Sagan", "Alan Watts", "Carl Jung", "Joseph Campbell",
+    "Stuart Kauffman", "Ray Kurzweil", "Buckminster Fuller", "Aldous Huxley",
+    "Pierre Teilhard de Chardin", "Rupert Sheldrake", "Douglas Hofstadter",
+    "William James", "Albert Einstein", "Marshall McLuhan", "Nikola Tesla",
+    "Werner Heisenberg", "David Bohm", "Ilya Prigogine", "Freeman Dyson"
+]
+
+# Words of the quote kept in the prompt — enough for the model to recognise it
+FINGERPRINT_WORDS = 6
+
+# Longest names first, so a name that prefixes another can never win the alternation
+_THINKERS = re.compile(
+    "|".join(re.escape(name) for name in sorted(THINKER_POOL, key=len, reverse=True)),
+    re.IGNORECASE
+)
+_CANONICAL = {name.lower(): name for name in THINKER_POOL}
+_QUOTED = re.compile(r"[\"“]([^\"“”]{3,})[\"”]")
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def extract_quotes(text):
+    """(thinker, line) for each line of text that quotes a pool thinker."""
+    quotes = []
+    for line in text.split("\n"):
+        if '"' not in line and "“" not in line:
+            continue
+        match = _THINKERS.search(line)
+        if match:
+            quotes.append((_CANONICAL[match.group(0).lower()], line.strip()[:200]))
+    return quotes
+
+
+def fingerprint(line):
+    """Normalized words of the quoted passage (or the whole line if nothing is in quotes)."""
+    quoted = _QUOTED.findall(line)
+    source = max(quoted, key=len) if quoted else line
+    return " ".join(_WORD.findall(source.lower().replace("’", "'")))
+
+
+class QuoteLedger:
+    """Used quotes per thinker, deduplicated by fingerprint."""
+
+    def __init__(self):
+        self.by_thinker = {}
+        self.lines = []
+        self._seen = set()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def add(self, line, thinker=None):
+        """Record one quote line. Returns False if an equivalent quote is already in the ledger."""
+        if thinker is None:
+            match = _THINKERS.search(line)
+            thinker = _CANONICAL[match.group(0).lower()] if match else "Other"
+        key = fingerprint(line)
+        if not key or key in self._seen:
+            return False
+        self._seen.add(key)
+        self.by_thinker.setdefault(thinker, []).append(key)
+        self.lines.append(line)
+        return True
+
+    def add_text(self, text):
+        """Extract and record the quotes in a finished section. Returns the newly added lines."""
+        return [line for thinker, line in extract_quotes(text) if self.add(line, thinker)]
+
+    def extend(self, lines):
+        for line in lines:
+            self.add(line)
+
+    def render(self):
+        """Compact prompt block: one line per thinker with short quote fingerprints."""
+        rows = []
+        for thinker, keys in self.by_thinker.items():
+            shorts = []
+            for key in keys:
+                words = key.split()
+                shorts.append('"' + " ".join(words[:FINGERPRINT_WORDS]) + ("…" if len(words) > FINGERPRINT_WORDS else "") + '"')
+            rows.append(f"- {thinker}: {' | '.join(shorts)}")
+        return "\n".join(rows)
+
+    def to_list(self):
+        return list(self.lines)
+
+    @classmethod
+    def from_list(cls, lines):
+        ledger = cls()
+        ledger.extend(lines or [])
+        return ledger
+
+    @classmethod
+    def coerce(cls, used_quotes):
+        """Accept a QuoteLedger or a legacy list of quote lines."""
+        return used_quotes if isinstance(used_quotes, cls) else cls.from_list(used_quotes)
+
+
+# --- Per-session ledgers (split long-form flow) ---
+
+def new_ledger_id():
+    return uuid.uuid4().hex
+
+
+def load_ledger(ledger_id):
+    """Ledger stored for this session, or an empty one if it expired or never existed."""
+    lines = SCRIPT_CACHE.get(request_key("quote_ledger", ledger_id=ledger_id)) if ledger_id else None
+    return QuoteLedger.from_list(lines)
+
+
+def save_ledger(ledger_id, ledger):
+    # Stored in the script cache so every worker process sees it; expires with the cache TTL
+    SCRIPT_CACHE.put(request_key("quote_ledger", ledger_id=ledger_id), ledger.to_list())
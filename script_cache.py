@@ -0,0 +1,463 @@
+"""
+Generation cache for scripts and outlines
+Results keyed on the normalized request, stored in SQLite so every worker process shares them.
+Identical concurrent requests coalesce onto one upstream call (single-flight), in-process and across processes.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import weakref
+
+import deadline
+
+SCRIPT_CACHE_PATH = os.getenv('SCRIPT_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'jason_script_cache.sqlite3'))
+SCRIPT_CACHE_TTL = int(os.getenv('SCRIPT_CACHE_TTL', '3600'))
+
+# How long another process's in-flight claim is honoured before we compute ourselves.
+# Waiters never wait past their own request deadline; they raise DeadlineExceeded instead.
+INFLIGHT_LEASE_SECONDS = 90
+INFLIGHT_POLL_SECONDS = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS results_expires ON results (expires);
+CREATE TABLE IF NOT EXISTS inflight (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+"""
+
+
+def normalize_topic(topic):
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a topic."""
+    topic = re.sub(r'\s+', ' ', topic.strip().lower())
+    return topic.strip(' .!?"\'')
+
+
+def request_key(kind, **params):
+    """Stable key for a generation request. Topic is normalized; other params are used as given."""
+    if 'topic' in params:
+        params['topic'] = normalize_topic(params['topic'])
+    canonical = json.dumps({"kind": kind, **params}, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _Lead:
+    """A caller that produces a single-flight value itself (a streamed script). Finish with land()."""
+
+    def __init__(self, key, flight, claimed):
+        self.key = key
+        self.flight = flight  # _Flight, or the Future in async mode
+        self.claimed = claimed
+
+
+class ScriptCache:
+    """SQLite-backed TTL cache with single-flight get_or_compute."""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.owner = uuid.uuid4().hex
+        self._flights = {}
+        self._async_flights = weakref.WeakKeyDictionary()  # event loop -> {key: Future}
+        self._lock = threading.Lock()
+        self._ready = False
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._ready = True
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key):
+        """Cached value for key, or None if missing/expired (or the DB is unavailable)."""
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value FROM results WHERE key = ? AND expires > ?", (key, time.time())
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            self._count("errors")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value, ttl=None):
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now + (ttl or self.ttl))
+                )
+                conn.execute("DELETE FROM results WHERE expires <= ?", (now,))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            self._count("errors")
+
+    # --- cross-process in-flight claims ---
+
+    def _claim(self, key):
+        """Try to become the process that computes key. Returns False if another live process holds it."""
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM inflight WHERE key = ? AND expires <= ?", (key, now))
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO inflight (key, owner, expires) VALUES (?, ?, ?)",
+                    (key, self.owner, now + INFLIGHT_LEASE_SECONDS)
+                )
+                return cur.rowcount == 1
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            self._count("errors")
+            return True
+
+    def _release(self, key):
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, self.owner))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            self._count("errors")
+
+    def _wait_for_other_process(self, key):
+        """Poll for a result another process is computing. Returns (value, claimed): the value,
+        or None with claimed=True once its claim lapsed and we took it over, or None with
+        claimed=False if we stopped waiting without getting the claim.
+
+        Raises DeadlineExceeded if the current request's budget runs out first.
+        """
+        budget = deadline.current()
+        until = time.time() + INFLIGHT_LEASE_SECONDS
+        while time.time() < until:
+            _check_budget(budget)
+            time.sleep(_poll_interval(budget))
+            value = self.get(key)
+            if value is not None:
+                return value, False
+            if self._claim(key):
+                return None, True
+        return None, False
+
+    def _compute(self, key, compute, cacheable):
+        value = None
+        if self._claim(key):
+            try:
+                value = compute()
+                if cacheable(value):
+                    self.put(key, value)
+            finally:
+                self._release(key)
+            return value
+
+        value, claimed = self._wait_for_other_process(key)
+        if value is not None:
+            self._count("coalesced")
+            return value
+
+        # Either the other process failed or gave up and we took over its claim, or we waited a
+        # full lease without one: compute anyway, releasing only a claim we actually hold
+        try:
+            value = compute()
+            if cacheable(value):
+                self.put(key, value)
+        finally:
+            if claimed:
+                self._release(key)
+        return value
+
+    def get_or_compute(self, key, compute, fresh=False, cacheable=lambda value: True):
+        """Return the cached value for key, or run compute() once for all concurrent callers.
+
+        fresh=True skips the cache read (and any in-flight call) but still stores the new result.
+        Exceptions from compute() propagate to every waiting caller and are never cached.
+        """
+        if fresh:
+            self._count("misses")
+            value = compute()
+            if cacheable(value):
+                self.put(key, value)
+            return value
+
+        value = self.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            # The leader may be a job with a longer (or no) budget than this request
+            if not flight.done.wait(timeout=deadline.current().remaining()):
+                raise _waited_too_long()
+            if flight.error is not None:
+                raise flight.error
+            if flight.value is None:
+                # The leader was a stream that ended without a complete script
+                return self.get_or_compute(key, compute, cacheable=cacheable)
+            return flight.value
+
+        try:
+            flight.value = self._compute(key, compute, cacheable)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    # --- streamed producers ---
+
+    def _finish(self, key, value, claimed):
+        try:
+            if value is not None:
+                self.put(key, value)
+        finally:
+            if claimed:
+                self._release(key)
+
+    def join(self, key):
+        """Single-flight for callers that produce the value themselves, e.g. while streaming it.
+
+        Returns (value, lead). If key is already being computed, here or in another process, waits
+        for it and returns (value, None); value is None if that computation failed. Otherwise the
+        caller is registered as the computation and gets (None, lead): it must call land(lead, ...)
+        when done, which wakes everyone who joined meanwhile.
+        Raises DeadlineExceeded if the current request's budget runs out while waiting.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            if not flight.done.wait(timeout=deadline.current().remaining()):
+                raise _waited_too_long()
+            return flight.value, None
+
+        value = None
+        lead = None
+        try:
+            claimed = self._claim(key)
+            if not claimed:
+                value, claimed = self._wait_for_other_process(key)
+            if value is not None:
+                self._count("coalesced")
+            else:
+                lead = _Lead(key, flight, claimed)
+            return value, lead
+        finally:
+            if lead is None:
+                flight.value = value
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+
+    def land(self, lead, value):
+        """Finish a join() lead: cache value (None if it failed or must not be cached) and wake waiters."""
+        try:
+            self._finish(lead.key, value, lead.claimed)
+        finally:
+            lead.flight.value = value
+            with self._lock:
+                self._flights.pop(lead.key, None)
+            lead.flight.done.set()
+
+    # --- async variant (ASGI serving mode) ---
+
+    async def _await_other_process(self, key):
+        """Async _wait_for_other_process. Returns (value, claimed)."""
+        budget = deadline.current()
+        until = time.time() + INFLIGHT_LEASE_SECONDS
+        while time.time() < until:
+            _check_budget(budget)
+            await asyncio.sleep(_poll_interval(budget))
+            value = await asyncio.to_thread(self.get, key)
+            if value is not None:
+                return value, False
+            if await asyncio.to_thread(self._claim, key):
+                return None, True
+        return None, False
+
+    async def _acompute(self, key, compute, cacheable):
+        claimed = await asyncio.to_thread(self._claim, key)
+        if not claimed:
+            value, claimed = await self._await_other_process(key)
+            if value is not None:
+                self._count("coalesced")
+                return value
+
+        # Without the claim (we waited a full lease for another process) compute anyway, but never
+        # release a claim we don't hold
+        try:
+            value = await compute()
+            if cacheable(value):
+                await asyncio.to_thread(self.put, key, value)
+            return value
+        finally:
+            if claimed:
+                await asyncio.to_thread(self._release, key)
+
+    async def aget_or_compute(self, key, compute, fresh=False, cacheable=lambda value: True):
+        """Async get_or_compute: compute is a coroutine function, SQLite work runs off the event loop."""
+        if fresh:
+            self._count("misses")
+            value = await compute()
+            if cacheable(value):
+                await asyncio.to_thread(self.put, key, value)
+            return value
+
+        value = await asyncio.to_thread(self.get, key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.setdefault(loop, {})
+            future = flights.get(key)
+            leader = future is None
+            if leader:
+                future = flights[key] = loop.create_future()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            try:
+                value = await asyncio.wait_for(asyncio.shield(future), deadline.current().remaining())
+            except asyncio.TimeoutError:
+                raise _waited_too_long()
+            if value is None:
+                # The leader was a stream that ended without a complete script
+                return await self.aget_or_compute(key, compute, cacheable=cacheable)
+            return value
+
+        try:
+            value = await self._acompute(key, compute, cacheable)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            with self._lock:
+                flights.pop(key, None)
+
+    async def ajoin(self, key):
+        """Async join(): same contract, finish the lead with aland()."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.setdefault(loop, {})
+            future = flights.get(key)
+            leader = future is None
+            if leader:
+                future = flights[key] = loop.create_future()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), deadline.current().remaining()), None
+            except asyncio.TimeoutError:
+                raise _waited_too_long()
+            except Exception:
+                return None, None
+
+        value = None
+        lead = None
+        try:
+            claimed = await asyncio.to_thread(self._claim, key)
+            if not claimed:
+                value, claimed = await self._await_other_process(key)
+            if value is not None:
+                self._count("coalesced")
+            else:
+                lead = _Lead(key, future, claimed)
+            return value, lead
+        finally:
+            if lead is None:
+                future.set_result(value)
+                with self._lock:
+                    flights.pop(key, None)
+
+    async def aland(self, lead, value):
+        """Async land()."""
+        try:
+            await asyncio.to_thread(self._finish, lead.key, value, lead.claimed)
+        finally:
+            lead.flight.set_result(value)
+            with self._lock:
+                self._async_flights.get(lead.flight.get_loop(), {}).pop(lead.key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+            return {
+                **self.counters,
+                "in_flight": len(self._flights) + sum(len(f) for f in self._async_flights.values()),
+                "hit_rate": round((lookups - self.counters["misses"]) / lookups, 3) if lookups else 0.0,
+            }
+
+
+def _waited_too_long():
+    return deadline.DeadlineExceeded("Request deadline reached waiting for an in-flight generation")
+
+
+def _check_budget(budget):
+    if budget.remaining() == 0:
+        raise _waited_too_long()
+
+
+def _poll_interval(budget):
+    remaining = budget.remaining()
+    return INFLIGHT_POLL_SECONDS if remaining is None else min(INFLIGHT_POLL_SECONDS, remaining)
+
+
+SCRIPT_CACHE = ScriptCache(SCRIPT_CACHE_PATH, SCRIPT_CACHE_TTL)
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# The app is a set of flat top-level modules; make them importable from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def no_upstream_keys(monkeypatch):
+    """Tests never reach the real Anthropic / ElevenLabs APIs."""
+    for name in ("ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL", "ELEVENLABS_API_KEY", "ELEVENLABS_BASE_URL"):
+        monkeypatch.delenv(name, raising=False)
@@ -0,0 +1,111 @@
+import pytest
+
+from audio_stitch import audio_frames, frame_info, stitch
+
+# MPEG1 Layer III, 128 kbps, 44.1 kHz: 144 * 128000 // 44100 = 417 bytes per frame
+STEREO = b"\xff\xfb\x90\x00"
+MONO = b"\xff\xfb\x90\xc0"
+FRAME_BYTES = 417
+
+
+def frame(header=STEREO, fill=0x55, tag=None, tag_at=None):
+    body = bytearray([fill]) * (FRAME_BYTES - 4)
+    if tag:
+        body[tag_at - 4:tag_at] = tag  # tag_at is the offset in the frame, header included
+    return header + bytes(body)
+
+
+def xing_frame(tag=b"Xing", header=STEREO):
+    # The Xing/Info tag follows the side info: 32 bytes for MPEG1 stereo, 17 for mono
+    side_info = 17 if header == MONO else 32
+    return frame(header, fill=0, tag=tag, tag_at=4 + side_info)
+
+
+def id3v2(size=100, footer=False):
+    syncsafe = bytes([(size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    flags = 0x10 if footer else 0
+    return b"ID3\x04\x00" + bytes([flags]) + syncsafe + b"\x00" * size + (b"3DI" + b"\x00" * 7 if footer else b"")
+
+
+ID3V1 = b"TAG" + b"\x00" * 125
+
+
+def frames(count, fill):
+    return b"".join(frame(fill=fill) for _ in range(count))
+
+
+def walk(data):
+    """Frame count of data that must be nothing but back-to-back frames."""
+    offset = count = 0
+    while offset < len(data):
+        info = frame_info(data, offset)
+        assert info, f"no frame at {offset}"
+        offset += info[0]
+        count += 1
+    assert offset == len(data)
+    return count
+
+
+def test_frame_info():
+    assert frame_info(frame(), 0) == (FRAME_BYTES, True, False)
+    assert frame_info(frame(MONO), 0) == (FRAME_BYTES, True, True)
+    # MPEG2 Layer III, 80 kbps, 22.05 kHz: 72 * 80000 // 22050 = 261
+    assert frame_info(b"\xff\xf3\x90\x00", 0) == (261, False, False)
+
+
+@pytest.mark.parametrize("header", [
+    b"\xff\xfb\xf0\x00",  # bitrate index 15
+    b"\xff\xfb\x00\x00",  # free bitrate
+    b"\xff\xfb\x9c\x00",  # reserved sample rate
+    b"\xff\xeb\x90\x00",  # reserved MPEG version
+    b"\xff\xf9\x90\x00",  # reserved layer
+    b"\xfe\xfb\x90\x00",  # no sync
+])
+def test_frame_info_rejects_invalid_headers(header):
+    assert frame_info(header + b"\x00" * 500, 0) is None
+
+
+def test_plain_chunks_are_concatenated():
+    a, b = frames(3, 0x11), frames(4, 0x22)
+    assert stitch([a, b]) == a + b
+
+
+@pytest.mark.parametrize("tag", [b"Xing", b"Info"])
+def test_tags_and_vbr_header_are_dropped(tag):
+    a, b = frames(3, 0x11), frames(4, 0x22)
+    chunk_a = id3v2() + xing_frame(tag) + a + ID3V1
+    chunk_b = id3v2(footer=True) + xing_frame(tag) + b + ID3V1
+    out = stitch([chunk_a, chunk_b])
+    assert out == a + b
+    assert walk(out) == 7
+
+
+def test_mono_xing_header_is_dropped():
+    audio = b"".join(frame(MONO, fill=0x33) for _ in range(2))
+    assert stitch([xing_frame(header=MONO) + audio]) == audio
+
+
+def test_vbri_header_is_dropped():
+    audio = frames(2, 0x44)
+    vbri = frame(fill=0, tag=b"VBRI", tag_at=36)
+    assert stitch([vbri + audio]) == audio
+
+
+def test_garbage_before_first_frame_is_skipped():
+    audio = frames(3, 0x66)
+    # A stray sync byte that isn't followed by a second frame is not mistaken for audio
+    assert stitch([id3v2() + b"\x00\xff\x00junk" + audio]) == audio
+
+
+def test_non_mpeg_data_is_kept_whole():
+    data = b"not an mp3 at all" * 10
+    assert stitch([data]) == data
+    assert stitch([id3v2(20) + data]) == data
+
+
+def test_audio_frames_does_not_copy():
+    data = id3v2() + xing_frame() + frames(2, 0x77)
+    view = audio_frames(data)
+    assert isinstance(view, memoryview)
+    assert view.obj is data
+    assert bytes(view) == frames(2, 0x77)
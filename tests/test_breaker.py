@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+import breaker
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+@pytest.fixture(autouse=True)
+def short_timings(monkeypatch):
+    monkeypatch.setattr(breaker, "MIN_CALLS", 4)
+    monkeypatch.setattr(breaker, "FAILURE_RATE", 0.5)
+    monkeypatch.setattr(breaker, "OPEN_SECONDS", 0.05)
+    monkeypatch.setattr(breaker, "WINDOW_SECONDS", 60)
+
+
+def record(circuit, *statuses, seconds=0.1, streamed=False):
+    for status in statuses:
+        probe = circuit.acquire()
+        circuit.record(status, seconds, probe, streamed)
+
+
+def opened(circuit):
+    # The rate is checked when a failure is recorded
+    record(circuit, 200, 200, 500, 500)
+    assert circuit.state == OPEN
+    return circuit
+
+
+def test_failures():
+    assert breaker.is_failure("error")
+    assert breaker.is_failure(500)
+    assert breaker.is_failure(529)
+    assert not breaker.is_failure(200)
+    assert not breaker.is_failure(429)  # rate limited means the upstream is up
+    assert not breaker.is_failure(400)
+
+
+def test_needs_min_calls_before_opening():
+    circuit = CircuitBreaker("anthropic")
+    record(circuit, 500, 500, 500)
+    assert circuit.state == CLOSED
+    record(circuit, 500)
+    assert circuit.state == OPEN
+
+
+def test_stays_closed_below_failure_rate():
+    circuit = CircuitBreaker("anthropic")
+    record(circuit, 500, 200, 200, 429, 200, 529)
+    assert circuit.state == CLOSED
+
+
+def test_open_rejects_without_calling():
+    circuit = opened(CircuitBreaker("anthropic"))
+    with pytest.raises(CircuitOpen) as raised:
+        circuit.acquire()
+    assert raised.value.retryable is False
+    assert raised.value.host == "anthropic"
+    assert circuit.counters["rejected"] == 1
+
+
+def test_half_open_lets_one_probe_through():
+    circuit = opened(CircuitBreaker("anthropic"))
+    time.sleep(0.06)
+    assert circuit.acquire() is True
+    assert circuit.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        circuit.acquire()
+
+
+def test_probe_success_closes():
+    circuit = opened(CircuitBreaker("anthropic"))
+    time.sleep(0.06)
+    circuit.record(200, 0.1, circuit.acquire())
+    assert circuit.state == CLOSED
+    # The window starts over: one more failure doesn't reopen it
+    record(circuit, 500)
+    assert circuit.state == CLOSED
+
+
+def test_probe_failure_reopens():
+    circuit = opened(CircuitBreaker("anthropic"))
+    time.sleep(0.06)
+    circuit.record("error", 0.1, circuit.acquire())
+    assert circuit.state == OPEN
+    assert circuit.counters["opened"] == 2
+
+
+def test_released_probe_frees_the_slot():
+    circuit = opened(CircuitBreaker("anthropic"))
+    time.sleep(0.06)
+    circuit.release(circuit.acquire())
+    assert circuit.acquire() is True
+
+
+def test_slow_streams_count_as_failures():
+    circuit = CircuitBreaker("anthropic", slow_call_seconds=1.0)
+    record(circuit, 200, 200, 200, 200, seconds=5.0)
+    assert circuit.state == CLOSED  # a long non-streamed call just had a lot to write
+    record(circuit, 200, 200, 200, 200, seconds=5.0, streamed=True)
+    assert circuit.state == OPEN
+
+
+def test_old_calls_leave_the_window(monkeypatch):
+    monkeypatch.setattr(breaker, "WINDOW_SECONDS", 0.05)
+    circuit = CircuitBreaker("anthropic")
+    record(circuit, 500, 500, 500)
+    time.sleep(0.06)
+    record(circuit, 500, 200, 200, 200)
+    assert circuit.state == CLOSED
+    assert circuit.stats()["calls"] == 4
+
+
+def test_is_open_and_check(monkeypatch):
+    circuit = CircuitBreaker("anthropic")
+    monkeypatch.setitem(breaker.BREAKERS, "anthropic", circuit)
+    assert not breaker.is_open("anthropic")
+    breaker.check("anthropic")
+
+    opened(circuit)
+    assert breaker.is_open("anthropic")
+    with pytest.raises(CircuitOpen):
+        breaker.check("anthropic")
+
+    # After the cool-down the next call must be able to become the probe
+    time.sleep(0.06)
+    assert not breaker.is_open("anthropic")
+    breaker.check("anthropic")
+    assert circuit.acquire() is True
+
+
+def test_stats():
+    circuit = CircuitBreaker("elevenlabs")
+    record(circuit, 200, 500, 200, seconds=0.5)
+    stats = circuit.stats()
+    assert stats["state"] == CLOSED
+    assert stats["calls"] == 3
+    assert stats["failure_rate"] == pytest.approx(0.333)
+    assert stats["p50_seconds"] == 0.5
@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+from chunker import PARAGRAPH_SLACK, estimate_latency, plan_chunks, sentence_spans, split_chunks
+
+SENTENCES = [
+    "Have you ever considered that the universe is aware of itself?",
+    "We are a way for the cosmos to know itself.",
+    "Awe is the beginning of wisdom!",
+    "What happens when technology becomes an extension of the mind?",
+    "Every breakthrough starts as a strange idea... Then it becomes obvious.",
+    "Dr. Sagan said so, and the U.S. listened.",
+]
+
+
+def random_script(seed, sentences=120):
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(sentences // 6):
+        paragraphs.append(" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 10))))
+    return "\n\n".join(paragraphs)
+
+
+def assert_valid(text, spans, max_chars):
+    previous_end = 0
+    for start, end in spans:
+        assert 0 < end - start <= max_chars
+        assert not text[previous_end:start].strip(), "text dropped between chunks"
+        assert text[start:end] == text[start:end].strip()
+        previous_end = end
+    assert not text[previous_end:].strip()
+
+
+def test_sentence_boundaries():
+    text = 'Dr. Smith met J. Robert Oppenheimer in the U.S. on Jan. 5. It was... strange. Then! What?\n\nNew para.'
+    sentences = [text[start:end] for start, end, _ in sentence_spans(text)]
+    assert sentences == [
+        "Dr. Smith met J. Robert Oppenheimer in the U.S. on Jan. 5.",
+        "It was... strange.",
+        "Then!",
+        "What?",
+        "New para.",
+    ]
+    assert [paragraph_end for _, _, paragraph_end in sentence_spans(text)] == [False, False, False, True, True]
+
+
+@pytest.mark.parametrize("text", ["", "   \n\n  "])
+def test_empty_text(text):
+    assert plan_chunks(text) == []
+
+
+def test_short_text_is_one_chunk():
+    text = " ".join(SENTENCES)
+    assert split_chunks(text) == [text]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("max_chars", [300, 1000, 4500])
+def test_chunks_cover_text_within_cap(seed, max_chars):
+    text = random_script(seed)
+    assert_valid(text, plan_chunks(text, max_chars=max_chars), max_chars)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunks_end_on_sentences(seed):
+    text = random_script(seed)
+    ends = {end for _, end, _ in sentence_spans(text)}
+    assert all(end in ends for _, end in plan_chunks(text, max_chars=1000))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_chunks_are_balanced(seed):
+    text = random_script(seed)
+    spans = plan_chunks(text, max_chars=1000)
+    first, last = spans[0][0], spans[-1][1]
+    ideal = (last - first) / len(spans)
+    longest_sentence = max(len(s) for s in SENTENCES)
+    # Each cut lands within a sentence of its even position, or a little further for a paragraph break
+    for n, (_, end) in enumerate(spans[:-1], 1):
+        assert abs(end - (first + ideal * n)) <= longest_sentence + PARAGRAPH_SLACK * ideal
+
+
+def test_long_sentence_is_split():
+    text = ", ".join(["the mind expands into the unknown"] * 200) + "."
+    spans = plan_chunks(text, max_chars=500)
+    assert len(spans) > 1
+    assert_valid(text, spans, 500)
+
+
+def test_target_chunks():
+    text = random_script(1)
+    assert len(plan_chunks(text, max_chars=4500, target_chunks=6)) >= 6
+
+
+def test_max_latency():
+    text = random_script(2)
+    unbounded = plan_chunks(text, max_chars=4500, concurrency=8)
+    limit = estimate_latency([end - start for start, end in unbounded], 8) / 2
+    spans = plan_chunks(text, max_chars=4500, max_latency=limit, concurrency=8)
+    assert len(spans) > len(unbounded)
+    assert estimate_latency([end - start for start, end in spans], 8) <= limit
+
+
+def test_unreachable_max_latency_takes_fastest_count():
+    text = random_script(2)
+    # More chunks than parallel slots add waves, so with concurrency 3 half the time is out of reach
+    spans = plan_chunks(text, max_chars=4500, max_latency=0.1, concurrency=3)
+    assert len(spans) == 3
+
+
+def test_estimate_latency_counts_waves():
+    assert estimate_latency([], 3) == 0.0
+    assert estimate_latency([100] * 4, 2) == 2 * estimate_latency([100], 1)
@@ -0,0 +1,138 @@
+import time
+import threading
+
+import pytest
+
+import deadline
+import upstream
+from deadline import MIN_ATTEMPT_SECONDS, Deadline, DeadlineExceeded
+
+
+@pytest.fixture(autouse=True)
+def no_current_deadline():
+    token = deadline._current.set(None)
+    yield
+    deadline._current.reset(token)
+
+
+def with_remaining(seconds):
+    budget = Deadline(60)
+    budget.expires = time.monotonic() + seconds
+    return budget
+
+
+def test_unbounded():
+    budget = Deadline()
+    assert budget.remaining() is None
+    assert budget.timeout(30) == 30
+    assert budget.allows(1000)
+    assert deadline.current() is deadline.UNBOUNDED
+
+
+def test_timeout_is_cut_to_the_remaining_budget():
+    assert with_remaining(100).timeout(30) == 30
+    assert with_remaining(10).timeout(30) == pytest.approx(10, abs=0.1)
+    assert with_remaining(10).timeout(None) == pytest.approx(10, abs=0.1)
+
+
+def test_too_little_budget_raises():
+    with pytest.raises(DeadlineExceeded):
+        with_remaining(MIN_ATTEMPT_SECONDS / 2).timeout(30)
+    assert with_remaining(-5).remaining() == 0.0
+
+
+def test_allows_keeps_room_for_an_attempt():
+    budget = with_remaining(MIN_ATTEMPT_SECONDS + 1)
+    assert budget.allows(0.5)
+    assert not budget.allows(1.5)
+
+
+def test_start_is_per_thread():
+    started = deadline.start(30)
+    assert deadline.current() is started
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(deadline.current()))
+    thread.start()
+    thread.join()
+    assert seen == [deadline.UNBOUNDED]
+
+
+def test_backoff_jitter_is_bounded():
+    for attempt in range(6):
+        cap = min(deadline.BACKOFF_MAX_SECONDS, deadline.BACKOFF_BASE_SECONDS * 2 ** attempt)
+        for _ in range(50):
+            assert 0 <= deadline.backoff(attempt) <= cap
+
+
+def test_backoff_honours_retry_after_and_the_budget():
+    assert deadline.backoff(0, retry_after=3) == 3
+    deadline._current.set(with_remaining(MIN_ATTEMPT_SECONDS + 1))
+    assert deadline.backoff(0, retry_after=3) is None
+
+
+def test_upstream_timeouts_follow_the_deadline():
+    connect_cap, read_cap = upstream.HOST_TIMEOUTS["anthropic"]
+    assert upstream.timeouts("anthropic") == (connect_cap, read_cap)
+    assert upstream.timeouts("anthropic", timeout=5)[1] == min(5, read_cap)
+
+    connect, read = upstream.timeouts("anthropic", budget=with_remaining(4))
+    assert read == pytest.approx(4, abs=0.1)
+    assert connect <= read
+    assert upstream.budget_limited("anthropic", None, read)
+    assert not upstream.budget_limited("anthropic", None, read_cap)
+
+    deadline._current.set(with_remaining(1))
+    with pytest.raises(DeadlineExceeded):
+        upstream.timeouts("anthropic")
+
+
+class Calls:
+    """fn for hedged(): the nth call sleeps delays[n] and then returns n, or raises if failing."""
+
+    def __init__(self, *delays, fail=False):
+        self.delays = delays
+        self.fail = fail
+        self.count = 0
+        self.threads = []
+        self._lock = threading.Lock()
+        self.__name__ = "calls"  # hedged() labels its metric with it
+
+    def __call__(self):
+        with self._lock:
+            n = self.count
+            self.count += 1
+        self.threads.append(threading.get_ident())
+        time.sleep(self.delays[n])
+        if self.fail:
+            raise ValueError(n)
+        return n
+
+
+def test_hedged_fast_call_runs_once():
+    fn = Calls(0.0, 0.0)
+    assert deadline.hedged(fn, 0.5) == 0
+    assert fn.count == 1
+
+
+def test_hedged_slow_call_is_duplicated():
+    fn = Calls(2.0, 0.0)
+    start = time.monotonic()
+    assert deadline.hedged(fn, 0.1) == 1
+    assert fn.count == 2
+    assert time.monotonic() - start < 1.0
+
+
+def test_hedged_raises_when_both_fail():
+    with pytest.raises(ValueError):
+        deadline.hedged(Calls(0.2, 0.0, fail=True), 0.05)
+
+
+def test_hedged_calls_directly_without_room_for_a_duplicate():
+    fn = Calls(0.0)
+    assert deadline.hedged(fn, 0) == 0
+    assert fn.threads == [threading.get_ident()]
+
+    deadline._current.set(with_remaining(MIN_ATTEMPT_SECONDS + 0.1))
+    fn = Calls(0.0)
+    assert deadline.hedged(fn, 0.5) == 0
+    assert fn.threads == [threading.get_ident()]
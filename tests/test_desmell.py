@@ -0,0 +1,81 @@
+import re
+import random
+
+import pytest
+
+from desmell import DesmellStream, desmell
+
+# The rules as they were applied before they were compiled into one pass: one re.sub each, in order
+SEQUENTIAL_RULES = [
+    (r"(\w+) (?:isn't|is not|aren't|are not) (?:just|only|merely|simply) [^—,;.!?]+?[—,;]\s*(?:it'?s|they'?re|this is|that'?s)\s+", r"\1 is "),
+    (r"[Ww]e'?re not (?:just|only|merely|simply) [^.!?]+?[,;—]\s*we'?re\s+", "We are "),
+    (r"[Ww]e'?re not (?:just|only|merely|simply) [^.!?]+\.\s*[Ww]e'?re\s+", "We are "),
+    (r"[Ii]t'?s not (?:just|only|merely|simply) (?:about )?[^,;—]+?[,;—]\s*it'?s (?:about )?", "It's about "),
+    (r"[Tt]his (?:isn't|is not) (?:just|merely|simply) [^—,;]+?[—,;]\s*(?:it'?s|this is)\s+", "This is "),
+    (r"[Nn]ot just (the [^,]+), not just (the [^,]+)", r"\1, \2"),
+    (r"(\w+) (?:isn't|is not) (?:just|only|merely) about [^—,;]+?[—,;]\s*(?:it'?s|that'?s) (?:about )?", r"\1 is about "),
+    (r"(?:isn't|is not|aren't|are not) (?:just|only|merely) ([^—,;.!?]+?)\s*[—]\s*(?:it'?s|they'?re|we'?re)\s+", r"is \1. It is "),
+]
+
+WORDS = [
+    "creativity", "isn't", "is", "not", "just", "only", "merely", "about", "the", "art", "—", ",", ";",
+    ".", "it's", "we're", "We're", "It's", "This", "they're", "that's", "life", "mind", "Not", "!",
+    "...", "\n\n", "simply", "aren't", "are",
+]
+
+
+def sequential_desmell(text):
+    for pattern, replacement in SEQUENTIAL_RULES:
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def random_texts(count, seed=1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Creativity isn't just about art — it's about seeing.", "Creativity is about seeing."),
+    ("We're not just animals, we're storytellers.", "We are storytellers."),
+    ("It's not just about money, it's about meaning.", "It's about meaning."),
+    ("This isn't merely a tool — it's a mirror.", "This is a mirror."),
+    ("Not just the stars, not just the planets, but us.", "the stars, the planets, but us."),
+])
+def test_rewrites_ai_patterns(text, expected):
+    assert desmell(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Awe is the beginning of wisdom.",
+    "Nothing here is not worth saying.",
+])
+def test_leaves_clean_text_alone(text):
+    assert desmell(text) == text
+
+
+def test_matches_sequential_rules():
+    for text in random_texts(3000):
+        assert desmell(text) == sequential_desmell(text), text
+
+
+def test_stream_matches_batch():
+    rng = random.Random(2)
+    for text in random_texts(1000, seed=3):
+        stream = DesmellStream()
+        out = []
+        i = 0
+        while i < len(text):
+            size = rng.randint(1, 7)
+            out.append(stream.feed(text[i:i + size]))
+            i += size
+        out.append(stream.flush())
+        assert "".join(out) == desmell(text), text
+
+
+def test_stream_emits_before_the_end():
+    stream = DesmellStream()
+    emitted = stream.feed("The universe is vast and strange. " * 20)
+    assert emitted
+    assert emitted + stream.flush() == "The universe is vast and strange. " * 20
@@ -0,0 +1,166 @@
+import asyncio
+import time
+import sqlite3
+import threading
+
+import pytest
+
+import script_cache
+from script_cache import ScriptCache, request_key
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "scripts.sqlite3")
+
+
+def claim_owner(path, key):
+    row = sqlite3.connect(path).execute("SELECT owner FROM inflight WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def test_request_key_normalizes_topic():
+    assert request_key("keynote", topic="  The Wonder of AI! ") == request_key("keynote", topic="the wonder of ai")
+    assert request_key("keynote", topic="ai", duration="1 min") != request_key("keynote", topic="ai", duration="5 min")
+
+
+def test_get_or_compute_caches(path):
+    cache = ScriptCache(path, 60)
+    calls = []
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "v") == "v"
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "w") == "v"
+    assert calls == [1]
+    assert cache.get_or_compute("k", lambda: "w", fresh=True) == "w"
+
+
+def test_concurrent_callers_share_one_compute(path):
+    cache = ScriptCache(path, 60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "v"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["v"] * 5
+    assert calls == [1]
+
+
+def test_errors_are_not_cached(path):
+    cache = ScriptCache(path, 60)
+
+    def fail():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", fail)
+    assert cache.get_or_compute("k", lambda: "v") == "v"
+    assert claim_owner(path, "k") is None
+
+
+def test_waits_for_another_process(path, monkeypatch):
+    monkeypatch.setattr(script_cache, "INFLIGHT_POLL_SECONDS", 0.02)
+    other, cache = ScriptCache(path, 60), ScriptCache(path, 60)
+    assert other._claim("k")
+    threading.Timer(0.1, lambda: other.put("k", "theirs")).start()
+    assert cache.get_or_compute("k", lambda: "ours") == "theirs"
+    assert cache.counters["coalesced"] == 1
+
+
+def test_unclaimed_compute_leaves_the_other_claim(path, monkeypatch):
+    monkeypatch.setattr(script_cache, "INFLIGHT_LEASE_SECONDS", 0.2)
+    monkeypatch.setattr(script_cache, "INFLIGHT_POLL_SECONDS", 0.02)
+    other, cache = ScriptCache(path, 60), ScriptCache(path, 60)
+    assert other._claim("k")
+    # The other process keeps its claim alive the whole time we wait
+    monkeypatch.setattr(cache, "_claim", lambda key: False)
+    released = []
+    monkeypatch.setattr(cache, "_release", released.append)
+    assert cache.get_or_compute("k", lambda: "ours") == "ours"
+    assert released == []
+    assert claim_owner(path, "k") == other.owner
+
+
+def test_lapsed_claim_is_taken_over_and_released(path, monkeypatch):
+    monkeypatch.setattr(script_cache, "INFLIGHT_LEASE_SECONDS", 0.1)
+    monkeypatch.setattr(script_cache, "INFLIGHT_POLL_SECONDS", 0.02)
+    other, cache = ScriptCache(path, 60), ScriptCache(path, 60)
+    assert other._claim("k")
+    assert cache.get_or_compute("k", lambda: "ours") == "ours"
+    assert claim_owner(path, "k") is None
+
+
+def wait_for_waiters(cache, count):
+    for _ in range(500):
+        if cache.counters["coalesced"] >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError("callers never joined the flight")
+
+
+def test_join_coalesces_onto_a_streamed_lead(path):
+    cache = ScriptCache(path, 60)
+    value, lead = cache.join("k")
+    assert value is None and lead is not None
+
+    joined = []
+    waiter = threading.Thread(target=lambda: joined.append(cache.join("k")))
+    computed = []
+    other = threading.Thread(target=lambda: computed.append(cache.get_or_compute("k", lambda: "again")))
+    waiter.start()
+    other.start()
+    wait_for_waiters(cache, 2)
+    cache.land(lead, "streamed")
+    waiter.join()
+    other.join()
+    assert joined == [("streamed", None)]
+    assert computed == ["streamed"]
+    assert cache.get("k") == "streamed"
+    assert claim_owner(path, "k") is None
+
+
+def test_failed_lead_lets_waiters_compute(path):
+    cache = ScriptCache(path, 60)
+    _, lead = cache.join("k")
+    joined, computed = [], []
+    waiter = threading.Thread(target=lambda: joined.append(cache.join("k")))
+    other = threading.Thread(target=lambda: computed.append(cache.get_or_compute("k", lambda: "own")))
+    waiter.start()
+    other.start()
+    wait_for_waiters(cache, 2)
+    cache.land(lead, None)  # e.g. the client left mid-stream
+    waiter.join()
+    other.join()
+    assert joined == [(None, None)]
+    assert computed == ["own"]
+
+
+def test_ajoin_coalesces_onto_a_streamed_lead(path):
+    cache = ScriptCache(path, 60)
+
+    async def compute():
+        return "again"
+
+    async def main():
+        value, lead = await cache.ajoin("k")
+        assert value is None and lead is not None
+        waiters = [asyncio.ensure_future(cache.ajoin("k")), asyncio.ensure_future(cache.aget_or_compute("k", compute))]
+        await asyncio.sleep(0.05)
+        await cache.aland(lead, "streamed")
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == [("streamed", None), "streamed"]
+    assert claim_owner(path, "k") is None
+    assert cache.stats()["in_flight"] == 0
@@ -0,0 +1,403 @@
+"""
+Shared upstream HTTP client for Anthropic and ElevenLabs
+One keep-alive session per host so repeated section / chunk calls reuse TCP+TLS connections.
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+import certifi
+from requests.adapters import HTTPAdapter
+
+import breaker
+import deadline
+import metrics
+
+ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL', 'https://api.anthropic.com').rstrip('/')
+ELEVENLABS_BASE_URL = os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io').rstrip('/')
+
+# Connections kept alive per host (parallel sections / chunks each hold one)
+POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '10'))
+
+# (connect, read) timeout caps per upstream; each call gets at most the request's remaining budget
+HOST_TIMEOUTS = {
+    "anthropic": (
+        float(os.getenv('ANTHROPIC_CONNECT_TIMEOUT', '5')),
+        float(os.getenv('ANTHROPIC_READ_TIMEOUT', '55'))
+    ),
+    "elevenlabs": (
+        float(os.getenv('ELEVENLABS_CONNECT_TIMEOUT', '5')),
+        float(os.getenv('ELEVENLABS_READ_TIMEOUT', '120'))
+    ),
+}
+
+BASE_URLS = {
+    "anthropic": ANTHROPIC_BASE_URL,
+    "elevenlabs": ELEVENLABS_BASE_URL,
+}
+
+# Request rate (tokens/sec, burst) and max in-flight requests per upstream.
+# ElevenLabs caps concurrent requests by plan tier (Starter 3, Creator 5, Pro 10).
+HOST_LIMITS = {
+    "anthropic": {
+        "rate": float(os.getenv('ANTHROPIC_RATE', '5')),
+        "burst": int(os.getenv('ANTHROPIC_BURST', '10')),
+        "concurrency": int(os.getenv('ANTHROPIC_CONCURRENCY', '8')),
+    },
+    "elevenlabs": {
+        "rate": float(os.getenv('ELEVENLABS_RATE', '2')),
+        "burst": int(os.getenv('ELEVENLABS_BURST', '3')),
+        "concurrency": int(os.getenv('ELEVENLABS_CONCURRENCY', '3')),
+    },
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _build_session(base_url):
+    session = requests.Session()
+    session.verify = certifi.where()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=False)
+    scheme = urlsplit(base_url).scheme or "https"
+    session.mount(f"{scheme}://", adapter)
+    return session
+
+
+def get_session(host):
+    """Keep-alive session for an upstream ("anthropic" or "elevenlabs")."""
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session(BASE_URLS[host])
+                _sessions[host] = session
+    return session
+
+
+def timeouts(host, timeout=None, budget=None):
+    """(connect, read) timeouts for one call: the host's caps, an optional tighter read cap,
+    both cut to the remaining budget (the current request deadline by default).
+
+    Raises deadline.DeadlineExceeded when too little budget is left to make the call.
+    """
+    connect_timeout, read_timeout = HOST_TIMEOUTS[host]
+    if timeout is not None:
+        read_timeout = min(read_timeout, timeout)
+    read_timeout = (budget or deadline.current()).timeout(read_timeout)
+    return min(connect_timeout, read_timeout), read_timeout
+
+
+def budget_limited(host, timeout, read_timeout):
+    """True when the request deadline, not the host's (or caller's) cap, set this read timeout.
+    A call that then times out says nothing about the upstream's health."""
+    cap = HOST_TIMEOUTS[host][1] if timeout is None else min(HOST_TIMEOUTS[host][1], timeout)
+    return read_timeout < cap
+
+
+def post(host, path, timeout=None, budget=None, **kwargs):
+    """POST to an upstream path over its pooled session.
+
+    timeout optionally tightens the host's read timeout; budget is the Deadline to respect
+    (defaults to the current request's). Raises breaker.CircuitOpen while the host's breaker is open.
+    """
+    cap, timeout = timeout, timeouts(host, timeout, budget)
+    circuit = breaker.get(host)
+    probe = circuit.acquire()
+
+    if "json" in kwargs:
+        # Serialized here rather than by requests so the bytes sent can be counted for free
+        kwargs["data"] = json.dumps(kwargs.pop("json")).encode("utf-8")
+        kwargs["headers"] = {"Content-Type": "application/json", **(kwargs.get("headers") or {})}
+    sent = len(kwargs.get("data") or b"")
+
+    start = time.perf_counter()
+    try:
+        response = get_session(host).post(f"{BASE_URLS[host]}{path}", timeout=timeout, **kwargs)
+    except requests.Timeout:
+        elapsed = time.perf_counter() - start
+        if budget_limited(host, cap, timeout[1]):
+            metrics.record_upstream(host, "deadline", elapsed, sent)
+            circuit.release(probe)
+        else:
+            metrics.record_upstream(host, "error", elapsed, sent)
+            circuit.record("error", elapsed, probe)
+        raise
+    except Exception:
+        elapsed = time.perf_counter() - start
+        metrics.record_upstream(host, "error", elapsed, sent)
+        circuit.record("error", elapsed, probe)
+        raise
+    except BaseException:
+        circuit.release(probe)
+        raise
+    elapsed = time.perf_counter() - start
+    circuit.record(response.status_code, elapsed, probe, streamed=bool(kwargs.get("stream")))
+
+    # Streamed bodies are only counted when the upstream announces their length
+    if kwargs.get("stream"):
+        received = int(response.headers.get("Content-Length") or 0)
+    else:
+        received = len(response.content)
+    metrics.record_upstream(host, response.status_code, elapsed, sent, received)
+    return response
+
+
+class UpstreamError(Exception):
+    """Non-2xx upstream response. Carries the status and any Retry-After hint in seconds."""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+def parse_retry_after(response):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token bucket plus an in-flight cap, shared by every caller of one upstream.
+
+    Threads take slots with slot(), event-loop code with aslot(); both draw on the same
+    budget, so jobs on the worker pool and ASGI routes together stay within the cap.
+    pause() holds back all callers, e.g. when the upstream answers 429 with Retry-After.
+    """
+
+    def __init__(self, rate, burst, concurrency, host=None):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._in_use = 0
+        self._async_waiters = []  # (loop, asyncio.Event) queued in _aacquire
+
+    def _take_token(self):
+        """Consume a token if available; otherwise return seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _try_acquire(self):
+        """Take a free slot; call with self._lock held."""
+        if self._in_use < self.concurrency:
+            self._in_use += 1
+            return True
+        return False
+
+    def _acquire(self, timeout):
+        with self._released:
+            return self._released.wait_for(self._try_acquire, timeout=timeout)
+
+    async def _aacquire(self, timeout):
+        """_acquire for event-loop callers: waits on an asyncio.Event, never on a thread."""
+        loop = asyncio.get_running_loop()
+        until = None if timeout is None else loop.time() + timeout
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return True
+                waiter = (loop, asyncio.Event())
+                self._async_waiters.append(waiter)
+            try:
+                remaining = None if until is None else until - loop.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                await asyncio.wait_for(waiter[1].wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                with self._lock:
+                    self._async_waiters.remove(waiter)
+
+    def _release(self):
+        with self._lock:
+            self._in_use -= 1
+            self._released.notify_all()
+            for loop, event in self._async_waiters:
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    pass  # that waiter's loop has closed
+
+    @contextmanager
+    def slot(self):
+        """Hold one concurrency slot and one rate token for the duration of a request.
+
+        Gives up with DeadlineExceeded rather than queue past the current request's deadline,
+        and with CircuitOpen (before queueing at all) while the upstream's breaker is open.
+        """
+        if self.host:
+            breaker.check(self.host)
+        budget = deadline.current()
+        if not self._acquire(budget.remaining()):
+            raise deadline.DeadlineExceeded("Request deadline reached waiting for an upstream slot")
+        try:
+            wait = self._take_token()
+            while wait > 0:
+                if not budget.allows(wait):
+                    raise deadline.DeadlineExceeded("Request deadline reached waiting for an upstream rate token")
+                time.sleep(wait)
+                wait = self._take_token()
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """slot() for asyncio callers, from the same slots and tokens."""
+        if self.host:
+            breaker.check(self.host)
+        budget = deadline.current()
+        if not await self._aacquire(budget.remaining()):
+            raise deadline.DeadlineExceeded("Request deadline reached waiting for an upstream slot")
+        try:
+            wait = self._take_token()
+            while wait > 0:
+                if not budget.allows(wait):
+                    raise deadline.DeadlineExceeded("Request deadline reached waiting for an upstream rate token")
+                await asyncio.sleep(wait)
+                wait = self._take_token()
+            yield
+        finally:
+            self._release()
+
+
+_limiters = {host: RateLimiter(host=host, **limits) for host, limits in HOST_LIMITS.items()}
+
+
+def get_limiter(host):
+    return _limiters[host]
+
+
+def anthropic_headers(api_key):
+    return {
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "Content-Type": "application/json"
+    }
+
+
+def cached_system(prefix, suffix=""):
+    """Anthropic system prompt as content blocks, with a prompt-cache breakpoint after `prefix`.
+
+    Put everything that repeats across requests (persona, knowledge-base excerpt) in prefix and
+    per-request context in suffix, which follows the breakpoint and is never cached.
+    """
+    blocks = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    if suffix.strip():
+        blocks.append({"type": "text", "text": suffix})
+    return blocks
+
+
+def fit_cache(system, min_tokens):
+    """system as sent to a model that caches prefixes of min_tokens or more: a cached_system()
+    prefix shorter than that (at ~4 chars a token) loses its breakpoint, since it would never be
+    read back from the cache."""
+    if isinstance(system, str):
+        return system
+    prefix_chars = 0
+    for block in system:
+        prefix_chars += len(block["text"])
+        if "cache_control" in block:
+            break
+    if prefix_chars // 4 >= min_tokens:
+        return system
+    return [{k: v for k, v in block.items() if k != "cache_control"} for block in system]
+
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+_usage = dict.fromkeys(USAGE_FIELDS, 0)
+_usage["responses"] = 0
+_usage_lock = threading.Lock()
+
+
+def record_usage(usage):
+    """Add one Anthropic response's `usage` block to the running totals."""
+    if not usage:
+        return
+    with _usage_lock:
+        _usage["responses"] += 1
+        for field in USAGE_FIELDS:
+            _usage[field] += usage.get(field) or 0
+    for field in USAGE_FIELDS:
+        if usage.get(field):
+            metrics.inc("anthropic_tokens_total", usage[field], kind=field[:-len("_tokens")])
+
+
+def usage_stats():
+    """Token totals; cache_read_ratio is the share of prompt tokens served from the prompt cache."""
+    with _usage_lock:
+        stats = dict(_usage)
+    prompt = stats["input_tokens"] + stats["cache_creation_input_tokens"] + stats["cache_read_input_tokens"]
+    stats["cache_read_ratio"] = round(stats["cache_read_input_tokens"] / prompt, 3) if prompt else 0.0
+    return stats
+
+
+def elevenlabs_headers(api_key):
+    return {
+        "xi-api-key": api_key,
+        "Content-Type": "application/json"
+    }
+
+
+def iter_sse(response):
+    """Parse a streamed text/event-stream response into (event, data) string pairs."""
+    # SSE is always UTF-8; requests would otherwise assume latin-1 for text/* without a charset
+    response.encoding = 'utf-8'
+    event, data_lines = None, []
+    for raw in response.iter_lines(decode_unicode=True):
+        if raw is None:
+            continue
+        line = raw.rstrip('\r')
+        if not line:
+            if data_lines:
+                yield event or "message", "\n".join(data_lines)
+            event, data_lines = None, []
+        elif line.startswith(':'):
+            continue
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield event or "message", "\n".join(data_lines)
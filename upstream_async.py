@@ -0,0 +1,152 @@
+"""
+Async upstream client for the ASGI serving mode
+httpx.AsyncClient per host and event loop, with the same base URLs, pool size, timeouts
+and rate limits as upstream.py. Requires httpx (see requirements.txt).
+"""
+
+import json
+import time
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+import certifi
+import httpx
+
+import breaker
+import deadline
+import metrics
+import upstream
+from upstream import BASE_URLS, HOST_TIMEOUTS, POOL_SIZE, budget_limited, timeouts
+
+# Clients bind to the loop they were created on
+_clients = weakref.WeakKeyDictionary()
+
+
+def _timeout(host, timeout=None, budget=None):
+    """httpx.Timeout from upstream.timeouts(): host caps cut to the remaining request deadline."""
+    connect_timeout, read_timeout = timeouts(host, timeout, budget)
+    return httpx.Timeout(read_timeout, connect=connect_timeout)
+
+
+def get_client(host):
+    """Keep-alive AsyncClient for an upstream on the running loop."""
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(host)
+    if client is None:
+        client = httpx.AsyncClient(
+            base_url=BASE_URLS[host],
+            verify=certifi.where(),
+            timeout=httpx.Timeout(HOST_TIMEOUTS[host][1], connect=HOST_TIMEOUTS[host][0]),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=POOL_SIZE)
+        )
+        clients[host] = client
+    return client
+
+
+async def aclose():
+    """Close every client on the running loop (ASGI shutdown)."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def _encode_json(kwargs):
+    """Serialize a json= body up front so its size can be counted; returns the bytes sent."""
+    if "json" in kwargs:
+        kwargs["content"] = json.dumps(kwargs.pop("json")).encode("utf-8")
+        kwargs["headers"] = {"Content-Type": "application/json", **(kwargs.get("headers") or {})}
+    return len(kwargs.get("content") or b"")
+
+
+def _record_failure(host, circuit, probe, error, cap, timeout, elapsed, sent):
+    """Count a call that raised. Timeouts the request deadline imposed leave the breaker alone."""
+    if isinstance(error, httpx.TimeoutException) and budget_limited(host, cap, timeout.read):
+        metrics.record_upstream(host, "deadline", elapsed, sent)
+        circuit.release(probe)
+    else:
+        metrics.record_upstream(host, "error", elapsed, sent)
+        circuit.record("error", elapsed, probe)
+
+
+async def post(host, path, timeout=None, budget=None, **kwargs):
+    """POST to an upstream path; timeout tightens the host's read timeout, budget defaults to the request deadline."""
+    cap, timeout = timeout, _timeout(host, timeout, budget)
+    circuit = breaker.get(host)
+    probe = circuit.acquire()
+    sent = _encode_json(kwargs)
+    start = time.perf_counter()
+    try:
+        response = await get_client(host).post(path, timeout=timeout, **kwargs)
+    except Exception as e:
+        _record_failure(host, circuit, probe, e, cap, timeout, time.perf_counter() - start, sent)
+        raise
+    except BaseException:
+        # Cancelled (e.g. the losing copy of a hedged call): no verdict on the upstream
+        circuit.release(probe)
+        raise
+    elapsed = time.perf_counter() - start
+    circuit.record(response.status_code, elapsed, probe)
+    metrics.record_upstream(host, response.status_code, elapsed, sent, len(response.content))
+    return response
+
+
+async def open_stream(host, path, timeout=None, budget=None, **kwargs):
+    """Streaming POST, returned once the response headers arrive. The caller must aclose() it.
+
+    For streams that outlive the function that opened them; otherwise use stream().
+    """
+    cap, timeout = timeout, _timeout(host, timeout, budget)
+    circuit = breaker.get(host)
+    probe = circuit.acquire()
+    sent = _encode_json(kwargs)
+    client = get_client(host)
+    request = client.build_request("POST", path, timeout=timeout, **kwargs)
+    start = time.perf_counter()
+    try:
+        response = await client.send(request, stream=True)
+    except Exception as e:
+        _record_failure(host, circuit, probe, e, cap, timeout, time.perf_counter() - start, sent)
+        raise
+    except BaseException:
+        circuit.release(probe)
+        raise
+    elapsed = time.perf_counter() - start
+    circuit.record(response.status_code, elapsed, probe, streamed=True)
+    metrics.record_upstream(host, response.status_code, elapsed, sent, int(response.headers.get("Content-Length") or 0))
+    return response
+
+
+@asynccontextmanager
+async def stream(host, path, timeout=None, budget=None, **kwargs):
+    """Streaming POST; the response body is read with aiter_bytes()/aiter_lines()."""
+    response = await open_stream(host, path, timeout, budget, **kwargs)
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+async def aiter_sse(response):
+    """Parse a streamed text/event-stream response into (event, data) string pairs."""
+    event, data_lines = None, []
+    async for raw in response.aiter_lines():
+        line = raw.rstrip('\r')
+        if not line:
+            if data_lines:
+                yield event or "message", "\n".join(data_lines)
+            event, data_lines = None, []
+        elif line.startswith(':'):
+            continue
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield event or "message", "\n".join(data_lines)
+
+
+def get_limiter(host):
+    """The host's upstream.RateLimiter; use its aslot(). Shared with sync callers on threads."""
+    return upstream.get_limiter(host)